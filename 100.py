@@ -6,6 +6,7 @@ import traceback
 import time
 import re
 import logging # MOD: Added logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # --- Langchain Imports ---
 from langchain_ollama import OllamaLLM
@@ -13,6 +14,7 @@ from langchain.chains import LLMChain
 from langchain.prompts import PromptTemplate
 from langchain_community.document_loaders import PyPDFLoader
 # --- End Imports ---
+from tracing import enable_tracing, export_chrome_trace, span, traced
 
 # Load environment variables
 load_dotenv()
@@ -28,7 +30,12 @@ DEFAULT_MODEL = os.getenv("OLLAMA_MODEL", "gemma3:4b") # Example, ensure this mo
 OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
 OUTPUT_FOLDER = './docs'
 LLM_CALL_DELAY_SECONDS = 0.5
+# Per-chapter event lists are independent; request up to this many at once (match OLLAMA_NUM_PARALLEL)
+EVENT_GENERATION_PARALLELISM = max(1, int(os.getenv("OLLAMA_NUM_PARALLEL", "4")))
+EVENT_GENERATION_MAX_ATTEMPTS = 2 # Chapters whose event request failed are retried individually
 DEFAULT_RESUME_FILENAME = 'kenji_gamer_resume.pdf'
+# Path for a Chrome trace-event JSON of the run (open in Perfetto or chrome://tracing); unset = tracing off
+TRACE_FILE = os.getenv("NOVEL_TRACE_FILE", "")
 
 # --- MOD: Custom Exceptions for Better Error Handling ---
 class GenerationError(Exception):
@@ -71,6 +78,11 @@ def create_llm(temperature=0.7, top_p=0.9, top_k=40):
         logger.exception("Details:") # MOD: Use logger.exception for tracebacks
         raise # Reraise to stop execution if LLM can't be created
 
+def invoke_chain(chain, chain_name, inputs):
+    """Runs one LLM call of a chain inside an "llm" trace span."""
+    with span(chain_name, category="llm"):
+        return chain.invoke(inputs)
+
 # --- Chain Classes (Prompts remain largely the same as previous 'relatable' version) ---
 # MOD: Added more specific error raising and logging within chains
 
@@ -121,7 +133,7 @@ class MainCharacterChain:
 
             logger.info("Invoking MainCharacterChain...")
             time.sleep(LLM_CALL_DELAY_SECONDS)
-            result = self.chain.invoke({"text": resume_text, "genre": genre})
+            result = invoke_chain(self.chain, "MainCharacterChain", {"text": resume_text, "genre": genre})
             profile = result.get('text', "").strip()
 
             if not profile or len(profile) < 100:
@@ -156,7 +168,7 @@ class SettingChain:
         try:
             logger.info("Invoking SettingChain...")
             time.sleep(LLM_CALL_DELAY_SECONDS)
-            result = self.chain.invoke({"subject": subject, "genre": genre, "profile": profile})
+            result = invoke_chain(self.chain, "SettingChain", {"subject": subject, "genre": genre, "profile": profile})
             setting = result.get('text', "").strip()
             if not setting or len(setting) < 50:
                 logger.warning(f"Generated setting seems invalid or too short: '{setting[:100]}...'")
@@ -218,7 +230,7 @@ class ThemeChain:
         try:
             logger.info("Invoking ThemeChain...")
             time.sleep(LLM_CALL_DELAY_SECONDS)
-            result = self.chain.invoke({"subject": subject, "genre": genre, "profile": profile, "setting": setting})
+            result = invoke_chain(self.chain, "ThemeChain", {"subject": subject, "genre": genre, "profile": profile, "setting": setting})
             raw_themes_text = result.get('text', "").strip()
             if not raw_themes_text:
                 raise ThemeGenerationError("LLM returned empty response for themes.")
@@ -253,7 +265,7 @@ class TitleChain:
         try:
             logger.info("Invoking TitleChain...")
             time.sleep(LLM_CALL_DELAY_SECONDS)
-            result = self.chain.invoke({"subject": subject, "genre": genre, "author": author, "profile": profile, "setting": setting, "themes": themes_str })
+            result = invoke_chain(self.chain, "TitleChain", {"subject": subject, "genre": genre, "author": author, "profile": profile, "setting": setting, "themes": themes_str })
             title = result.get('text', "Untitled Novel").strip()
             title = re.sub(r'^(Title:|Novel Title:)\s*', '', title, flags=re.IGNORECASE)
             title = title.strip('"\'')
@@ -306,13 +318,13 @@ class PlotChain:
         try:
             logger.info(f"Generating plot features for genre '{genre}' and author style '{author}'...")
             time.sleep(LLM_CALL_DELAY_SECONDS)
-            features_result = self.helper_chain.invoke({"genre": genre, "author": author})
+            features_result = invoke_chain(self.helper_chain, "PlotChain.attributes", {"genre": genre, "author": author})
             features = features_result.get('text', "Compelling conflict, Character depth, Unexpected twists").strip()
             logger.info(f"Generated plot features: {features}")
 
             logger.info(f"Generating main plot outline for title: {title}")
             time.sleep(LLM_CALL_DELAY_SECONDS)
-            plot_result = self.chain.invoke({
+            plot_result = invoke_chain(self.chain, "PlotChain", {
                 "features": features, "subject": subject, "genre": genre, "author": author,
                 "profile": profile, "title": title, "setting": setting, "themes": themes_str
             })
@@ -432,7 +444,7 @@ class ChaptersChain:
         try:
             logger.info("Invoking ChaptersChain...")
             time.sleep(LLM_CALL_DELAY_SECONDS)
-            response_result = self.chain.invoke({
+            response_result = invoke_chain(self.chain, "ChaptersChain", {
                 "subject": subject, "genre": genre, "author": author, "profile": profile,
                 "title": title, "plot": plot, "setting": setting, "themes": themes_str
             })
@@ -495,7 +507,7 @@ class EventChain:
         try:
             logger.info(f"Invoking EventChain for: {chapter_title}")
             time.sleep(LLM_CALL_DELAY_SECONDS)
-            result = self.chain.invoke({
+            result = invoke_chain(self.chain, "EventChain", {
                 "plot": plot, "profile": profile, "themes": themes_str,
                 "chapter_title": chapter_title, "chapter_summary": chapter_summary, "author": author
             })
@@ -545,7 +557,7 @@ class WriterChain:
         try:
             logger.info(f"WriterChain: Event: {current_event[:80]}... in Ch: {chapter_name}")
             time.sleep(LLM_CALL_DELAY_SECONDS)
-            result = self.chain.invoke({
+            result = invoke_chain(self.chain, "WriterChain", {
                 "genre": genre, "author": author, "title": title, "profile": profile, "plot": plot,
                 "setting": setting, "themes": themes_str, "chapter_name": chapter_name,
                 "previous_events": previous_events_history_str, "summary": chapter_summary,
@@ -591,7 +603,7 @@ class RefinementChain:
         try:
             logger.info(f"Invoking RefinementChain for chapter: {chapter_name}...")
             time.sleep(LLM_CALL_DELAY_SECONDS)
-            result = self.chain.invoke({
+            result = invoke_chain(self.chain, "RefinementChain", {
                 "author": author, "title": title, "genre": genre, "profile": profile, "setting": setting,
                 "themes": themes_str, "plot": plot, "chapter_name": chapter_name,
                 "summary": summary, "draft_text": draft_text
@@ -629,22 +641,41 @@ def sort_chapters(chapter_dict_items):
 
 
 def generate_events_for_all_chapters(plot, profile, themes_str, sorted_chapters_list_of_tuples, author):
-    logger.info("Generating Events for Each Chapter")
+    """Generates event lists for all chapters concurrently (bounded), retrying failed chapters individually."""
+    logger.info(f"Generating Events for Each Chapter (up to {EVENT_GENERATION_PARALLELISM} requests in parallel)")
     event_generator = EventChain()
-    event_dict = {} # chapter_title -> list_of_events
-    for chapter_title, summary in sorted_chapters_list_of_tuples:
-         logger.info(f"Generating events for: {chapter_title}")
-         try:
-            events = event_generator.run(plot, profile, themes_str, chapter_title, summary, author)
-            # events is already a list from event_generator.run (or [] on error/empty)
-            event_dict[chapter_title] = events
-            if events:
-                logger.info(f"Generated {len(events)} events for '{chapter_title}'.")
-            else:
-                logger.warning(f"No events generated or parsed for '{chapter_title}'.")
-         except EventGenerationError as e:
-            logger.warning(f"Could not generate events for '{chapter_title}': {e}. Skipping events for this chapter.")
-            event_dict[chapter_title] = [] # Assign empty list on error
+    ordered_chapters = sort_chapters(sorted_chapters_list_of_tuples)
+    events_by_title = {}
+    pending = ordered_chapters
+    for attempt in range(1, EVENT_GENERATION_MAX_ATTEMPTS + 1):
+        if not pending:
+            break
+        failed_titles = set()
+        with ThreadPoolExecutor(max_workers=min(EVENT_GENERATION_PARALLELISM, len(pending))) as executor:
+            futures = {
+                executor.submit(event_generator.run, plot, profile, themes_str, chapter_title, summary, author): chapter_title
+                for chapter_title, summary in pending
+            }
+            for future in as_completed(futures):
+                chapter_title = futures[future]
+                try:
+                    # events is already a list from event_generator.run (or [] on empty)
+                    events_by_title[chapter_title] = future.result()
+                except EventGenerationError as e:
+                    logger.warning(f"Could not generate events for '{chapter_title}' (attempt {attempt}/{EVENT_GENERATION_MAX_ATTEMPTS}): {e}")
+                    failed_titles.add(chapter_title)
+        pending = [item for item in ordered_chapters if item[0] in failed_titles]
+
+    event_dict = {} # chapter_title -> list_of_events, in sort_chapters order
+    for chapter_title, _ in ordered_chapters:
+        events = events_by_title.get(chapter_title, []) # Empty list if every attempt failed
+        event_dict[chapter_title] = events
+        if events:
+            logger.info(f"Generated {len(events)} events for '{chapter_title}'.")
+        elif chapter_title in events_by_title:
+            logger.warning(f"No events generated or parsed for '{chapter_title}'.")
+        else:
+            logger.warning(f"Skipping events for '{chapter_title}' after {EVENT_GENERATION_MAX_ATTEMPTS} failed attempts.")
     return event_dict
 
 def _write_single_chapter_content(writer_chain, chapter_title, chapter_summary, chapter_events, book_context):
@@ -665,21 +696,22 @@ def _write_single_chapter_content(writer_chain, chapter_title, chapter_summary,
 
         logger.info(f"  Writing Event {event_idx+1}/{total_events}: {event_description[:70]}...")
 
-        try:
-            new_paragraphs = writer_chain.run(
-                genre=book_context['genre'], author=book_context['author_style'], title=book_context['title'],
-                profile=book_context['profile'], plot=book_context['plot'], setting=book_context['setting'],
-                themes_str=book_context['themes_str'], chapter_name=chapter_title,
-                previous_events_history_str=history_str, chapter_summary=chapter_summary,
-                previous_paragraphs_str=progress_str, current_event=event_description
-            )
-        except WriterError as e: # Catch specific WriterError
-            logger.error(f"WriterError encountered for event {event_idx+1} in '{chapter_title}': {e}. Adding error message to content.")
-            new_paragraphs = f"[WRITER ERROR for event: '{event_description[:50]}...'. Details: {e}]"
-        except Exception as e: # Catch any other unexpected error from WriterChain
-            logger.error(f"Unexpected error writing event {event_idx+1} for '{chapter_title}': {e}. Adding error message.")
-            logger.exception("WriterChain Unexpected Error Details:")
-            new_paragraphs = f"[UNEXPECTED WRITER ERROR for event: '{event_description[:50]}...'. Check logs.]"
+        with span("event", chapter=chapter_title, event=event_idx + 1):
+            try:
+                new_paragraphs = writer_chain.run(
+                    genre=book_context['genre'], author=book_context['author_style'], title=book_context['title'],
+                    profile=book_context['profile'], plot=book_context['plot'], setting=book_context['setting'],
+                    themes_str=book_context['themes_str'], chapter_name=chapter_title,
+                    previous_events_history_str=history_str, chapter_summary=chapter_summary,
+                    previous_paragraphs_str=progress_str, current_event=event_description
+                )
+            except WriterError as e: # Catch specific WriterError
+                logger.error(f"WriterError encountered for event {event_idx+1} in '{chapter_title}': {e}. Adding error message to content.")
+                new_paragraphs = f"[WRITER ERROR for event: '{event_description[:50]}...'. Details: {e}]"
+            except Exception as e: # Catch any other unexpected error from WriterChain
+                logger.error(f"Unexpected error writing event {event_idx+1} for '{chapter_title}': {e}. Adding error message.")
+                logger.exception("WriterChain Unexpected Error Details:")
+                new_paragraphs = f"[UNEXPECTED WRITER ERROR for event: '{event_description[:50]}...'. Check logs.]"
 
 
         if "[FATAL WRITER ERROR" in new_paragraphs or "[Writer Error" in new_paragraphs or "[WRITER ERROR" in new_paragraphs or "[UNEXPECTED WRITER ERROR" in new_paragraphs:
@@ -718,36 +750,37 @@ def write_book(genre, author_style, title, profile, plot, setting, themes_str,
     for chap_idx, (chapter_title, chapter_summary) in enumerate(sorted_chapters_list_of_tuples):
         logger.info(f"--- Processing Chapter {chap_idx+1}/{total_chapters}: {chapter_title} ---")
         
-        chapter_events = event_dict.get(chapter_title, [])
-        raw_chapter_text = _write_single_chapter_content(
-            writer_chain, chapter_title, chapter_summary, chapter_events, book_writing_context
-        )
+        with span("chapter", chapter=chapter_title) as chapter_span:
+            chapter_events = event_dict.get(chapter_title, [])
+            raw_chapter_text = _write_single_chapter_content(
+                writer_chain, chapter_title, chapter_summary, chapter_events, book_writing_context
+            )
 
-        final_chapter_text = raw_chapter_text
-        if refiner_chain:
-            logger.info(f"Refining chapter: {chapter_title}...")
-            try:
-                refined_text = refiner_chain.run(
-                    author=author_style, title=title, genre=genre, profile=profile, setting=setting,
-                    themes_str=themes_str, plot=plot, chapter_name=chapter_title,
-                    summary=chapter_summary, draft_text=raw_chapter_text
-                )
-                # Check if refinement actually changed something and didn't just return an error placeholder
-                if refined_text != raw_chapter_text and not refined_text.startswith(("[Writer Error", "[FATAL WRITER ERROR", "[Content generation skipped")):
-                     logger.info(f"Refinement applied for '{chapter_title}'.")
-                     final_chapter_text = refined_text
-                elif refined_text.startswith(("[Writer Error", "[FATAL WRITER ERROR", "[Content generation skipped")):
-                    logger.warning(f"Refinement resulted in an error or skipped content for '{chapter_title}', using unrefined text.")
-                else: # Refinement didn't change or error, so log it
-                     logger.info(f"Refinement resulted in no significant changes for '{chapter_title}' or returned original due to issues.")
-            except RefinementError as e:
-                logger.warning(f"Refinement process error for '{chapter_title}', using unrefined text. Error: {e}")
-            except Exception as e: # Catch-all for unexpected refinement errors
-                logger.error(f"Unexpected error during refinement of '{chapter_title}': {e}. Using unrefined text.")
-                logger.exception("Refinement Unexpected Error Details:")
+            final_chapter_text = raw_chapter_text
+            if refiner_chain:
+                logger.info(f"Refining chapter: {chapter_title}...")
+                try:
+                    refined_text = refiner_chain.run(
+                        author=author_style, title=title, genre=genre, profile=profile, setting=setting,
+                        themes_str=themes_str, plot=plot, chapter_name=chapter_title,
+                        summary=chapter_summary, draft_text=raw_chapter_text
+                    )
+                    # Check if refinement actually changed something and didn't just return an error placeholder
+                    if refined_text != raw_chapter_text and not refined_text.startswith(("[Writer Error", "[FATAL WRITER ERROR", "[Content generation skipped")):
+                         logger.info(f"Refinement applied for '{chapter_title}'.")
+                         final_chapter_text = refined_text
+                    elif refined_text.startswith(("[Writer Error", "[FATAL WRITER ERROR", "[Content generation skipped")):
+                        logger.warning(f"Refinement resulted in an error or skipped content for '{chapter_title}', using unrefined text.")
+                    else: # Refinement didn't change or error, so log it
+                         logger.info(f"Refinement resulted in no significant changes for '{chapter_title}' or returned original due to issues.")
+                except RefinementError as e:
+                    logger.warning(f"Refinement process error for '{chapter_title}', using unrefined text. Error: {e}")
+                except Exception as e: # Catch-all for unexpected refinement errors
+                    logger.error(f"Unexpected error during refinement of '{chapter_title}': {e}. Using unrefined text.")
+                    logger.exception("Refinement Unexpected Error Details:")
 
         book_content_map[chapter_title] = final_chapter_text
-        logger.info(f"--- Finished Chapter: {chapter_title} ---")
+        logger.info(f"--- Finished Chapter: {chapter_title} ({chapter_span.duration:.2f}s) ---")
 
     logger.info("Book Writing Process Complete")
     return book_content_map
@@ -860,15 +893,16 @@ def initialize_components():
     logger.info("Core Components Initialized Successfully.")
     return components
 
+@traced("pipeline")
 def run_generation_pipeline(components, resume_filename, subject, author_style, genre, enable_refinement):
     """Runs the main novel generation pipeline."""
     data_store = {} # To hold generated artifacts like profile, plot, etc.
 
     try:
         logger.info("--- Step 1: Generating Main Character Profile ---")
-        start_time = time.time()
-        data_store['profile'] = components["main_character_chain"].run(resume_filename, genre)
-        logger.info(f"Profile Generation Time: {time.time() - start_time:.2f}s")
+        with span("profile") as step:
+            data_store['profile'] = components["main_character_chain"].run(resume_filename, genre)
+        logger.info(f"Profile Generation Time: {step.duration:.2f}s")
         logger.info(f"Profile Generated (first 300 chars):\n---\n{data_store['profile'][:300]}...\n---")
     except ProfileGenerationError as e:
         logger.error(f"CRITICAL FAILURE in Profile Generation: {e}")
@@ -880,9 +914,9 @@ def run_generation_pipeline(components, resume_filename, subject, author_style,
 
     try:
         logger.info("--- Step 2: Generating Setting Description ---")
-        start_time = time.time()
-        data_store['setting'] = components["setting_chain"].run(subject, genre, data_store['profile'])
-        logger.info(f"Setting Generation Time: {time.time() - start_time:.2f}s")
+        with span("setting") as step:
+            data_store['setting'] = components["setting_chain"].run(subject, genre, data_store['profile'])
+        logger.info(f"Setting Generation Time: {step.duration:.2f}s")
         logger.info(f"Setting Generated (first 300 chars):\n---\n{data_store['setting'][:300]}...\n---")
     except SettingGenerationError as e:
         logger.warning(f"Setting Generation Failed: {e}. Proceeding with placeholder/error state.")
@@ -891,9 +925,9 @@ def run_generation_pipeline(components, resume_filename, subject, author_style,
 
     try:
         logger.info("--- Step 3: Generating Core Themes ---")
-        start_time = time.time()
-        data_store['themes_dict'] = components["theme_chain"].run(subject, genre, data_store['profile'], data_store['setting'])
-        logger.info(f"Theme Generation Time: {time.time() - start_time:.2f}s")
+        with span("themes") as step:
+            data_store['themes_dict'] = components["theme_chain"].run(subject, genre, data_store['profile'], data_store['setting'])
+        logger.info(f"Theme Generation Time: {step.duration:.2f}s")
         data_store['themes_str'] = format_themes_string(data_store['themes_dict'])
         logger.info(f"Themes Generated:\n---\n{data_store['themes_str']}\n---")
     except (ThemeGenerationError, ParsingError) as e: # Catch both generation and parsing issues
@@ -904,9 +938,9 @@ def run_generation_pipeline(components, resume_filename, subject, author_style,
 
     try:
         logger.info("--- Step 4: Generating Novel Title ---")
-        start_time = time.time()
-        data_store['title'] = components["title_chain"].run(subject, genre, author_style, data_store['profile'], data_store['setting'], data_store['themes_str'])
-        logger.info(f"Title Generation Time: {time.time() - start_time:.2f}s")
+        with span("title") as step:
+            data_store['title'] = components["title_chain"].run(subject, genre, author_style, data_store['profile'], data_store['setting'], data_store['themes_str'])
+        logger.info(f"Title Generation Time: {step.duration:.2f}s")
         if "Placeholder" in data_store['title'] or data_store['title'].startswith("Error") or data_store['title'] == "Untitled Novel (Generation Failed)":
              logger.warning(f"TITLE GENERATION USING PLACEHOLDER/ERROR: {data_store['title']}")
         else:
@@ -918,9 +952,9 @@ def run_generation_pipeline(components, resume_filename, subject, author_style,
 
     try:
         logger.info("--- Step 5: Generating Detailed Plot Outline ---")
-        start_time = time.time()
-        data_store['plot'] = components["plot_chain"].run(subject, genre, author_style, data_store['profile'], data_store['title'], data_store['setting'], data_store['themes_str'])
-        logger.info(f"Plot Generation Time: {time.time() - start_time:.2f}s")
+        with span("plot") as step:
+            data_store['plot'] = components["plot_chain"].run(subject, genre, author_style, data_store['profile'], data_store['title'], data_store['setting'], data_store['themes_str'])
+        logger.info(f"Plot Generation Time: {step.duration:.2f}s")
         logger.info(f"Plot Generated (first 500 chars):\n---\n{data_store['plot'][:500]}...\n---")
     except PlotGenerationError as e:
         logger.error(f"CRITICAL FAILURE in Plot Generation: {e}")
@@ -928,12 +962,12 @@ def run_generation_pipeline(components, resume_filename, subject, author_style,
 
     try:
         logger.info("--- Step 6: Generating Chapter List & Summaries ---")
-        start_time = time.time()
         # chapter_dict is already sorted by parse_chapters -> sort_chapters and returned as a dict
-        chapter_dict = components["chapters_chain"].run(subject, genre, author_style, data_store['profile'], data_store['title'], data_store['plot'], data_store['setting'], data_store['themes_str'])
+        with span("chapter list") as step:
+            chapter_dict = components["chapters_chain"].run(subject, genre, author_style, data_store['profile'], data_store['title'], data_store['plot'], data_store['setting'], data_store['themes_str'])
         # Convert to list of tuples for consistent processing order later, though it's already sorted if from dict(sorted_items)
         data_store['sorted_chapters_list_of_tuples'] = list(chapter_dict.items())
-        logger.info(f"Chapter List Generation Time: {time.time() - start_time:.2f}s")
+        logger.info(f"Chapter List Generation Time: {step.duration:.2f}s")
         logger.info(f"Chapters Generated & Parsed ({len(data_store['sorted_chapters_list_of_tuples'])} total):")
         for i, (chap_title, chap_desc) in enumerate(data_store['sorted_chapters_list_of_tuples']):
             if i < 5: logger.info(f"  - {chap_title}: {chap_desc[:60]}...") # Log first 5
@@ -943,9 +977,9 @@ def run_generation_pipeline(components, resume_filename, subject, author_style,
         raise # Chapters are critical
 
     logger.info("--- Step 7: Generating Events for All Chapters ---")
-    start_time = time.time()
-    data_store['event_dict'] = generate_events_for_all_chapters(data_store['plot'], data_store['profile'], data_store['themes_str'], data_store['sorted_chapters_list_of_tuples'], author_style)
-    logger.info(f"Event Generation Time: {time.time() - start_time:.2f}s")
+    with span("events") as step:
+        data_store['event_dict'] = generate_events_for_all_chapters(data_store['plot'], data_store['profile'], data_store['themes_str'], data_store['sorted_chapters_list_of_tuples'], author_style)
+    logger.info(f"Event Generation Time: {step.duration:.2f}s")
     if not any(data_store['event_dict'].values()): # Check if all chapters have empty event lists
         logger.warning("No events were generated for *any* chapter. Book content might be minimal or contain placeholders.")
     else:
@@ -958,23 +992,23 @@ def run_generation_pipeline(components, resume_filename, subject, author_style,
                 break # Only log for the first chapter with events
 
     logger.info("--- Step 8: Writing Full Book Content ---")
-    start_time = time.time()
-    data_store['book_content_map'] = write_book(
-        genre, author_style, data_store['title'], data_store['profile'], data_store['plot'], data_store['setting'], data_store['themes_str'],
-        data_store['sorted_chapters_list_of_tuples'], data_store['event_dict'],
-        refine_chapters=enable_refinement
-    )
-    logger.info(f"Book Writing Time: {time.time() - start_time:.2f}s")
+    with span("write book") as step:
+        data_store['book_content_map'] = write_book(
+            genre, author_style, data_store['title'], data_store['profile'], data_store['plot'], data_store['setting'], data_store['themes_str'],
+            data_store['sorted_chapters_list_of_tuples'], data_store['event_dict'],
+            refine_chapters=enable_refinement
+        )
+    logger.info(f"Book Writing Time: {step.duration:.2f}s")
 
     if data_store.get('book_content_map') and any(data_store['book_content_map'].values()):
         logger.info("--- Step 9: Saving Document ---")
-        start_time = time.time()
         try:
-            saved_path = components["doc_writer"].write_doc(
-                data_store['book_content_map'], data_store['sorted_chapters_list_of_tuples'], data_store['title'],
-                genre, author_style, data_store['themes_dict'], data_store['setting']
-            )
-            logger.info(f"Document Saving Time: {time.time() - start_time:.2f}s")
+            with span("save document") as step:
+                saved_path = components["doc_writer"].write_doc(
+                    data_store['book_content_map'], data_store['sorted_chapters_list_of_tuples'], data_store['title'],
+                    genre, author_style, data_store['themes_dict'], data_store['setting']
+                )
+            logger.info(f"Document Saving Time: {step.duration:.2f}s")
             if saved_path:
                 logger.info(f"Success! Novel saved to: {saved_path}")
             else:
@@ -993,6 +1027,8 @@ def run_generation_pipeline(components, resume_filename, subject, author_style,
 
 def main():
     process_start_time = time.time()
+    if TRACE_FILE:
+        enable_tracing()
     logger.info("=============================================")
     logger.info("=== ENHANCED NOVEL GENERATION SYSTEM V3.1 ===") # Incremented version for fix
     logger.info(f"=== Timestamp: {time.strftime('%Y-%m-%d %H:%M:%S')} ===")
@@ -1053,6 +1089,9 @@ As he navigates the politics of Eldoria, the expectations of being a 'Hero,' and
         logger.info("=== NOVEL GENERATION PROCESS FINISHED ===")
         logger.info(f"=== Total Execution Time: {total_time:.2f} seconds ({total_time/60:.2f} minutes) ===")
         logger.info("============================================")
+        if TRACE_FILE:
+            span_count = export_chrome_trace(TRACE_FILE)
+            logger.info(f"Trace with {span_count} spans written to {os.path.abspath(TRACE_FILE)} (open in Perfetto or chrome://tracing).")
 
 if __name__ == "__main__":
     main()
@@ -3,10 +3,22 @@ import json
 import time
 import os
 import re
+import sys
 from docx import Document
 from docx.shared import Pt
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 import pypdf # Added for PDF processing
+import argparse
+import copy
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from llm_cache import ResponseCache, get_single_flight, make_cache_key
+from ollama_client import get_client
+from run_journal import RunJournal, new_run_dir, int_keys
+from context_budget import ContextBuilder, TokenEstimator
+from passage_index import PassageIndex
+from llm_telemetry import LLMTelemetry, call_metrics
+from model_routing import OLLAMA_SMALL_MODEL, available_small_model, effective_tier, model_for
 
 # --- Configuration ---
 # Replace with your Ollama API endpoint and desired model
@@ -21,8 +33,42 @@ OLLAMA_TIMEOUT = 360 # 6 minutes, adjust as needed
 OUTPUT_DIR = "generated_novel_output"
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
+# Persistent response cache: a re-run after a crash replays identical calls from disk
+OLLAMA_CACHE_PATH = os.path.join(OUTPUT_DIR, "ollama_response_cache.sqlite")
+OLLAMA_CACHE_MAX_MB = 512 # Least-recently-used entries are evicted beyond this size
+# Replay mode serves every call from the cache and never contacts the Ollama server
+OLLAMA_REPLAY_MODE = os.getenv("OLLAMA_REPLAY_MODE", "0") == "1"
+# Fixed sampling seed (None = Ollama default). Part of the cache key.
+OLLAMA_SEED = None
+
+# Stream scene prose token-by-token so it shows up (and can be aborted) while it is generated
+OLLAMA_STREAM_SCENES = True
+# Abort a streamed scene as soon as the model starts writing a new chapter heading
+SCENE_STOP_PATTERN = re.compile(r"\n\s*(?:#+\s*)?(?:\*\*)?Chapter\s+\d+", re.IGNORECASE)
+
+# Chat endpoint, used for scene prose when the chapter context is sent as a fixed system message
+OLLAMA_CHAT_URL = "http://localhost:11434/api/chat"
+# Send the shared chapter context (outline, world, characters, chapter plan) as a byte-identical system
+# message for every scene of a chapter, so Ollama reuses its KV cache instead of re-prefilling it per scene
+OLLAMA_SCENE_PREFIX_REUSE = True
+
+# Context window requested from Ollama. Prompts longer than this are silently truncated from the front.
+OLLAMA_NUM_CTX = 8192
+# Token budget for the per-chapter continuity context; leaves room for the chapter plan, prose so far and output
+CONTINUITY_CONTEXT_TOKEN_BUDGET = 3000
+# Passages from earlier chapters retrieved per scene (by similarity to the scene description) for long-range callbacks
+RELEVANT_PASSAGES_K = 3
+# Draft chapter i+1 while chapter i's final continuity pass (summary + character extraction) runs on a second
+# worker; its character updates are folded in before i+1's later scenes. Needs OLLAMA_NUM_PARALLEL >= 2 to overlap.
+OLLAMA_PIPELINE_CHAPTERS = True
+CHARACTER_STATE_FIELDS = ("current_status", "current_location", "emotional_state") # Compared when reconciling
+# Chapter-boundary checks are independent, so they run in parallel waves (match OLLAMA_NUM_PARALLEL)
+TRANSITION_CHECK_PARALLELISM = max(1, int(os.getenv("OLLAMA_NUM_PARALLEL", "4")))
+TRANSITION_CONTEXT_CHARS = 1000 # Tail of the previous chapter / head of the current one shown to the editor
+TRANSITION_CHECK_MAX_WAVES = 3 # Re-check waves triggered by revisions that changed a chapter's tail
+
 class NovelGenerator:
-    def __init__(self, resume_content, subject, author_style, genre):
+    def __init__(self, resume_content, subject, author_style, genre, run_dir=None):
         self.resume_content = resume_content
         self.subject = subject
         self.author_style = author_style
@@ -43,45 +89,260 @@ class NovelGenerator:
         self.generated_chapters_content = {} # Key: chapter_num, Value: full chapter text
         self.chapter_continuity_data = {} # Key: chapter_num, Value: dict with summary, char updates, timeline, emotional arc, flow_analysis
 
+        self.response_cache = ResponseCache(OLLAMA_CACHE_PATH, max_bytes=OLLAMA_CACHE_MAX_MB * 1024 * 1024, replay=OLLAMA_REPLAY_MODE)
+        self._call_local = threading.local() # Per-thread last_call_metrics, so background calls don't clobber scene metrics
+        self.prefill_baseline = None # Cold prefill rate measured on the first uncached scene
+        self.prefill_savings = {"scenes": 0, "reused_tokens": 0, "saved_seconds": 0.0}
+        self.token_estimator = TokenEstimator() # Calibrated from the first fully prefilled scene prompt
+        self.passage_index = PassageIndex() # Scene-sized chunks of finished chapters, for retrieval
+
+        # Crash-safe checkpointing (flushed after every scene and chapter)
+        self.completed_phases = [] # "foundation", "plans", "content", "transitions"
+        self.in_progress_chapter = None # {"chapter", "opener_text", "chapter_prose", "next_scene_index"}
+        self.pending_continuity = None # (chapter_num, characters copy, future) of a final continuity pass in flight
+        self.journal = RunJournal(run_dir or new_run_dir(OUTPUT_DIR))
+        self.telemetry = LLMTelemetry(os.path.join(self.journal.run_dir, "llm_calls.jsonl")) # Per-call Ollama counters by stage
+        self.small_model = available_small_model(OLLAMA_SMALL_MODEL, OLLAMA_BASE_URL) # "" = everything on OLLAMA_MODEL
+        get_client().add_concurrency_listener(self.telemetry.record_concurrency) # Adaptive limit changes land in the trace
+
         print("NovelGenerator initialized.")
         print(f"  Subject: {self.subject[:100]}...")
         print(f"  Author Style: {self.author_style}")
         print(f"  Genre: {self.genre}")
         print(f"  Resume provided: {'Yes' if self.resume_content else 'No'}")
         print(f"  Number of chapters will be determined automatically.")
+        print(f"  Checkpoint directory (use with --resume): {self.journal.run_dir}")
+
+    # --- Checkpointing ---
+    def _checkpoint_state(self):
+        """Collects everything needed to rebuild the generator after a crash."""
+        return {
+            "inputs": {
+                "resume_content": self.resume_content,
+                "subject": self.subject,
+                "author_style": self.author_style,
+                "genre": self.genre,
+            },
+            "ollama_model": OLLAMA_MODEL,
+            "num_chapters": self.num_chapters,
+            "characters": self.characters,
+            "world_details": self.world_details,
+            "themes_motifs": self.themes_motifs,
+            "plot_outline": self.plot_outline,
+            "novel_title": self.novel_title,
+            "chapter_plans": self.chapter_plans,
+            "generated_chapters_content": self.generated_chapters_content,
+            "chapter_continuity_data": self.chapter_continuity_data,
+            "completed_phases": self.completed_phases,
+            "in_progress_chapter": self.in_progress_chapter,
+            "pending_continuity_chapter": self.pending_continuity[0] if self.pending_continuity else None,
+        }
 
-
-    def _ollama_generate(self, prompt, system_prompt="You are a helpful AI assistant.", temperature=0.7, top_p=0.9):
+    def _save_checkpoint(self):
+        """Flushes the current state to the run journal (atomic rename)."""
+        try:
+            self.journal.save(self._checkpoint_state())
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Warning: Could not write checkpoint to {self.journal.path}: {e}")
+
+    def _mark_phase_complete(self, phase):
+        if phase not in self.completed_phases:
+            self.completed_phases.append(phase)
+        self._save_checkpoint()
+
+    @classmethod
+    def resume_from_checkpoint(cls, run_dir):
+        """Rebuilds a generator from the journal in run_dir. Returns None if there is nothing to resume."""
+        state = RunJournal(run_dir).load()
+        if state is None:
+            print(f"ERROR: No checkpoint journal found in '{run_dir}'.")
+            return None
+
+        inputs = state["inputs"]
+        generator = cls(inputs["resume_content"], inputs["subject"], inputs["author_style"], inputs["genre"], run_dir=run_dir)
+        generator.num_chapters = state.get("num_chapters", 0)
+        generator.characters = state.get("characters", {})
+        generator.world_details = state.get("world_details", generator.world_details)
+        generator.themes_motifs = state.get("themes_motifs", generator.themes_motifs)
+        generator.plot_outline = state.get("plot_outline", "")
+        generator.novel_title = state.get("novel_title", generator.novel_title)
+        generator.chapter_plans = int_keys(state.get("chapter_plans"))
+        generator.generated_chapters_content = int_keys(state.get("generated_chapters_content"))
+        generator.chapter_continuity_data = int_keys(state.get("chapter_continuity_data"))
+        generator.completed_phases = state.get("completed_phases", [])
+        generator.in_progress_chapter = state.get("in_progress_chapter")
+        if state.get("pending_continuity_chapter"):
+            generator.pending_continuity = (state["pending_continuity_chapter"], None, None) # Rerun inline on resume
+
+        print(f"Resumed run from '{run_dir}' (saved {state.get('journal_saved_at', 'unknown')}).")
+        print(f"  Completed phases: {', '.join(generator.completed_phases) or 'none'}")
+        print(f"  Chapters finished: {len(generator.generated_chapters_content)} of {generator.num_chapters}")
+        if generator.in_progress_chapter:
+            print(f"  In-progress: Chapter {generator.in_progress_chapter['chapter']}, next scene {generator.in_progress_chapter['next_scene_index'] + 1}")
+        return generator
+
+
+    @property
+    def last_call_metrics(self):
+        """Ollama timing counters of the calling thread's most recent uncached call."""
+        return getattr(self._call_local, "metrics", None)
+
+    @last_call_metrics.setter
+    def last_call_metrics(self, metrics):
+        self._call_local.metrics = metrics
+
+    def _model_for(self, stage):
+        """The model a call of this stage goes to: the small model for model_routing's "small" stages."""
+        return model_for(stage, OLLAMA_MODEL, self.small_model)
+
+    def _ollama_generate(self, prompt, system_prompt="You are a helpful AI assistant.", temperature=0.7, top_p=0.9, seed=None, use_chat=False, stage="other"):
         """
         Helper function to make API calls to the Ollama server.
+        Successful responses are memoized in the persistent response cache.
+        With use_chat the call goes to the chat endpoint as a system + user message pair.
+        Every answered call is recorded in self.telemetry under the given pipeline stage.
         """
+        self.last_call_metrics = None
+        call_start = time.time()
+        if seed is None:
+            seed = OLLAMA_SEED
+        model = self._model_for(stage)
+        tier = effective_tier(model, OLLAMA_MODEL)
+        cache_key = make_cache_key(model, system_prompt, prompt, temperature, top_p, seed)
+        cached_response = self.response_cache.get(cache_key)
+        if cached_response is not None:
+            self.telemetry.record(stage, None, time.time() - call_start, model, cached=True, tier=tier)
+            return cached_response
+        if self.response_cache.replay:
+            print(f"ERROR: Replay mode is on but no cached response exists for prompt: {prompt[:100]}...")
+            return f"[OLLAMA CACHE MISS (replay mode) for prompt: {prompt[:100]}...]"
+
+        def upstream(): # Runs once per in-flight key; identical concurrent calls wait for it
+            payload = self._build_ollama_payload(prompt, system_prompt, temperature, top_p, seed, model=model, use_chat=use_chat)
+            # print(f"\n--- Sending Prompt to LLM ({model}) ---\n{prompt[:300]}...\n---") # Debug: Show prompt start
+            try:
+                response = get_client().post(OLLAMA_CHAT_URL if use_chat else OLLAMA_BASE_URL, json=payload, timeout=OLLAMA_TIMEOUT)
+                response.raise_for_status()
+                # print(f"--- LLM Response Received ---\n{response.json()['response'][:300]}...\n---") # Debug: Show response start
+                response_data = response.json()
+                response_text = (response_data["message"]["content"] if use_chat else response_data["response"]).strip()
+                self.last_call_metrics = call_metrics(response_data)
+                self.telemetry.record(stage, self.last_call_metrics, time.time() - call_start, model, tier=tier)
+                self.response_cache.put(cache_key, response_text)
+                return response_text
+            except requests.exceptions.Timeout:
+                print(f"ERROR: Ollama request timed out after {OLLAMA_TIMEOUT} seconds for prompt: {prompt[:100]}...")
+                return f"[OLLAMA TIMEOUT ERROR for prompt: {prompt[:100]}...]"
+            except requests.exceptions.RequestException as e:
+                print(f"ERROR: Ollama request failed: {e} for prompt: {prompt[:100]}...")
+                return f"[OLLAMA REQUEST ERROR: {e} for prompt: {prompt[:100]}...]"
+            except json.JSONDecodeError as e:
+                print(f"ERROR: Failed to decode JSON response from Ollama: {e}")
+                print(f"Raw response text: {response.text}")
+                return f"[OLLAMA JSON DECODE ERROR for prompt: {prompt[:100]}...]"
+
+        response_text, shared = get_single_flight().do(cache_key, upstream)
+        if shared:
+            self.telemetry.record(stage, None, time.time() - call_start, model, cached=True, tier=tier, coalesced=True)
+        return response_text
+
+    def _build_ollama_payload(self, prompt, system_prompt, temperature, top_p, seed, model=None, stream=False, use_chat=False):
         payload = {
-            "model": OLLAMA_MODEL,
+            "model": model or OLLAMA_MODEL,
             "prompt": prompt,
             "system": system_prompt,
-            "stream": False,
+            "stream": stream,
             "options": {
                 "temperature": temperature,
                 "top_p": top_p,
-                # "num_ctx": 8192 # Example: Adjust context window if needed and supported by model like Llama3
+                "num_ctx": OLLAMA_NUM_CTX,
             }
         }
-        # print(f"\n--- Sending Prompt to LLM ({OLLAMA_MODEL}) ---\n{prompt[:300]}...\n---") # Debug: Show prompt start
-        try:
-            response = requests.post(OLLAMA_BASE_URL, json=payload, timeout=OLLAMA_TIMEOUT)
-            response.raise_for_status()
-            # print(f"--- LLM Response Received ---\n{response.json()['response'][:300]}...\n---") # Debug: Show response start
-            return response.json()["response"].strip()
-        except requests.exceptions.Timeout:
-            print(f"ERROR: Ollama request timed out after {OLLAMA_TIMEOUT} seconds for prompt: {prompt[:100]}...")
-            return f"[OLLAMA TIMEOUT ERROR for prompt: {prompt[:100]}...]"
-        except requests.exceptions.RequestException as e:
-            print(f"ERROR: Ollama request failed: {e} for prompt: {prompt[:100]}...")
-            return f"[OLLAMA REQUEST ERROR: {e} for prompt: {prompt[:100]}...]"
-        except json.JSONDecodeError as e:
-            print(f"ERROR: Failed to decode JSON response from Ollama: {e}")
-            print(f"Raw response text: {response.text}")
-            return f"[OLLAMA JSON DECODE ERROR for prompt: {prompt[:100]}...]"
+        if seed is not None:
+            payload["options"]["seed"] = seed
+        if use_chat:
+            del payload["prompt"], payload["system"]
+            payload["messages"] = [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt},
+            ]
+        return payload
+
+    def _ollama_generate_stream(self, prompt, system_prompt="You are a helpful AI assistant.", temperature=0.7, top_p=0.9, seed=None, on_token=None, stop_pattern=None, use_chat=False, stage="other"):
+        """
+        Streaming variant of _ollama_generate. Each token is passed to on_token as it arrives,
+        and generation is aborted (text truncated at the match) as soon as stop_pattern matches.
+        Shares the response cache and telemetry with _ollama_generate.
+        """
+        self.last_call_metrics = None
+        call_start = time.time()
+        if seed is None:
+            seed = OLLAMA_SEED
+        model = self._model_for(stage)
+        tier = effective_tier(model, OLLAMA_MODEL)
+        cache_key = make_cache_key(model, system_prompt, prompt, temperature, top_p, seed)
+        cached_response = self.response_cache.get(cache_key)
+        if cached_response is not None:
+            self.telemetry.record(stage, None, time.time() - call_start, model, cached=True, tier=tier)
+            if on_token: on_token(cached_response)
+            return cached_response
+        if self.response_cache.replay:
+            print(f"ERROR: Replay mode is on but no cached response exists for prompt: {prompt[:100]}...")
+            return f"[OLLAMA CACHE MISS (replay mode) for prompt: {prompt[:100]}...]"
+
+        def upstream(): # Runs once per in-flight key; identical concurrent calls wait for it
+            payload = self._build_ollama_payload(prompt, system_prompt, temperature, top_p, seed, model=model, stream=True, use_chat=use_chat)
+            generated_text = ""
+            start_time = time.time()
+            first_token_time = None
+            stream = get_client().stream(OLLAMA_CHAT_URL if use_chat else OLLAMA_BASE_URL, json=payload, timeout=OLLAMA_TIMEOUT)
+            try:
+                for chunk in stream:
+                    if chunk.get("done"):
+                        self.last_call_metrics = call_metrics(chunk) # Only the final chunk carries the counters
+                    token = chunk.get("message", {}).get("content", "") if use_chat else chunk.get("response", "")
+                    if not token:
+                        continue
+                    if first_token_time is None:
+                        first_token_time = time.time() - start_time
+                    previous_length = len(generated_text)
+                    generated_text += token
+                    if stop_pattern:
+                        # Only rescan the tail that could contain a newly completed match
+                        stop_match = stop_pattern.search(generated_text, max(0, previous_length - 64))
+                        if stop_match:
+                            generated_text = generated_text[:stop_match.start()]
+                            if on_token and len(generated_text) > previous_length:
+                                on_token(generated_text[previous_length:])
+                            print(f"\n    (Stop condition hit after {len(generated_text)} chars; aborting generation.)")
+                            break
+                    if on_token:
+                        on_token(token)
+            except requests.exceptions.Timeout:
+                print(f"ERROR: Ollama stream timed out after {OLLAMA_TIMEOUT} seconds for prompt: {prompt[:100]}...")
+                return f"[OLLAMA TIMEOUT ERROR for prompt: {prompt[:100]}...]"
+            except requests.exceptions.RequestException as e:
+                print(f"ERROR: Ollama streaming request failed: {e} for prompt: {prompt[:100]}...")
+                return f"[OLLAMA REQUEST ERROR: {e} for prompt: {prompt[:100]}...]"
+            except json.JSONDecodeError as e:
+                print(f"ERROR: Failed to decode streamed JSON chunk from Ollama: {e}")
+                return f"[OLLAMA JSON DECODE ERROR for prompt: {prompt[:100]}...]"
+            finally:
+                stream.close() # Closes the HTTP response so an aborted generation stops server-side
+
+            if first_token_time is not None:
+                print(f"\n    (First token after {first_token_time:.1f}s, finished in {time.time() - start_time:.1f}s)")
+            # Without the final chunk (stop pattern hit) there are no counters, but the wall time still counts
+            self.telemetry.record(stage, self.last_call_metrics, time.time() - call_start, model, tier=tier)
+            response_text = generated_text.strip()
+            self.response_cache.put(cache_key, response_text)
+            return response_text
+
+        response_text, shared = get_single_flight().do(cache_key, upstream)
+        if shared:
+            self.telemetry.record(stage, None, time.time() - call_start, model, cached=True, tier=tier, coalesced=True)
+            if on_token and not response_text.startswith("[OLLAMA"): on_token(response_text)
+        return response_text
 
     def _parse_character_profiles(self, text_block):
         """
@@ -192,7 +453,7 @@ class NovelGenerator:
 
         Ensure characters are relatable and have depth.
         """
-        character_profiles_text = self._ollama_generate(char_prompt, char_system_prompt, temperature=0.75)
+        character_profiles_text = self._ollama_generate(char_prompt, char_system_prompt, temperature=0.75, stage="foundation")
         if "[OLLAMA" in character_profiles_text: 
             print(f"ERROR generating character profiles: {character_profiles_text}")
         else:
@@ -213,7 +474,7 @@ class NovelGenerator:
         4.  ATMOSPHERE/TONE: [Describe the overall mood and feeling of the world (e.g., oppressive, wondrous, decaying, futuristic, magical)]
         5.  KEY RULES/LAWS (if applicable, e.g., for magic systems, societal structure): [List 1-3 fundamental rules that govern this world or its unique aspects]
         """
-        world_details_text = self._ollama_generate(world_prompt, world_system_prompt, temperature=0.65)
+        world_details_text = self._ollama_generate(world_prompt, world_system_prompt, temperature=0.65, stage="foundation")
         if "[OLLAMA" in world_details_text:
             print(f"ERROR generating world details: {world_details_text}")
         else:
@@ -248,7 +509,7 @@ class NovelGenerator:
         1.  CORE THEMES (2-4): [List abstract concepts the story will explore, e.g., "Loss and Memory," "Identity vs. Society." Provide a brief (1-sentence) explanation for each, linking it to the context.]
         2.  RECURRING MOTIFS (3-5): [List concrete symbols, objects, phrases, or imagery. e.g., "A cracked pocket watch," "The phrase 'shadows remember'."]
         """
-        themes_motifs_text = self._ollama_generate(themes_prompt, themes_system_prompt, temperature=0.6)
+        themes_motifs_text = self._ollama_generate(themes_prompt, themes_system_prompt, temperature=0.6, stage="foundation")
         if "[OLLAMA" in themes_motifs_text:
             print(f"ERROR generating themes/motifs: {themes_motifs_text}")
         else:
@@ -287,7 +548,7 @@ class NovelGenerator:
         SUGGESTED_CHAPTER_COUNT: [Number] (e.g., SUGGESTED_CHAPTER_COUNT: 20)
         This number should be reasonable for a novel of this nature, typically between 10 and 35 chapters.
         """
-        self.plot_outline = self._ollama_generate(plot_prompt, plot_system_prompt, temperature=0.7)
+        self.plot_outline = self._ollama_generate(plot_prompt, plot_system_prompt, temperature=0.7, stage="foundation")
         
         if "[OLLAMA" in self.plot_outline:
             print(f"ERROR generating plot outline: {self.plot_outline}")
@@ -373,7 +634,7 @@ class NovelGenerator:
         Do not include the "SUGGESTED_CHAPTER_COUNT" line in this response.
         """
         print(f"Generating detailed plan text for {self.num_chapters} chapters (this may take a while)...")
-        full_detailed_plan_text = self._ollama_generate(detailed_plan_prompt, system_prompt, temperature=0.65)
+        full_detailed_plan_text = self._ollama_generate(detailed_plan_prompt, system_prompt, temperature=0.65, stage="plan")
 
         if "[OLLAMA" in full_detailed_plan_text:
             print(f"ERROR generating detailed chapter plans: {full_detailed_plan_text}")
@@ -446,38 +707,41 @@ class NovelGenerator:
     def _get_continuity_context_for_chapter(self, chapter_num):
         """
         Gathers all relevant context from previous chapters and plans for generating the current chapter.
+        Sections are prioritized; the lowest-priority ones are trimmed or dropped first so the context
+        stays within CONTINUITY_CONTEXT_TOKEN_BUDGET however long the novel grows.
         """
-        context = f"Overall Novel Subject: {self.subject}\n"
-        context += f"Author Style: {self.author_style}, Genre: {self.genre}\n"
-        context += f"High-Level Plot Outline:\n{self.plot_outline}\n\n" # Already cleaned from SUGGESTED_CHAPTER_COUNT
-        context += f"World Details: {json.dumps(self.world_details)}\n"
-        context += f"Themes & Motifs: {json.dumps(self.themes_motifs)}\n\n"
+        builder = ContextBuilder(CONTINUITY_CONTEXT_TOKEN_BUDGET, self.token_estimator, label=f"Chapter {chapter_num} context")
+        builder.add("novel header", f"Overall Novel Subject: {self.subject}\nAuthor Style: {self.author_style}, Genre: {self.genre}\n", priority=100, required=True)
+        builder.add("plot outline", f"{self.plot_outline}\n\n", priority=70, trim="head", header="High-Level Plot Outline:\n") # Already cleaned from SUGGESTED_CHAPTER_COUNT
+        builder.add("world details", f"{json.dumps(self.world_details)}\n", priority=45, trim="head", header="World Details: ")
+        builder.add("themes & motifs", f"{json.dumps(self.themes_motifs)}\n\n", priority=40, trim="head", header="Themes & Motifs: ")
 
-        context += "Character Profiles & Current Status (as of start of this chapter):\n"
+        builder.add("character heading", "Character Profiles & Current Status (as of start of this chapter):\n", priority=100, required=True)
         for name, data in self.characters.items():
-            context += f"- {name} ({data.get('role','N/A')}):\n"
-            context += f"  Description: {data.get('description','N/A')}\n"
-            context += f"  Motivations: {data.get('motivation','N/A')}. Initial Arc: {data.get('arc_summary','N/A')}\n"
-            context += f"  Current Status: {data.get('current_status','unknown')}, Location: {data.get('current_location','unknown')}, Emotion: {data.get('emotional_state','unknown')}\n"
-            context += f"  Known Facts: {', '.join(data.get('knowledge',[]))}\n"
+            rank = 5 if "protagonist" in str(data.get('role', '')).lower() else 0 # Protagonist details outlast supporting cast
+            builder.add(f"{name} name", f"- {name} ({data.get('role','N/A')}):\n", priority=85 + rank)
+            builder.add(f"{name} profile", f"  Description: {data.get('description','N/A')}\n"
+                        f"  Motivations: {data.get('motivation','N/A')}. Initial Arc: {data.get('arc_summary','N/A')}\n", priority=60 + rank, trim="head")
+            builder.add(f"{name} status", f"  Current Status: {data.get('current_status','unknown')}, Location: {data.get('current_location','unknown')}, Emotion: {data.get('emotional_state','unknown')}\n", priority=85 + rank)
+            builder.add(f"{name} known facts", f"{', '.join(data.get('knowledge',[]))}\n", priority=50 + rank, trim="tail", header="  Known Facts: ")
             if data.get('development_log'):
                 relevant_logs = [log for log in data['development_log'] if log['chapter'] < chapter_num]
                 if relevant_logs:
                     last_dev = relevant_logs[-1]
-                    context += f"  Last Noted Development (Ch {last_dev['chapter']}): {last_dev.get('summary', 'N/A')}\n"
-        context += "\n"
+                    builder.add(f"{name} last development", f"  Last Noted Development (Ch {last_dev['chapter']}): {last_dev.get('summary', 'N/A')}\n", priority=75 + rank, trim="head")
+        builder.add("character spacing", "\n", priority=100, required=True)
 
         if chapter_num > 1:
             prev_chap_num = chapter_num - 1
             prev_continuity = self.chapter_continuity_data.get(prev_chap_num, {})
             prev_plan = self.chapter_plans.get(prev_chap_num, {})
-            context += f"Summary of Previous Chapter ({prev_chap_num} - '{prev_plan.get('title', 'Untitled')}'):\n"
-            context += f"{prev_continuity.get('summary', 'N/A')}\n"
-            context += f"Ended with Emotional Tone: {prev_continuity.get('emotional_tone_end_achieved_in_summary', 'N/A')}\n" # Use the one from continuity
-            context += f"Timeline at end of Ch {prev_chap_num}: {prev_continuity.get('timeline_end', 'N/A')}\n"
-            context += f"Hook for current chapter (from prev chapter's plan): {prev_plan.get('connection_to_next', 'N/A')}\n\n"
-        
-        return context
+            builder.add("previous chapter summary", f"{prev_continuity.get('summary', 'N/A')}\n", priority=90, trim="tail",
+                        header=f"Summary of Previous Chapter ({prev_chap_num} - '{prev_plan.get('title', 'Untitled')}'):\n")
+            builder.add("previous chapter ending", f"Ended with Emotional Tone: {prev_continuity.get('emotional_tone_end_achieved_in_summary', 'N/A')}\n"
+                        f"Timeline at end of Ch {prev_chap_num}: {prev_continuity.get('timeline_end', 'N/A')}\n"
+                        f"Hook for current chapter (from prev chapter's plan): {prev_plan.get('connection_to_next', 'N/A')}\n\n", priority=95, required=True)
+
+        return builder.build()
 
     def _generate_chapter_opener(self, chapter_num, current_chapter_plan):
         """Generates the opening paragraph(s) for the current chapter."""
@@ -522,20 +786,31 @@ class NovelGenerator:
 
         Opening paragraph(s) for Chapter {chapter_num}:
         """
-        opener_text = self._ollama_generate(prompt, system_prompt, temperature=0.68)
+        opener_text = self._ollama_generate(prompt, system_prompt, temperature=0.68, stage="opener")
         # Prepend the title line to the generated opener text
         return f"{chapter_title_line}\n\n{opener_text}\n\n"
 
 
-    def _generate_scene_prose(self, chapter_num, scene_index, scene_description, current_chapter_plan, continuity_context, previous_scene_prose=""):
-        """Generates prose for a single scene within a chapter."""
+    def _generate_scene_prose(self, chapter_num, scene_index, scene_description, current_chapter_plan, continuity_context, previous_scene_prose="", on_token=None):
+        """Generates prose for a single scene within a chapter. Streams tokens to on_token when OLLAMA_STREAM_SCENES is on."""
         system_prompt = f"You are a celebrated novelist in the style of {self.author_style}, writing a {self.genre} novel. Your prose is vivid, emotionally resonant, and drives the plot forward. You excel at 'showing, not telling' and making fantastical elements relatable."
         
         motif_to_weave = "N/A"
         if self.themes_motifs.get("motifs") and len(self.themes_motifs["motifs"]) > 0 :
             motif_to_weave = self.themes_motifs["motifs"][(chapter_num + scene_index -1) % len(self.themes_motifs["motifs"])]
 
-        prompt = f"""
+        # Scene-specific, so it goes in the per-scene request rather than the reusable chapter context
+        relevant_passages = self.passage_index.relevant_passages_text(scene_description, k=RELEVANT_PASSAGES_K, exclude_chapters=(chapter_num - 1, chapter_num))
+        relevant_passages_block = ""
+        if relevant_passages:
+            relevant_passages_block = f"""
+        Relevant passages from EARLIER chapters (keep callbacks consistent with them; do not repeat them):
+        ---
+        {relevant_passages}
+        ---
+"""
+
+        chapter_context = f"""
         {continuity_context}
 
         Current Chapter Plan ({chapter_num} - "{current_chapter_plan.get('title', 'Untitled')}"):
@@ -545,12 +820,13 @@ class NovelGenerator:
         - Plot Advancement for this chapter: {current_chapter_plan.get('plot_advancement', 'N/A')}
         - Planned Emotional Tone (End of Chapter): {current_chapter_plan.get('emotional_tone_end', 'N/A')}
         - Timeline & Pacing for this chapter: {current_chapter_plan.get('timeline_pacing', 'N/A')}
-        
+        """
+        scene_request = f"""        
         Prose written SO FAR in THIS CHAPTER (before this scene):
         ---
         {previous_scene_prose[-2000:] if previous_scene_prose else "This is the first scene of the chapter (after the chapter title and opener)."} 
         ---
-
+{relevant_passages_block}
         YOUR TASK: Write the narrative prose for THE FOLLOWING SPECIFIC SCENE ONLY.
         Scene {scene_index + 1} Description (from chapter plan): "{scene_description}"
 
@@ -568,9 +844,51 @@ class NovelGenerator:
 
         Begin Scene {scene_index + 1} prose now:
         """
-        scene_prose = self._ollama_generate(prompt, system_prompt, temperature=0.72, top_p=0.92)
+        if OLLAMA_SCENE_PREFIX_REUSE:
+            # Identical for every scene of the chapter, so Ollama can serve this prefix from its KV cache
+            system_prompt = f"{system_prompt}\n\nSTORY AND CHAPTER CONTEXT:\n{chapter_context}"
+            prompt = scene_request
+        else:
+            prompt = chapter_context + scene_request
+
+        if OLLAMA_STREAM_SCENES:
+            scene_prose = self._ollama_generate_stream(prompt, system_prompt, temperature=0.72, top_p=0.92, on_token=on_token, stop_pattern=SCENE_STOP_PATTERN, use_chat=OLLAMA_SCENE_PREFIX_REUSE, stage="scene")
+        else:
+            scene_prose = self._ollama_generate(prompt, system_prompt, temperature=0.72, top_p=0.92, use_chat=OLLAMA_SCENE_PREFIX_REUSE, stage="scene")
+        self._record_scene_prefill(len(system_prompt) + len(prompt))
         return scene_prose
 
+    def _record_scene_prefill(self, prompt_chars):
+        """
+        Reports how much prefill the last scene call needed. The first uncached scene of the run is the cold
+        baseline (whole prompt prefilled); for later scenes the tokens Ollama did not have to evaluate are
+        estimated from that baseline's tokens-per-char and priced at its seconds-per-token.
+        """
+        metrics = self.last_call_metrics
+        if not metrics or not metrics["prompt_eval_count"]:
+            return # Served from the response cache, or the stream was aborted before the final counters
+        evaluated = metrics["prompt_eval_count"]
+        if self.prefill_baseline is None:
+            self.prefill_baseline = {
+                "tokens_per_char": evaluated / prompt_chars,
+                "seconds_per_token": metrics["prompt_eval_seconds"] / evaluated,
+            }
+            self.token_estimator.calibrate(prompt_chars, evaluated)
+            print(f"    (Prefill: {evaluated} prompt tokens in {metrics['prompt_eval_seconds']:.2f}s, cold baseline)")
+            return
+        expected = int(prompt_chars * self.prefill_baseline["tokens_per_char"])
+        reused = max(0, expected - evaluated)
+        saved_seconds = reused * self.prefill_baseline["seconds_per_token"]
+        self.prefill_savings["scenes"] += 1
+        self.prefill_savings["reused_tokens"] += reused
+        self.prefill_savings["saved_seconds"] += saved_seconds
+        print(f"    (Prefill: {evaluated} new prompt tokens in {metrics['prompt_eval_seconds']:.2f}s; ~{reused} cached tokens reused, ~{saved_seconds:.1f}s saved)")
+
+    def _index_chapter(self, chapter_num, content):
+        """Adds a finished chapter to the passage index used for retrieval in later scenes."""
+        if content and not content.startswith("[ERROR"):
+            self.passage_index.add_chapter(chapter_num, content)
+
     def _analyze_inter_chapter_flow(self, previous_chapter_num, current_chapter_num, current_chapter_opening_text):
         """
         Analyzes the narrative flow between the end of the previous chapter and the start of the current chapter.
@@ -624,7 +942,7 @@ class NovelGenerator:
         Be concise and constructive.
         Flow Analysis:
         """
-        flow_analysis_text = self._ollama_generate(prompt, system_prompt, temperature=0.5)
+        flow_analysis_text = self._ollama_generate(prompt, system_prompt, temperature=0.5, stage="flow-analysis")
         print(f"    Flow Analysis Result: {flow_analysis_text[:200]}...") # Print a snippet
 
         # Store the analysis
@@ -635,13 +953,20 @@ class NovelGenerator:
         return flow_analysis_text
 
 
-    def _update_chapter_continuity_data(self, chapter_num, full_chapter_content, is_final_pass_for_chapter=False):
+    def _update_chapter_continuity_data(self, chapter_num, full_chapter_content, is_final_pass_for_chapter=False, characters=None):
         """
         Analyzes generated chapter content to update continuity data (summary, character states, timeline, emotion).
         This is CRITICAL for informing the next chapter's generation.
+        With characters (a copy of self.characters) the pass is detached: character updates go into that copy and
+        the entry is only returned, so it can run on a worker thread while the next chapter is drafted.
         """
         print(f"Updating continuity data for Chapter {chapter_num} ({'final pass' if is_final_pass_for_chapter else 'interim pass'})...")
-        entry = self.chapter_continuity_data.get(chapter_num, {}) 
+        detached = characters is not None
+        if characters is None:
+            characters = self.characters
+        entry = self.chapter_continuity_data.get(chapter_num, {})
+        if detached:
+            entry = dict(entry)
 
         summary_system_prompt = "You are a literary analyst. Your task is to summarize chapter content accurately and concisely for continuity purposes."
         summary_prompt = f"""
@@ -654,7 +979,7 @@ class NovelGenerator:
         ---
         Detailed Summary of Chapter {chapter_num}:
         """
-        entry["summary"] = self._ollama_generate(summary_prompt, summary_system_prompt, temperature=0.5)
+        entry["summary"] = self._ollama_generate(summary_prompt, summary_system_prompt, temperature=0.5, stage="continuity")
 
         if is_final_pass_for_chapter: # Character updates only on final pass
             active_chars_in_chapter = []
@@ -667,14 +992,14 @@ class NovelGenerator:
                         potential_names = re.split(r'[,\s]+and\s+|\s*,\s*|[,\s]+with\s+', names_str)
                         for char_name_candidate in potential_names:
                             clean_name = char_name_candidate.strip().rstrip('.').strip()
-                            if clean_name and clean_name in self.characters and clean_name not in active_chars_in_chapter:
+                            if clean_name and clean_name in characters and clean_name not in active_chars_in_chapter:
                                 active_chars_in_chapter.append(clean_name)
                 char_dev_focus = current_chapter_plan.get("character_development", "")
-                for char_name in self.characters.keys():
+                for char_name in characters.keys():
                     if re.search(r'\b' + re.escape(char_name) + r'\b', char_dev_focus, re.IGNORECASE) and char_name not in active_chars_in_chapter:
                          active_chars_in_chapter.append(char_name)
             
-            if not active_chars_in_chapter: active_chars_in_chapter = list(self.characters.keys())
+            if not active_chars_in_chapter: active_chars_in_chapter = list(characters.keys())
 
             char_update_system_prompt = "You are a narrative continuity expert. Update character states based on chapter events."
             char_update_prompt = f"""
@@ -696,7 +1021,7 @@ class NovelGenerator:
             
             Format clearly for each character.
             """
-            character_updates_text = self._ollama_generate(char_update_prompt, char_update_system_prompt, temperature=0.55)
+            character_updates_text = self._ollama_generate(char_update_prompt, char_update_system_prompt, temperature=0.55, stage="continuity")
             entry["character_updates_text"] = character_updates_text
             
             current_char_name_update = None
@@ -705,20 +1030,20 @@ class NovelGenerator:
                 line = line.strip()
                 name_match = re.match(r"CHARACTER NAME:\s*(.*)", line, re.IGNORECASE)
                 if name_match:
-                    if current_char_name_update and parsed_updates_for_log and current_char_name_update in self.characters:
-                        self.characters[current_char_name_update]["development_log"].append(
+                    if current_char_name_update and parsed_updates_for_log and current_char_name_update in characters:
+                        characters[current_char_name_update]["development_log"].append(
                             {"chapter": chapter_num, "summary": "Updates from chapter events", **parsed_updates_for_log}
                         )
                     current_char_name_update = name_match.group(1).strip()
                     parsed_updates_for_log = {} 
-                    if current_char_name_update not in self.characters:
+                    if current_char_name_update not in characters:
                         current_char_name_update = None 
-                    elif self.characters[current_char_name_update].get("first_appearance_chapter", 0) == 0:
-                         self.characters[current_char_name_update]["first_appearance_chapter"] = chapter_num
+                    elif characters[current_char_name_update].get("first_appearance_chapter", 0) == 0:
+                         characters[current_char_name_update]["first_appearance_chapter"] = chapter_num
                     continue
 
-                if current_char_name_update and current_char_name_update in self.characters:
-                    char_obj = self.characters[current_char_name_update]
+                if current_char_name_update and current_char_name_update in characters:
+                    char_obj = characters[current_char_name_update]
                     def get_value(text, key_phrase):
                         if text.upper().startswith(key_phrase.upper()):
                             val = text.split(":",1)[1].strip()
@@ -756,8 +1081,8 @@ class NovelGenerator:
                             char_obj["knowledge"].append(know_val)
                         parsed_updates_for_log["new_knowledge"] = know_val if know_val is not None else "No change"
                         continue
-            if current_char_name_update and parsed_updates_for_log and current_char_name_update in self.characters: 
-                self.characters[current_char_name_update]["development_log"].append(
+            if current_char_name_update and parsed_updates_for_log and current_char_name_update in characters: 
+                characters[current_char_name_update]["development_log"].append(
                     {"chapter": chapter_num, "summary": "Updates from chapter events", **parsed_updates_for_log}
                 )
 
@@ -777,7 +1102,7 @@ class NovelGenerator:
         END_TIME: [answer]
         MARKERS: [answer]
         """
-        timeline_text = self._ollama_generate(timeline_prompt, timeline_system_prompt, temperature=0.4)
+        timeline_text = self._ollama_generate(timeline_prompt, timeline_system_prompt, temperature=0.4, stage="continuity")
         entry["timeline_elapsed"] = re.search(r"ELAPSED:\s*(.*)", timeline_text, re.IGNORECASE).group(1).strip() if re.search(r"ELAPSED:\s*(.*)", timeline_text, re.IGNORECASE) else "N/A"
         entry["timeline_end"] = re.search(r"END_TIME:\s*(.*)", timeline_text, re.IGNORECASE).group(1).strip() if re.search(r"END_TIME:\s*(.*)", timeline_text, re.IGNORECASE) else "N/A"
         entry["timeline_markers"] = re.search(r"MARKERS:\s*(.*)", timeline_text, re.IGNORECASE).group(1).strip() if re.search(r"MARKERS:\s*(.*)", timeline_text, re.IGNORECASE) else "N/A"
@@ -788,7 +1113,38 @@ class NovelGenerator:
             entry["ending_hook_text"] = "N/A (Last chapter or hook not generated)"
 
 
-        self.chapter_continuity_data[chapter_num] = entry
+        if not detached:
+            self.chapter_continuity_data[chapter_num] = entry
+        return entry
+
+    def _reconcile_pending_continuity(self):
+        """
+        Waits for the background final continuity pass (if any) and folds its result in: the chapter's
+        continuity entry and the updated characters. Returns True if any character's status, location or
+        emotional state differs from the snapshot the current chapter was started from.
+        """
+        if not self.pending_continuity:
+            return False
+        chapter_num, characters, future = self.pending_continuity
+        self.pending_continuity = None
+        entry = None
+        if future is not None:
+            try:
+                entry = future.result()
+            except Exception as e:
+                print(f"  Warning: Background continuity pass for Chapter {chapter_num} failed ({e}); rerunning it inline.")
+        if entry is None:
+            characters = copy.deepcopy(self.characters)
+            entry = self._update_chapter_continuity_data(chapter_num, self.generated_chapters_content[chapter_num], True, characters)
+
+        changed = [name for name, data in characters.items()
+                   if any(data.get(field) != self.characters.get(name, {}).get(field) for field in CHARACTER_STATE_FIELDS)]
+        self.characters = characters
+        self.chapter_continuity_data.setdefault(chapter_num, {}).update(entry)
+        self._save_checkpoint()
+        if changed:
+            print(f"  Reconciled Chapter {chapter_num} continuity: updated state for {', '.join(changed)}.")
+        return bool(changed)
 
     def _generate_chapter_transition_hook(self, chapter_num, current_chapter_content, current_chapter_continuity):
         """Generates the transition hook/paragraph(s) for the end of the current chapter."""
@@ -826,7 +1182,7 @@ class NovelGenerator:
 
         Final transition paragraph(s) for Chapter {chapter_num}:
         """
-        hook_text = self._ollama_generate(prompt, system_prompt, temperature=0.75)
+        hook_text = self._ollama_generate(prompt, system_prompt, temperature=0.75, stage="hook")
         # Store the generated hook in the current chapter's continuity data
         if chapter_num in self.chapter_continuity_data:
             self.chapter_continuity_data[chapter_num]["ending_hook_text"] = hook_text.strip()
@@ -845,26 +1201,55 @@ class NovelGenerator:
             print("ERROR: Cannot generate novel content without detailed chapter plans or chapter count.")
             return False
 
+        for chapter_num, content in self.generated_chapters_content.items(): # Chapters restored from a checkpoint
+            self._index_chapter(chapter_num, content)
+        self._reconcile_pending_continuity() # A final pass interrupted by a crash is rerun inline
+
+        continuity_worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="continuity") if OLLAMA_PIPELINE_CHAPTERS else None
+        try:
+            self._generate_chapters(continuity_worker)
+        finally:
+            if continuity_worker:
+                continuity_worker.shutdown(wait=True)
+        self._reconcile_pending_continuity()
+        return True
+
+    def _generate_chapters(self, continuity_worker):
+        """Chapter loop of generate_novel_content; with a continuity_worker, final passes overlap the next chapter."""
         for i in range(1, self.num_chapters + 1):
+            if i in self.generated_chapters_content:
+                print(f"\n--- Chapter {i} restored from checkpoint, skipping ---")
+                continue
+
             print(f"\n--- Generating Chapter {i} of {self.num_chapters} ---")
             current_chapter_plan = self.chapter_plans.get(i)
             if not current_chapter_plan:
                 print(f"ERROR: No plan found for Chapter {i}. Skipping.")
                 self.generated_chapters_content[i] = f"[ERROR: No plan found for Chapter {i}]"
                 self.chapter_continuity_data[i] = {"summary": "Error: No plan.", "character_updates_text": "", "timeline_end": "Unknown", "emotional_tone_end_achieved_in_summary": "Error", "ending_hook_text": "", "flow_analysis_from_previous": "N/A"}
+                self._save_checkpoint()
                 continue
 
             continuity_context = self._get_continuity_context_for_chapter(i)
             
-            # Generate chapter opener (includes title line)
-            chapter_opener_text_with_title = self._generate_chapter_opener(i, current_chapter_plan)
-            
-            # Initialize chapter_prose with the opener 
-            chapter_prose = chapter_opener_text_with_title 
-            
-            # Analyze flow from previous chapter to this chapter's opening
-            if i > 1:
-                self._analyze_inter_chapter_flow(i - 1, i, chapter_opener_text_with_title) 
+            resumed_chapter = self.in_progress_chapter if self.in_progress_chapter and self.in_progress_chapter.get("chapter") == i else None
+            if resumed_chapter:
+                print(f"  Resuming Chapter {i} from checkpoint at scene {resumed_chapter['next_scene_index'] + 1}.")
+                chapter_opener_text_with_title = resumed_chapter["opener_text"]
+                chapter_prose = resumed_chapter["chapter_prose"]
+            else:
+                # Generate chapter opener (includes title line)
+                chapter_opener_text_with_title = self._generate_chapter_opener(i, current_chapter_plan)
+                
+                # Initialize chapter_prose with the opener 
+                chapter_prose = chapter_opener_text_with_title 
+                
+                # Analyze flow from previous chapter to this chapter's opening
+                if i > 1:
+                    self._analyze_inter_chapter_flow(i - 1, i, chapter_opener_text_with_title) 
+
+                self.in_progress_chapter = {"chapter": i, "opener_text": chapter_opener_text_with_title, "chapter_prose": chapter_prose, "next_scene_index": 0}
+                self._save_checkpoint()
 
             scenes = current_chapter_plan.get("scenes", [])
             if not scenes:
@@ -872,18 +1257,34 @@ class NovelGenerator:
                 if chapter_prose.strip() == chapter_opener_text_with_title.strip(): 
                      chapter_prose += "\n\n[This chapter's plan had no specific scenes. The narrative continues based on the chapter goal.]\n\n"
             else:
-                accumulated_scene_prose_for_chapter = chapter_opener_text_with_title 
+                accumulated_scene_prose_for_chapter = chapter_prose # Opener plus any scenes restored from checkpoint
+                first_scene_idx = self.in_progress_chapter["next_scene_index"]
                 for scene_idx, scene_desc in enumerate(scenes):
+                    if scene_idx < first_scene_idx:
+                        continue
+                    if scene_idx > 0 and self._reconcile_pending_continuity():
+                        continuity_context = self._get_continuity_context_for_chapter(i) # Previous chapter's final character states
                     print(f"  Generating Scene {scene_idx + 1} of {len(scenes)} for Chapter {i}: {scene_desc[:80]}...")
-                    scene_specific_prose = self._generate_scene_prose(i, scene_idx, scene_desc, current_chapter_plan, continuity_context, accumulated_scene_prose_for_chapter)
+                    self.in_progress_chapter["streaming_scene_prose"] = "" # Chapter buffer for the scene while it streams in
+                    def show_streamed_text(text):
+                        self.in_progress_chapter["streaming_scene_prose"] += text
+                        sys.stdout.write(text)
+                        sys.stdout.flush()
+                    scene_specific_prose = self._generate_scene_prose(i, scene_idx, scene_desc, current_chapter_plan, continuity_context, accumulated_scene_prose_for_chapter, on_token=show_streamed_text)
                     if "[OLLAMA" in scene_specific_prose: 
                          print(f"    ERROR generating scene {scene_idx+1}: {scene_specific_prose}")
                          scene_specific_prose = f"\n\n[Error generating scene: {scene_desc[:50]}...]\n\n"
                     
                     chapter_prose += scene_specific_prose + "\n\n" 
                     accumulated_scene_prose_for_chapter += scene_specific_prose + "\n\n" 
+                    self.in_progress_chapter["chapter_prose"] = chapter_prose
+                    self.in_progress_chapter["streaming_scene_prose"] = ""
+                    self.in_progress_chapter["next_scene_index"] = scene_idx + 1
+                    self._save_checkpoint()
                     time.sleep(0.2)  
 
+            self._reconcile_pending_continuity() # Hook and this chapter's passes need the previous chapter's final state
+
             # Interim continuity update (based on content BEFORE the hook)
             self._update_chapter_continuity_data(i, chapter_prose.strip(), is_final_pass_for_chapter=False)
 
@@ -893,40 +1294,42 @@ class NovelGenerator:
                 chapter_prose += hook_text
             
             self.generated_chapters_content[i] = chapter_prose.strip()
+            self._index_chapter(i, self.generated_chapters_content[i])
             print(f"  Chapter {i} ('{current_chapter_plan.get('title', 'Untitled')}') content generated (approx length: {len(chapter_prose)} chars).")
 
             # FINAL continuity update for the chapter (with opener, scenes, and hook included)
-            self._update_chapter_continuity_data(i, self.generated_chapters_content[i], is_final_pass_for_chapter=True)
+            if continuity_worker and i < self.num_chapters:
+                characters = copy.deepcopy(self.characters)
+                future = continuity_worker.submit(self._update_chapter_continuity_data, i, self.generated_chapters_content[i], True, characters)
+                self.pending_continuity = (i, characters, future)
+                print(f"  Final continuity pass for Chapter {i} running in the background while Chapter {i + 1} is drafted.")
+            else:
+                self._update_chapter_continuity_data(i, self.generated_chapters_content[i], is_final_pass_for_chapter=True)
+            self.in_progress_chapter = None
+            self._save_checkpoint()
 
             if i < self.num_chapters:
                 print("Pausing briefly before next chapter...")
                 time.sleep(0.5) 
         
-        return True
-        
     # --- NEW: Transition Checking Phase ---
-    def _check_and_improve_transition(self, prev_chapter_num, current_chapter_num):
-        """Checks transition from prev to current chapter and improves if needed."""
-        print(f"\n--- Checking transition from Chapter {prev_chapter_num} to {current_chapter_num} ---")
+    def _request_transition_check(self, prev_chapter_num, current_chapter_num):
+        """Asks the editor model to judge (and if needed rewrite) a chapter opening. Only reads chapter text, so it can run on worker threads."""
         
         prev_chapter_content = self.generated_chapters_content.get(prev_chapter_num)
         current_chapter_content = self.generated_chapters_content.get(current_chapter_num)
 
-        if not prev_chapter_content or not current_chapter_content:
-            print("  Skipping transition check: Missing content for one or both chapters.")
-            return
-
         system_prompt = """You are a professional editor specializing in narrative flow and chapter transitions."""
         prompt = f"""Analyze the transition between the end of the previous chapter and the beginning of the current chapter.
 
         END OF PREVIOUS CHAPTER ({prev_chapter_num}):
         ---
-        {prev_chapter_content[-1000:]} 
+        {prev_chapter_content[-TRANSITION_CONTEXT_CHARS:]} 
         ---
 
         BEGINNING OF CURRENT CHAPTER ({current_chapter_num}):
         ---
-        {current_chapter_content[:1000]} 
+        {current_chapter_content[:TRANSITION_CONTEXT_CHARS]} 
         ---
 
         If the transition is already smooth and logical, respond ONLY with the exact text:
@@ -941,7 +1344,12 @@ class NovelGenerator:
 
         Start your response with the exact text "TRANSITION: REVISED" followed by the revised beginning paragraphs. Do NOT include the chapter title in the revised text.
         """
-        transition_check_result = self._ollama_generate(prompt, system_prompt, temperature=0.6)
+        return self._ollama_generate(prompt, system_prompt, temperature=0.6, stage="transition-check")
+
+    def _apply_transition_check(self, prev_chapter_num, current_chapter_num, transition_check_result):
+        """Applies a transition check result to the current chapter. Returns True if its opening was revised."""
+        print(f"\n--- Checking transition from Chapter {prev_chapter_num} to {current_chapter_num} ---")
+        current_chapter_content = self.generated_chapters_content[current_chapter_num]
 
         if "[OLLAMA" in transition_check_result:
             print(f"  Error during transition check: {transition_check_result}")
@@ -966,6 +1374,7 @@ class NovelGenerator:
                     print(f"  Chapter {current_chapter_num} opening revised successfully.")
                     # Optional: Could re-run continuity update here for the revised chapter
                     # self._update_chapter_continuity_data(current_chapter_num, self.generated_chapters_content[current_chapter_num], is_final_pass_for_chapter=True)
+                    return True
 
                 else:
                     print("  Transition check indicated revision needed, but no revised text was provided by LLM.")
@@ -975,21 +1384,48 @@ class NovelGenerator:
             print("  Transition is smooth. No changes needed.")
         else:
             print("  Transition check response was unclear. No changes applied.")
+        return False
 
 
     def _perform_final_transition_checks(self):
-        """Loops through all chapters to check and improve transitions."""
+        """
+        Checks every chapter boundary. All pairs of a wave are sent to the model concurrently (each check only reads
+        the tail of chapter i-1 and the head of chapter i); revisions are then applied in chapter order. A revision
+        that also changed a chapter's tail makes the next boundary's verdict stale, so that pair is re-checked in the
+        following wave instead of being applied.
+        """
         print("\n--- Performing Final Pass: Checking Chapter Transitions ---")
         if len(self.generated_chapters_content) < 2:
             print("  Skipping transition checks (less than 2 chapters generated).")
             return
 
+        pending_pairs = []
         for i in range(2, self.num_chapters + 1): # Start from chapter 2
             if i in self.generated_chapters_content and (i - 1) in self.generated_chapters_content:
-                self._check_and_improve_transition(i - 1, i)
-                time.sleep(0.5) # Small delay
+                pending_pairs.append(i)
             else:
                 print(f"  Skipping transition check for Chapter {i} (missing previous or current chapter content).")
+
+        wave = 0
+        while pending_pairs and wave < TRANSITION_CHECK_MAX_WAVES:
+            wave += 1
+            print(f"  Wave {wave}: checking {len(pending_pairs)} transition(s) with up to {TRANSITION_CHECK_PARALLELISM} in parallel...")
+            with ThreadPoolExecutor(max_workers=min(TRANSITION_CHECK_PARALLELISM, len(pending_pairs))) as executor:
+                futures = {i: executor.submit(self._request_transition_check, i - 1, i) for i in pending_pairs}
+
+            changed_tails = set()
+            for i in pending_pairs:
+                if i - 1 in changed_tails:
+                    print(f"\n  Chapter {i - 1}'s ending changed in this wave; its transition to Chapter {i} will be re-checked.")
+                    continue
+                tail_before = self.generated_chapters_content[i][-TRANSITION_CONTEXT_CHARS:]
+                if self._apply_transition_check(i - 1, i, futures[i].result()):
+                    if self.generated_chapters_content[i][-TRANSITION_CONTEXT_CHARS:] != tail_before:
+                        changed_tails.add(i)
+            pending_pairs = sorted(i + 1 for i in changed_tails if i + 1 in self.generated_chapters_content)
+
+        if pending_pairs:
+            print(f"  Stopped after {TRANSITION_CHECK_MAX_WAVES} waves; transitions into chapter(s) {pending_pairs} were not re-checked.")
         print("--- Finished Final Transition Checks ---")
 
 
@@ -1019,7 +1455,7 @@ class NovelGenerator:
         Return ONLY the generated title itself, without any quotation marks, labels (like "Title:"), or explanatory text.
         Novel Title:
         """
-        title_text = self._ollama_generate(prompt, system_prompt, temperature=0.8)
+        title_text = self._ollama_generate(prompt, system_prompt, temperature=0.8, stage="title")
         if "[OLLAMA" in title_text or not title_text.strip():
             print(f"ERROR generating title: {title_text}. Using placeholder.")
             main_char_name = list(self.characters.keys())[0] if self.characters else 'Adventure'
@@ -1127,6 +1563,7 @@ class NovelGenerator:
             "genre": self.genre,
             "num_chapters_determined": self.num_chapters,
             "ollama_model_used": OLLAMA_MODEL,
+            "ollama_small_model_used": self.small_model,
             "generation_timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
             "characters_final": self.characters,
             "world_details": self.world_details,
@@ -1152,20 +1589,32 @@ class NovelGenerator:
         start_time = time.time()
         print("--- Starting Novel Generation Pipeline ---")
 
-        if not self.generate_foundational_elements():
+        if "foundation" in self.completed_phases:
+            print("Foundational elements restored from checkpoint.")
+        elif not self.generate_foundational_elements():
             print("Halting: Foundational element generation failed.")
             return
+        else:
+            self._mark_phase_complete("foundation")
 
-        if not self.generate_detailed_chapter_plans():
+        if "plans" in self.completed_phases:
+            print("Chapter plans restored from checkpoint.")
+        elif not self.generate_detailed_chapter_plans():
             print("Halting: Detailed chapter plan generation failed.")
             return
+        else:
+            self._mark_phase_complete("plans")
         
-        if not self.generate_novel_content():
-            print("Halting: Novel content generation failed.")
-            return
+        if "content" not in self.completed_phases:
+            if not self.generate_novel_content():
+                print("Halting: Novel content generation failed.")
+                return
+            self._mark_phase_complete("content")
             
         # Perform final transition checks after all chapters are generated
-        self._perform_final_transition_checks()
+        if "transitions" not in self.completed_phases:
+            self._perform_final_transition_checks()
+            self._mark_phase_complete("transitions")
 
         # Compile and save the potentially revised chapters
         self.compile_and_save_novel()
@@ -1174,6 +1623,11 @@ class NovelGenerator:
         total_time_minutes = (end_time - start_time) / 60
         print(f"--- Novel Generation Pipeline Finished ---")
         print(f"Total time taken: {total_time_minutes:.2f} minutes.")
+        print(self.response_cache.stats_line())
+        if self.prefill_savings["scenes"]:
+            print(f"Scene prefix reuse: ~{self.prefill_savings['reused_tokens']} prompt tokens served from Ollama's KV cache "
+                  f"across {self.prefill_savings['scenes']} scenes, ~{self.prefill_savings['saved_seconds']:.1f}s of prefill saved.")
+        self.telemetry.print_summary()
 
 
 def get_user_input_multiline(prompt_message):
@@ -1255,11 +1709,22 @@ def load_resume_text(file_path):
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AI Novel Generator")
+    parser.add_argument("--resume", metavar="RUN_DIR", help="Continue an interrupted run from its checkpoint directory")
+    args = parser.parse_args()
+
     print("Welcome to the AI Novel Generator!")
     print("Please ensure your Ollama server is running and the model is available.")
     print(f"Using Ollama Model: {OLLAMA_MODEL} at {OLLAMA_BASE_URL}")
+    print(f"Extraction/analysis model: {OLLAMA_SMALL_MODEL or OLLAMA_MODEL}")
     print("----------------------------------------------------")
 
+    if args.resume:
+        generator = NovelGenerator.resume_from_checkpoint(args.resume)
+        if generator:
+            generator.orchestrate_generation()
+        raise SystemExit(0 if generator else 1)
+
     resume_file_path_input = input("Enter path to resume file (text or PDF) (or press Enter to skip): ").strip()
     resume_text_content = load_resume_text(resume_file_path_input)
     
@@ -5,6 +5,7 @@ import docx
 import traceback # For printing detailed errors
 import time # To avoid overwhelming the LLM API if needed
 import re # For robust parsing
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # --- Langchain Imports ---
 from langchain_ollama import OllamaLLM
@@ -25,6 +26,9 @@ OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
 OUTPUT_FOLDER = './docs'
 # Optional: Delay between LLM calls. Increase if hitting rate limits or instability.
 LLM_CALL_DELAY_SECONDS = 0.5
+# Per-chapter event lists are independent; request up to this many at once (match OLLAMA_NUM_PARALLEL)
+EVENT_GENERATION_PARALLELISM = max(1, int(os.getenv("OLLAMA_NUM_PARALLEL", "4")))
+EVENT_GENERATION_MAX_ATTEMPTS = 2 # Chapters whose event request failed are retried individually
 # Placeholder for the resume file - MAKE SURE THIS FILE EXISTS IN OUTPUT_FOLDER
 # Or adjust the path logic as needed.
 DEFAULT_RESUME_FILENAME = 'divi_1.pdf' # Example filename
@@ -861,22 +865,38 @@ def sort_chapters(chapter_dict):
 
 
 def generate_events_for_all_chapters(plot, profile, themes_str, chapter_dict, author):
-    """Generates event lists for all chapters using EventChain."""
-    print("\n--- Generating Events for Each Chapter ---")
+    """Generates event lists for all chapters using EventChain, several chapters at a time."""
+    print(f"\n--- Generating Events for Each Chapter (up to {EVENT_GENERATION_PARALLELISM} in parallel) ---")
     event_generator = EventChain()
-    event_dict = {} # { 'Chapter Title': ['Event 1', 'Event 2', ...] }
-
-    # Use the pre-sorted chapter list from the ChaptersChain parsing
-    sorted_chapter_items = chapter_dict.items() # chapter_dict should already be sorted
-
-    for chapter_title, summary in sorted_chapter_items:
-         print(f"Generating events for: {chapter_title}")
-         events = event_generator.run(plot, profile, themes_str, chapter_title, summary, author)
-         if events and not any("error" in evt.lower() for evt in events):
-            event_dict[chapter_title] = events
-            print(f"  Generated {len(events)} events for '{chapter_title}'.")
-            # for i, ev in enumerate(events): print(f"    {i+1}. {ev[:100]}...") # Log truncated events
-         else:
+    sorted_chapter_items = sort_chapters(chapter_dict) # Output order is independent of completion order
+    valid_events = {} # { 'Chapter Title': ['Event 1', 'Event 2', ...] }
+
+    pending = sorted_chapter_items
+    for attempt in range(1, EVENT_GENERATION_MAX_ATTEMPTS + 1):
+        if not pending:
+            break
+        failed_titles = set()
+        with ThreadPoolExecutor(max_workers=min(EVENT_GENERATION_PARALLELISM, len(pending))) as executor:
+            futures = {
+                executor.submit(event_generator.run, plot, profile, themes_str, chapter_title, summary, author): chapter_title
+                for chapter_title, summary in pending
+            }
+            for future in as_completed(futures):
+                chapter_title = futures[future]
+                events = future.result() # EventChain.run returns placeholders instead of raising
+                if events and not any("error" in evt.lower() for evt in events):
+                    valid_events[chapter_title] = events
+                else:
+                    print(f"  Event generation failed for '{chapter_title}' (attempt {attempt}/{EVENT_GENERATION_MAX_ATTEMPTS}).")
+                    failed_titles.add(chapter_title)
+        pending = [item for item in sorted_chapter_items if item[0] in failed_titles]
+
+    event_dict = {}
+    for chapter_title, _ in sorted_chapter_items:
+        if chapter_title in valid_events:
+            event_dict[chapter_title] = valid_events[chapter_title]
+            print(f"  Generated {len(event_dict[chapter_title])} events for '{chapter_title}'.")
+        else:
             print(f"  WARNING: No valid events generated or parsed for '{chapter_title}'. Chapter content might be basic or skipped.")
             event_dict[chapter_title] = [] # Store empty list to indicate failure/skip
 
@@ -3,10 +3,23 @@ import json
 import time
 import os
 import re
+import sys
 from docx import Document
 from docx.shared import Pt
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 import pypdf # Added for PDF processing
+import argparse
+import copy
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from llm_cache import ResponseCache, get_single_flight, make_cache_key
+from ollama_client import get_client
+from run_journal import RunJournal, new_run_dir, int_keys
+from context_budget import ContextBuilder, TokenEstimator
+from passage_index import PassageIndex
+from llm_telemetry import LLMTelemetry, call_metrics
+from model_routing import OLLAMA_SMALL_MODEL, available_small_model, effective_tier, model_for
+from plan_parser import parse_chapter_plans
 
 # --- Configuration ---
 # Replace with your Ollama API endpoint and desired model
@@ -21,8 +34,69 @@ OLLAMA_TIMEOUT = 360 # 6 minutes, adjust as needed
 OUTPUT_DIR = "generated_novel_output"
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
+# Persistent response cache: a re-run after a crash replays identical calls from disk
+OLLAMA_CACHE_PATH = os.path.join(OUTPUT_DIR, "ollama_response_cache.sqlite")
+OLLAMA_CACHE_MAX_MB = 512 # Least-recently-used entries are evicted beyond this size
+# Replay mode serves every call from the cache and never contacts the Ollama server
+OLLAMA_REPLAY_MODE = os.getenv("OLLAMA_REPLAY_MODE", "0") == "1"
+# Fixed sampling seed (None = Ollama default). Part of the cache key.
+OLLAMA_SEED = None
+
+# Stream scene prose token-by-token so it shows up (and can be aborted) while it is generated
+OLLAMA_STREAM_SCENES = True
+# Abort a streamed scene as soon as the model starts writing a new chapter heading
+SCENE_STOP_PATTERN = re.compile(r"\n\s*(?:#+\s*)?(?:\*\*)?Chapter\s+\d+", re.IGNORECASE)
+
+# Chat endpoint, used for scene prose when the chapter context is sent as a fixed system message
+OLLAMA_CHAT_URL = "http://localhost:11434/api/chat"
+# Send the shared chapter context (outline, world, characters, chapter plan) as a byte-identical system
+# message for every scene of a chapter, so Ollama reuses its KV cache instead of re-prefilling it per scene
+OLLAMA_SCENE_PREFIX_REUSE = True
+
+# Context window requested from Ollama. Prompts longer than this are silently truncated from the front.
+OLLAMA_NUM_CTX = 8192
+# Token budget for the per-chapter continuity context; leaves room for the chapter plan, prose so far and output
+CONTINUITY_CONTEXT_TOKEN_BUDGET = 3000
+# Passages from earlier chapters retrieved per scene (by similarity to the scene description) for long-range callbacks
+RELEVANT_PASSAGES_K = 3
+# Draft chapter i+1 while chapter i's final continuity pass (summary + character extraction) runs on a second
+# worker; its character updates are folded in before i+1's later scenes. Needs OLLAMA_NUM_PARALLEL >= 2 to overlap.
+OLLAMA_PIPELINE_CHAPTERS = True
+CHARACTER_STATE_FIELDS = ("current_status", "current_location", "emotional_state") # Compared when reconciling
+# Chapter-boundary checks are independent, so they run in parallel waves (match OLLAMA_NUM_PARALLEL)
+TRANSITION_CHECK_PARALLELISM = max(1, int(os.getenv("OLLAMA_NUM_PARALLEL", "4")))
+TRANSITION_CONTEXT_CHARS = 1000 # Tail of the previous chapter / head of the current one shown to the editor
+TRANSITION_CHECK_MAX_WAVES = 3 # Re-check waves triggered by revisions that changed a chapter's tail
+
+# Chapter plan fields requested in JSON mode; every returned chapter is checked against these types
+CHAPTER_PLAN_FIELDS = {
+    "title": str,
+    "goal": str,
+    "scenes": list, # of str
+    "character_development": str,
+    "plot_advancement": str,
+    "timeline_pacing": str,
+    "emotional_tone_end": str,
+    "connection_to_next": str,
+}
+CHAPTER_PLANS_SCHEMA = {
+    "type": "object",
+    "properties": {"chapters": {"type": "array", "items": {
+        "type": "object",
+        "properties": {"number": {"type": "integer"}, **{
+            field: {"type": "array", "items": {"type": "string"}} if field_type is list else {"type": "string"}
+            for field, field_type in CHAPTER_PLAN_FIELDS.items()}},
+        "required": ["number", *CHAPTER_PLAN_FIELDS],
+    }}},
+    "required": ["chapters"],
+}
+# Ollama "format" for chapter plans: a JSON schema (Ollama >= 0.5), "json" for older servers,
+# or None for the free-text plan parsed with heading regexes
+OLLAMA_CHAPTER_PLAN_FORMAT = CHAPTER_PLANS_SCHEMA
+CHAPTER_PLAN_JSON_RETRIES = 1 # Extra requests for just the chapters that were missing or failed validation
+
 class NovelGenerator:
-    def __init__(self, resume_content, subject, author_style, genre):
+    def __init__(self, resume_content, subject, author_style, genre, run_dir=None, model=None, output_dir=None, small_model=None):
         # Clean up author_style input to remove potential formatting directives
         self.author_style = author_style.split("\n")[0].strip()  # Only take first line
         self.author_style = re.sub(r"Genre:.*$", "", self.author_style, flags=re.IGNORECASE).strip()
@@ -31,6 +105,10 @@ class NovelGenerator:
         self.subject = subject
         self.genre = genre
         self.num_chapters = 0 # Will be determined by the AI
+        self.model = model or OLLAMA_MODEL # Per generator, so batch jobs with different models can share a process
+        # Extraction/analysis tier ("" = use self.model); dropped if the server does not have it
+        self.small_model = available_small_model(OLLAMA_SMALL_MODEL if small_model is None else small_model, OLLAMA_BASE_URL)
+        self.output_dir = output_dir or OUTPUT_DIR # Where the finished .docx and metadata JSON are written
 
         # Core story elements - will be populated by generation methods
         self.characters = {}  # Detailed character objects/dictionaries
@@ -41,50 +119,271 @@ class NovelGenerator:
 
         # Detailed chapter-by-chapter plan
         self.chapter_plans = {} # Key: chapter_num, Value: dict with plan details
+        self.chapter_plan_texts = [] # Plan responses exactly as the model returned them, one per batch
 
         # Generated content and continuity data
         self.generated_chapters_content = {} # Key: chapter_num, Value: full chapter text
         self.chapter_continuity_data = {} # Key: chapter_num, Value: dict with summary, char updates, timeline, emotional arc, flow_analysis
 
+        self.response_cache = ResponseCache(OLLAMA_CACHE_PATH, max_bytes=OLLAMA_CACHE_MAX_MB * 1024 * 1024, replay=OLLAMA_REPLAY_MODE)
+        self._call_local = threading.local() # Per-thread last_call_metrics, so background calls don't clobber scene metrics
+        self.prefill_baseline = None # Cold prefill rate measured on the first uncached scene
+        self.prefill_savings = {"scenes": 0, "reused_tokens": 0, "saved_seconds": 0.0}
+        self.token_estimator = TokenEstimator() # Calibrated from the first fully prefilled scene prompt
+        self.passage_index = PassageIndex() # Scene-sized chunks of finished chapters, for retrieval
+
+        # Crash-safe checkpointing (flushed after every scene and chapter)
+        self.completed_phases = [] # "foundation", "plans", "content", "transitions"
+        self.in_progress_chapter = None # {"chapter", "opener_text", "chapter_prose", "next_scene_index"}
+        self.pending_continuity = None # (chapter_num, characters copy, future) of a final continuity pass in flight
+        self.journal = RunJournal(run_dir or new_run_dir(OUTPUT_DIR))
+        self.telemetry = LLMTelemetry(os.path.join(self.journal.run_dir, "llm_calls.jsonl")) # Per-call Ollama counters by stage
+        get_client().add_concurrency_listener(self.telemetry.record_concurrency) # Adaptive limit changes land in the trace
+
         print("NovelGenerator initialized.")
         print(f"  Subject: {self.subject[:100]}...")
         print(f"  Author Style: {self.author_style}")
         print(f"  Genre: {self.genre}")
         print(f"  Resume provided: {'Yes' if self.resume_content else 'No'}")
         print(f"  Number of chapters will be determined automatically.")
+        print(f"  Checkpoint directory (use with --resume): {self.journal.run_dir}")
+
+    # --- Checkpointing ---
+    def _checkpoint_state(self):
+        """Collects everything needed to rebuild the generator after a crash."""
+        return {
+            "inputs": {
+                "resume_content": self.resume_content,
+                "subject": self.subject,
+                "author_style": self.author_style,
+                "genre": self.genre,
+            },
+            "ollama_model": self.model,
+            "ollama_small_model": self.small_model,
+            "output_dir": self.output_dir,
+            "num_chapters": self.num_chapters,
+            "characters": self.characters,
+            "world_details": self.world_details,
+            "themes_motifs": self.themes_motifs,
+            "plot_outline": self.plot_outline,
+            "novel_title": self.novel_title,
+            "chapter_plans": self.chapter_plans,
+            "generated_chapters_content": self.generated_chapters_content,
+            "chapter_continuity_data": self.chapter_continuity_data,
+            "completed_phases": self.completed_phases,
+            "in_progress_chapter": self.in_progress_chapter,
+            "pending_continuity_chapter": self.pending_continuity[0] if self.pending_continuity else None,
+        }
 
-
-    def _ollama_generate(self, prompt, system_prompt="You are a helpful AI assistant.", temperature=0.7, top_p=0.9):
+    def _save_checkpoint(self):
+        """Flushes the current state to the run journal (atomic rename)."""
+        try:
+            self.journal.save(self._checkpoint_state())
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Warning: Could not write checkpoint to {self.journal.path}: {e}")
+
+    def _mark_phase_complete(self, phase):
+        if phase not in self.completed_phases:
+            self.completed_phases.append(phase)
+        self._save_checkpoint()
+
+    @classmethod
+    def resume_from_checkpoint(cls, run_dir):
+        """Rebuilds a generator from the journal in run_dir. Returns None if there is nothing to resume."""
+        state = RunJournal(run_dir).load()
+        if state is None:
+            print(f"ERROR: No checkpoint journal found in '{run_dir}'.")
+            return None
+
+        inputs = state["inputs"]
+        generator = cls(inputs["resume_content"], inputs["subject"], inputs["author_style"], inputs["genre"], run_dir=run_dir,
+                        model=state.get("ollama_model"), output_dir=state.get("output_dir"), small_model=state.get("ollama_small_model"))
+        generator.num_chapters = state.get("num_chapters", 0)
+        generator.characters = state.get("characters", {})
+        generator.world_details = state.get("world_details", generator.world_details)
+        generator.themes_motifs = state.get("themes_motifs", generator.themes_motifs)
+        generator.plot_outline = state.get("plot_outline", "")
+        generator.novel_title = state.get("novel_title", generator.novel_title)
+        generator.chapter_plans = int_keys(state.get("chapter_plans"))
+        generator.generated_chapters_content = int_keys(state.get("generated_chapters_content"))
+        generator.chapter_continuity_data = int_keys(state.get("chapter_continuity_data"))
+        generator.completed_phases = state.get("completed_phases", [])
+        generator.in_progress_chapter = state.get("in_progress_chapter")
+        if state.get("pending_continuity_chapter"):
+            generator.pending_continuity = (state["pending_continuity_chapter"], None, None) # Rerun inline on resume
+
+        print(f"Resumed run from '{run_dir}' (saved {state.get('journal_saved_at', 'unknown')}).")
+        print(f"  Completed phases: {', '.join(generator.completed_phases) or 'none'}")
+        print(f"  Chapters finished: {len(generator.generated_chapters_content)} of {generator.num_chapters}")
+        if generator.in_progress_chapter:
+            print(f"  In-progress: Chapter {generator.in_progress_chapter['chapter']}, next scene {generator.in_progress_chapter['next_scene_index'] + 1}")
+        return generator
+
+
+    @property
+    def last_call_metrics(self):
+        """Ollama timing counters of the calling thread's most recent uncached call."""
+        return getattr(self._call_local, "metrics", None)
+
+    @last_call_metrics.setter
+    def last_call_metrics(self, metrics):
+        self._call_local.metrics = metrics
+
+    def _model_for(self, stage):
+        """The model a call of this stage goes to: the small model for model_routing's "small" stages."""
+        return model_for(stage, self.model, self.small_model)
+
+    def _ollama_generate(self, prompt, system_prompt="You are a helpful AI assistant.", temperature=0.7, top_p=0.9, seed=None, use_chat=False, stage="other", response_format=None):
         """
         Helper function to make API calls to the Ollama server.
+        Successful responses are memoized in the persistent response cache.
+        With use_chat the call goes to the chat endpoint as a system + user message pair.
+        response_format is passed as Ollama's "format" ("json" or a JSON schema) to constrain the output.
+        Every answered call is recorded in self.telemetry under the given pipeline stage.
         """
+        self.last_call_metrics = None
+        call_start = time.time()
+        if seed is None:
+            seed = OLLAMA_SEED
+        model = self._model_for(stage)
+        tier = effective_tier(model, self.model)
+        cache_key = make_cache_key(model, system_prompt, prompt, temperature, top_p, seed, response_format)
+        cached_response = self.response_cache.get(cache_key)
+        if cached_response is not None:
+            self.telemetry.record(stage, None, time.time() - call_start, model, cached=True, tier=tier)
+            return cached_response
+        if self.response_cache.replay:
+            print(f"ERROR: Replay mode is on but no cached response exists for prompt: {prompt[:100]}...")
+            return f"[OLLAMA CACHE MISS (replay mode) for prompt: {prompt[:100]}...]"
+
+        def upstream(): # Runs once per in-flight key; identical concurrent calls wait for it
+            payload = self._build_ollama_payload(prompt, system_prompt, temperature, top_p, seed, model=model, use_chat=use_chat, response_format=response_format)
+            # print(f"\n--- Sending Prompt to LLM ({model}) ---\n{prompt[:300]}...\n---") # Debug: Show prompt start
+            try:
+                response = get_client().post(OLLAMA_CHAT_URL if use_chat else OLLAMA_BASE_URL, json=payload, timeout=OLLAMA_TIMEOUT)
+                response.raise_for_status()
+                # print(f"--- LLM Response Received ---\n{response.json()['response'][:300]}...\n---") # Debug: Show response start
+                response_data = response.json()
+                response_text = (response_data["message"]["content"] if use_chat else response_data["response"]).strip()
+                self.last_call_metrics = call_metrics(response_data)
+                self.telemetry.record(stage, self.last_call_metrics, time.time() - call_start, model, tier=tier)
+                self.response_cache.put(cache_key, response_text)
+                return response_text
+            except requests.exceptions.Timeout:
+                print(f"ERROR: Ollama request timed out after {OLLAMA_TIMEOUT} seconds for prompt: {prompt[:100]}...")
+                return f"[OLLAMA TIMEOUT ERROR for prompt: {prompt[:100]}...]"
+            except requests.exceptions.RequestException as e:
+                print(f"ERROR: Ollama request failed: {e} for prompt: {prompt[:100]}...")
+                return f"[OLLAMA REQUEST ERROR: {e} for prompt: {prompt[:100]}...]"
+            except json.JSONDecodeError as e:
+                print(f"ERROR: Failed to decode JSON response from Ollama: {e}")
+                print(f"Raw response text: {response.text}") # It's response.text, not response.text()
+                return f"[OLLAMA JSON DECODE ERROR for prompt: {prompt[:100]}...]"
+
+        response_text, shared = get_single_flight().do(cache_key, upstream)
+        if shared:
+            self.telemetry.record(stage, None, time.time() - call_start, model, cached=True, tier=tier, coalesced=True)
+        return response_text
+
+    def _build_ollama_payload(self, prompt, system_prompt, temperature, top_p, seed, model=None, stream=False, use_chat=False, response_format=None):
         payload = {
-            "model": OLLAMA_MODEL,
+            "model": model or self.model,
             "prompt": prompt,
             "system": system_prompt,
-            "stream": False,
+            "stream": stream,
             "options": {
                 "temperature": temperature,
                 "top_p": top_p,
-                # "num_ctx": 8192 # Example: Adjust context window if needed and supported by model like Llama3
+                "num_ctx": OLLAMA_NUM_CTX,
             }
         }
-        # print(f"\n--- Sending Prompt to LLM ({OLLAMA_MODEL}) ---\n{prompt[:300]}...\n---") # Debug: Show prompt start
-        try:
-            response = requests.post(OLLAMA_BASE_URL, json=payload, timeout=OLLAMA_TIMEOUT)
-            response.raise_for_status()
-            # print(f"--- LLM Response Received ---\n{response.json()['response'][:300]}...\n---") # Debug: Show response start
-            return response.json()["response"].strip()
-        except requests.exceptions.Timeout:
-            print(f"ERROR: Ollama request timed out after {OLLAMA_TIMEOUT} seconds for prompt: {prompt[:100]}...")
-            return f"[OLLAMA TIMEOUT ERROR for prompt: {prompt[:100]}...]"
-        except requests.exceptions.RequestException as e:
-            print(f"ERROR: Ollama request failed: {e} for prompt: {prompt[:100]}...")
-            return f"[OLLAMA REQUEST ERROR: {e} for prompt: {prompt[:100]}...]"
-        except json.JSONDecodeError as e:
-            print(f"ERROR: Failed to decode JSON response from Ollama: {e}")
-            print(f"Raw response text: {response.text}") # It's response.text, not response.text()
-            return f"[OLLAMA JSON DECODE ERROR for prompt: {prompt[:100]}...]"
+        if seed is not None:
+            payload["options"]["seed"] = seed
+        if response_format is not None:
+            payload["format"] = response_format
+        if use_chat:
+            del payload["prompt"], payload["system"]
+            payload["messages"] = [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt},
+            ]
+        return payload
+
+    def _ollama_generate_stream(self, prompt, system_prompt="You are a helpful AI assistant.", temperature=0.7, top_p=0.9, seed=None, on_token=None, stop_pattern=None, use_chat=False, stage="other"):
+        """
+        Streaming variant of _ollama_generate. Each token is passed to on_token as it arrives,
+        and generation is aborted (text truncated at the match) as soon as stop_pattern matches.
+        Shares the response cache and telemetry with _ollama_generate.
+        """
+        self.last_call_metrics = None
+        call_start = time.time()
+        if seed is None:
+            seed = OLLAMA_SEED
+        model = self._model_for(stage)
+        tier = effective_tier(model, self.model)
+        cache_key = make_cache_key(model, system_prompt, prompt, temperature, top_p, seed)
+        cached_response = self.response_cache.get(cache_key)
+        if cached_response is not None:
+            self.telemetry.record(stage, None, time.time() - call_start, model, cached=True, tier=tier)
+            if on_token: on_token(cached_response)
+            return cached_response
+        if self.response_cache.replay:
+            print(f"ERROR: Replay mode is on but no cached response exists for prompt: {prompt[:100]}...")
+            return f"[OLLAMA CACHE MISS (replay mode) for prompt: {prompt[:100]}...]"
+
+        def upstream(): # Runs once per in-flight key; identical concurrent calls wait for it
+            payload = self._build_ollama_payload(prompt, system_prompt, temperature, top_p, seed, model=model, stream=True, use_chat=use_chat)
+            generated_text = ""
+            start_time = time.time()
+            first_token_time = None
+            stream = get_client().stream(OLLAMA_CHAT_URL if use_chat else OLLAMA_BASE_URL, json=payload, timeout=OLLAMA_TIMEOUT)
+            try:
+                for chunk in stream:
+                    if chunk.get("done"):
+                        self.last_call_metrics = call_metrics(chunk) # Only the final chunk carries the counters
+                    token = chunk.get("message", {}).get("content", "") if use_chat else chunk.get("response", "")
+                    if not token:
+                        continue
+                    if first_token_time is None:
+                        first_token_time = time.time() - start_time
+                    previous_length = len(generated_text)
+                    generated_text += token
+                    if stop_pattern:
+                        # Only rescan the tail that could contain a newly completed match
+                        stop_match = stop_pattern.search(generated_text, max(0, previous_length - 64))
+                        if stop_match:
+                            generated_text = generated_text[:stop_match.start()]
+                            if on_token and len(generated_text) > previous_length:
+                                on_token(generated_text[previous_length:])
+                            print(f"\n    (Stop condition hit after {len(generated_text)} chars; aborting generation.)")
+                            break
+                    if on_token:
+                        on_token(token)
+            except requests.exceptions.Timeout:
+                print(f"ERROR: Ollama stream timed out after {OLLAMA_TIMEOUT} seconds for prompt: {prompt[:100]}...")
+                return f"[OLLAMA TIMEOUT ERROR for prompt: {prompt[:100]}...]"
+            except requests.exceptions.RequestException as e:
+                print(f"ERROR: Ollama streaming request failed: {e} for prompt: {prompt[:100]}...")
+                return f"[OLLAMA REQUEST ERROR: {e} for prompt: {prompt[:100]}...]"
+            except json.JSONDecodeError as e:
+                print(f"ERROR: Failed to decode streamed JSON chunk from Ollama: {e}")
+                return f"[OLLAMA JSON DECODE ERROR for prompt: {prompt[:100]}...]"
+            finally:
+                stream.close() # Closes the HTTP response so an aborted generation stops server-side
+
+            if first_token_time is not None:
+                print(f"\n    (First token after {first_token_time:.1f}s, finished in {time.time() - start_time:.1f}s)")
+            # Without the final chunk (stop pattern hit) there are no counters, but the wall time still counts
+            self.telemetry.record(stage, self.last_call_metrics, time.time() - call_start, model, tier=tier)
+            response_text = generated_text.strip()
+            self.response_cache.put(cache_key, response_text)
+            return response_text
+
+        response_text, shared = get_single_flight().do(cache_key, upstream)
+        if shared:
+            self.telemetry.record(stage, None, time.time() - call_start, model, cached=True, tier=tier, coalesced=True)
+            if on_token and not response_text.startswith("[OLLAMA"): on_token(response_text)
+        return response_text
 
     def _parse_character_profiles(self, text_block):
         """
@@ -228,7 +527,7 @@ STRENGTHS/SKILLS: Skilled sword fighter, keen observer.
 
 (Provide profiles for the main protagonist and 1-2 key supporting characters adhering strictly to this format.)
 """
-        character_profiles_text = self._ollama_generate(char_prompt, char_system_prompt, temperature=0.75)
+        character_profiles_text = self._ollama_generate(char_prompt, char_system_prompt, temperature=0.75, stage="foundation")
         if "[OLLAMA" in character_profiles_text:
             print(f"ERROR generating character profiles: {character_profiles_text}")
         else:
@@ -254,7 +553,7 @@ Do not include plot summaries, character descriptions, or any information not re
 4.  ATMOSPHERE/TONE: [Describe the overall mood and feeling of the world (e.g., oppressive, wondrous, decaying, futuristic, magical)]
 5.  KEY RULES/LAWS (if applicable, e.g., for magic systems, societal structure): [List 1-3 fundamental rules that govern this world or its unique aspects. Each item should be on a new line.]
 """
-        world_details_text = self._ollama_generate(world_prompt, world_system_prompt, temperature=0.65)
+        world_details_text = self._ollama_generate(world_prompt, world_system_prompt, temperature=0.65, stage="foundation")
         if "[OLLAMA" in world_details_text:
             print(f"ERROR generating world details: {world_details_text}")
         else:
@@ -302,7 +601,7 @@ Use the specified format. Do not add any other explanations, introductory text,
 1.  CORE THEMES (2-4): [List abstract concepts the story will explore. Each item should be on a new line, like: "- Loss and Memory: The story explores how memories define individuals and societies, and the consequences of their loss or manipulation." Provide a brief (1-sentence) explanation for each, linking it to the context.]
 2.  RECURRING MOTIFS (3-5): [List concrete symbols, objects, phrases, or imagery. Each item should be on a new line, like: "- A cracked pocket watch," "- The phrase 'shadows remember'."]
 """
-        themes_motifs_text = self._ollama_generate(themes_prompt, themes_system_prompt, temperature=0.6)
+        themes_motifs_text = self._ollama_generate(themes_prompt, themes_system_prompt, temperature=0.6, stage="foundation")
         if "[OLLAMA" in themes_motifs_text:
             print(f"ERROR generating themes/motifs: {themes_motifs_text}")
         else:
@@ -349,7 +648,7 @@ SUGGESTED_CHAPTER_COUNT: [Number]
 
 Begin your response with Act I.
 """
-        self.plot_outline = self._ollama_generate(plot_prompt, plot_system_prompt, temperature=0.7)
+        self.plot_outline = self._ollama_generate(plot_prompt, plot_system_prompt, temperature=0.7, stage="foundation")
 
         if "[OLLAMA" in self.plot_outline:
             print(f"ERROR generating plot outline: {self.plot_outline}")
@@ -455,10 +754,32 @@ Begin your response with Act I.
         num_batches = (self.num_chapters + max_chapters_per_batch - 1) // max_chapters_per_batch  # Ceiling division
         
         all_chapter_plans_successful = True
+        plan_context = f"""
+            Novel Subject: {self.subject}
+            High-Level Plot Outline:
+            {clean_plot_outline_for_detailed_plan}
+
+            Character Summaries:
+            {character_summary_for_prompt}
+
+            World Summary:
+            {world_summary_for_prompt}
+
+            Themes & Motifs:
+            {themes_for_prompt}
+
+            Total Chapters in Novel: {self.num_chapters}
+            """
         
         for batch_idx in range(num_batches):
             start_chapter = batch_idx * max_chapters_per_batch + 1
             end_chapter = min((batch_idx + 1) * max_chapters_per_batch, self.num_chapters)
+
+            if OLLAMA_CHAPTER_PLAN_FORMAT is not None:
+                print(f"Generating detailed JSON plans for chapters {start_chapter}-{end_chapter} (batch {batch_idx+1}/{num_batches})...")
+                if self._generate_chapter_plans_json(plan_context, list(range(start_chapter, end_chapter + 1)), system_prompt):
+                    all_chapter_plans_successful = False
+                continue
             
             print(f"Generating detailed plan text for chapters {start_chapter}-{end_chapter} (batch {batch_idx+1}/{num_batches})...")
 
@@ -497,13 +818,14 @@ Begin your response with Act I.
             Begin directly with "Chapter {start_chapter} - " without any preamble.
             """
 
-            batch_chapter_plans_text = self._ollama_generate(batch_prompt, system_prompt, temperature=0.65)
+            batch_chapter_plans_text = self._ollama_generate(batch_prompt, system_prompt, temperature=0.65, stage="plan")
 
             if "[OLLAMA" in batch_chapter_plans_text:
                 print(f"ERROR generating batch of chapter plans ({start_chapter}-{end_chapter}): {batch_chapter_plans_text}")
                 all_chapter_plans_successful = False
                 continue
                 
+            self.chapter_plan_texts.append(batch_chapter_plans_text)
             self._parse_chapter_plans(batch_chapter_plans_text)
 
         # Now check if we have enough chapter plans
@@ -526,88 +848,91 @@ Begin your response with Act I.
             
         return True
 
-    def _parse_chapter_plans(self, chapter_plans_text):
-        """Parse chapter plans from the LLM's output text."""
-        # This handles many different possible chapter heading formats
-        chapter_regex_patterns = [
-            # Standard format: "Chapter X - Title"
-            r"(?:^|\n)(?:\*\*)?Chapter\s*(\d+)\s*-\s*(.*?)(?:\*\*)?(?=\n|$)",
-            # Alternative format: "Chapter X: Title"
-            r"(?:^|\n)(?:\*\*)?Chapter\s*(\d+)\s*:\s*(.*?)(?:\*\*)?(?=\n|$)",
-            # Possible markdown: "# Chapter X - Title"
-            r"(?:^|\n)#\s*(?:\*\*)?Chapter\s*(\d+)\s*[-:]\s*(.*?)(?:\*\*)?(?=\n|$)",
-            # Just chapter number: "Chapter X"
-            r"(?:^|\n)(?:\*\*)?Chapter\s*(\d+)(?:\*\*)?(?=\n|$)"
-        ]
-        
-        # First, find all chapter starts and their positions in the text
-        chapter_positions = []
-        for pattern in chapter_regex_patterns:
-            for match in re.finditer(pattern, chapter_plans_text, re.MULTILINE):
-                try:
-                    chapter_num = int(match.group(1))
-                    chapter_title = match.group(2).strip() if len(match.groups()) > 1 else f"Chapter {chapter_num}"
-                    position = match.start()
-                    chapter_positions.append((chapter_num, chapter_title, position))
-                except (IndexError, ValueError):
-                    continue
-        
-        # Sort by position in the text to preserve order
-        chapter_positions.sort(key=lambda x: x[2])
-        
-        # Now extract the content between each chapter heading
-        for i, (chapter_num, chapter_title, start_pos) in enumerate(chapter_positions):
-            # Find the end position (either the next chapter start or the end of text)
-            end_pos = chapter_positions[i+1][2] if i+1 < len(chapter_positions) else len(chapter_plans_text)
-            chapter_content = chapter_plans_text[start_pos:end_pos].strip()
-            
-            # Parse the chapter content
-            self._parse_single_chapter_plan(chapter_num, chapter_title, chapter_content)
+    def _generate_chapter_plans_json(self, plan_context, chapter_numbers, system_prompt):
+        """
+        Requests plans for chapter_numbers as JSON (OLLAMA_CHAPTER_PLAN_FORMAT) and stores every chapter that validates.
+        Only the chapters that were missing or invalid are re-requested. Returns the chapters still without a plan.
+        """
+        pending = [n for n in chapter_numbers if n not in self.chapter_plans]
+        for attempt in range(1 + CHAPTER_PLAN_JSON_RETRIES):
+            if not pending:
+                break
+            retry_note = ""
+            if attempt:
+                print(f"  Re-requesting plans for chapters {pending} (missing or invalid in the previous response)...")
+                retry_note = "Your previous answer for these chapters was missing or did not follow the required structure."
+            prompt = f"""{plan_context}
+            {retry_note}
+            Plan exactly these chapters: {', '.join(str(n) for n in pending)}
+
+            Respond with a JSON object {{"chapters": [...]}} holding one object per chapter, in order, with these keys:
+            - "number": the chapter number (integer).
+            - "title": an evocative title for the chapter.
+            - "goal": a single paragraph (50-80 words) stating the primary narrative goal of the chapter and how it impacts the main character's arc or the central conflict.
+            - "scenes": 3-6 strings, each "Scene X: [Brief description of action/dialogue/internal monologue], Location: [Specific location], Characters Involved: [Characters present & active], Key Revelation/Turning Point/Outcome: [What changes, is learned, or achieved?]".
+            - "character_development": how the motivations, relationships, knowledge, or understanding of key characters change in this chapter. Be specific.
+            - "plot_advancement": how the main plot and subplots move forward, which questions are raised or answered, and how the chapter builds on the previous one and sets up the next.
+            - "timeline_pacing": the time span and pacing of the chapter.
+            - "emotional_tone_end": the emotional tone at the end of the chapter.
+            - "connection_to_next": 1-2 elements, questions, cliffhangers, or character decisions that lead directly into the next chapter.
 
-    def _parse_single_chapter_plan(self, chapter_num, chapter_title, chapter_content):
-        """Parse a single chapter's plan from its content."""
-        if chapter_num in self.chapter_plans:
-            print(f"  Note: Chapter {chapter_num} plan already exists, skipping.")
-            return
-            
-        plan_details = {
-            "number": chapter_num,
-            "title": chapter_title,
-            "goal": "N/A",
-            "scenes": [],
-            "character_development": "N/A",
-            "plot_advancement": "N/A",
-            "timeline_pacing": "N/A",
-            "emotional_tone_end": "N/A",
-            "connection_to_next": "N/A"
-        }
-        
-        # Extract each section using regex
-        sections = {
-            "goal": r"(?:1\.\s*CHAPTER GOAL:|CHAPTER GOAL:)\s*(.*?)(?=\n\s*(?:2\.\s*KEY SCENES:|KEY SCENES:|$))",
-            "scenes": r"(?:2\.\s*KEY SCENES:|KEY SCENES:)\s*(.*?)(?=\n\s*(?:3\.\s*CHARACTER DEVELOPMENT|CHARACTER DEVELOPMENT|$))",
-            "character_development": r"(?:3\.\s*CHARACTER DEVELOPMENT FOCUS:|CHARACTER DEVELOPMENT FOCUS:)\s*(.*?)(?=\n\s*(?:4\.\s*PLOT ADVANCEMENT|PLOT ADVANCEMENT|$))",
-            "plot_advancement": r"(?:4\.\s*PLOT ADVANCEMENT:|PLOT ADVANCEMENT:)\s*(.*?)(?=\n\s*(?:5\.\s*TIMELINE|TIMELINE|$))",
-            "timeline_pacing": r"(?:5\.\s*TIMELINE & PACING:|TIMELINE & PACING:)\s*(.*?)(?=\n\s*(?:6\.\s*EMOTIONAL|EMOTIONAL|$))",
-            "emotional_tone_end": r"(?:6\.\s*EMOTIONAL TONE \(End of Chapter\):|EMOTIONAL TONE:)\s*(.*?)(?=\n\s*(?:7\.\s*CONNECTION|CONNECTION|$))",
-            "connection_to_next": r"(?:7\.\s*CONNECTION TO NEXT CHAPTER|CONNECTION TO NEXT CHAPTER:)\s*(.*?)(?=$)"
-        }
-        
-        for key, pattern in sections.items():
-            match = re.search(pattern, chapter_content, re.IGNORECASE | re.DOTALL)
-            if match:
-                if key == "scenes":
-                    scenes_text = match.group(1).strip()
-                    # Split scenes by bullet points or scene markers
-                    scenes = re.split(r'\n\s*(?:-\s*|\*\s*|•\s*|\d+\.\s*)', scenes_text)
-                    # Remove empty scenes and clean up
-                    scenes = [s.strip() for s in scenes if s.strip()]
-                    plan_details[key] = scenes
+            A character's status (location, knowledge, emotional state) at the end of one chapter MUST be the starting point for the next.
+            Ensure the plans for later chapters logically follow from the resolutions and developments of earlier ones.
+            """
+            response_text = self._ollama_generate(prompt, system_prompt, temperature=0.65, stage="plan", response_format=OLLAMA_CHAPTER_PLAN_FORMAT)
+            if "[OLLAMA" in response_text:
+                print(f"ERROR generating JSON chapter plans for chapters {pending}: {response_text}")
+                continue
+
+            for chapter_num, plan in self._validate_chapter_plans_json(response_text, pending).items():
+                self.chapter_plans[chapter_num] = plan
+                print(f"  Parsed plan for Chapter {chapter_num}: {plan['title']}")
+            pending = [n for n in pending if n not in self.chapter_plans]
+        return pending
+
+    def _validate_chapter_plans_json(self, response_text, chapter_numbers):
+        """Decodes a JSON plan response and returns {chapter_num: plan} for the requested chapters that match CHAPTER_PLAN_FIELDS."""
+        try:
+            data = json.loads(response_text)
+        except json.JSONDecodeError as e:
+            print(f"  Chapter plan response is not valid JSON: {e}")
+            return {}
+        chapters = data.get("chapters") if isinstance(data, dict) else data
+        if not isinstance(chapters, list):
+            print("  Chapter plan response has no \"chapters\" list.")
+            return {}
+
+        plans = {}
+        for item in chapters:
+            number = item.get("number") if isinstance(item, dict) else None
+            if isinstance(number, bool) or not isinstance(number, int) or number not in chapter_numbers or number in plans:
+                continue
+            invalid_fields = []
+            for field, field_type in CHAPTER_PLAN_FIELDS.items():
+                value = item.get(field)
+                if field_type is list:
+                    valid = isinstance(value, list) and value and all(isinstance(v, str) and v.strip() for v in value)
                 else:
-                    plan_details[key] = match.group(1).strip()
-        
-        self.chapter_plans[chapter_num] = plan_details
-        print(f"  Parsed plan for Chapter {chapter_num}: {chapter_title}")
+                    valid = isinstance(value, str) and value.strip()
+                if not valid:
+                    invalid_fields.append(field)
+            if invalid_fields:
+                print(f"  Chapter {number} plan failed validation ({', '.join(invalid_fields)}).")
+                continue
+            plan = {"number": number}
+            for field, field_type in CHAPTER_PLAN_FIELDS.items():
+                plan[field] = [v.strip() for v in item[field]] if field_type is list else item[field].strip()
+            plans[number] = plan
+        return plans
+
+    def _parse_chapter_plans(self, chapter_plans_text):
+        """Parse chapter plans from the LLM's output text (one pass over the text, see plan_parser)."""
+        for chapter_num, plan_details in parse_chapter_plans(chapter_plans_text).items():
+            if chapter_num in self.chapter_plans:
+                print(f"  Note: Chapter {chapter_num} plan already exists, skipping.")
+                continue
+            self.chapter_plans[chapter_num] = plan_details
+            print(f"  Parsed plan for Chapter {chapter_num}: {plan_details['title']}")
 
     def _generate_fallback_chapter_plans(self, missing_chapters):
         """Generate fallback plans for missing chapters."""
@@ -660,7 +985,7 @@ Begin your response with Act I.
             CONNECTION: [Hook for next chapter]
             """
             
-            plan_response = self._ollama_generate(prompt, system_prompt, temperature=0.7)
+            plan_response = self._ollama_generate(prompt, system_prompt, temperature=0.7, stage="plan")
             
             if "[OLLAMA" in plan_response:
                 print(f"  Failed to generate fallback plan for Chapter {chapter_num}. Using minimal placeholder.")
@@ -712,40 +1037,43 @@ Begin your response with Act I.
     def _get_continuity_context_for_chapter(self, chapter_num):
         """
         Gathers all relevant context from previous chapters and plans for generating the current chapter.
+        Sections are prioritized; the lowest-priority ones are trimmed or dropped first so the context
+        stays within CONTINUITY_CONTEXT_TOKEN_BUDGET however long the novel grows.
         """
-        context = f"Overall Novel Subject: {self.subject}\n"
-        context += f"Author Style: {self.author_style}, Genre: {self.genre}\n"
+        builder = ContextBuilder(CONTINUITY_CONTEXT_TOKEN_BUDGET, self.token_estimator, label=f"Chapter {chapter_num} context")
+        builder.add("novel header", f"Overall Novel Subject: {self.subject}\nAuthor Style: {self.author_style}, Genre: {self.genre}\n", priority=100, required=True)
         # Clean plot_outline from chapter count
         cleaned_plot_outline = re.sub(r"SUGGESTED_CHAPTER_COUNT:\s*\d+", "", self.plot_outline, flags=re.IGNORECASE).strip()
-        context += f"High-Level Plot Outline:\n{cleaned_plot_outline}\n\n"
-        context += f"World Details: {json.dumps(self.world_details)}\n"
-        context += f"Themes & Motifs: {json.dumps(self.themes_motifs)}\n\n"
+        builder.add("plot outline", f"{cleaned_plot_outline}\n\n", priority=70, trim="head", header="High-Level Plot Outline:\n")
+        builder.add("world details", f"{json.dumps(self.world_details)}\n", priority=45, trim="head", header="World Details: ")
+        builder.add("themes & motifs", f"{json.dumps(self.themes_motifs)}\n\n", priority=40, trim="head", header="Themes & Motifs: ")
 
-        context += "Character Profiles & Current Status (as of start of this chapter):\n"
+        builder.add("character heading", "Character Profiles & Current Status (as of start of this chapter):\n", priority=100, required=True)
         for name, data in self.characters.items():
-            context += f"- {name} ({data.get('role','N/A')}):\n"
-            context += f"  Description: {data.get('description','N/A')}\n"
-            context += f"  Motivations: {data.get('motivation','N/A')}. Initial Arc: {data.get('arc_summary','N/A')}\n"
-            context += f"  Current Status: {data.get('current_status','unknown')}, Location: {data.get('current_location','unknown')}, Emotion: {data.get('emotional_state','unknown')}\n"
-            context += f"  Known Facts: {', '.join(data.get('knowledge',[]))}\n"
+            rank = 5 if "protagonist" in str(data.get('role', '')).lower() else 0 # Protagonist details outlast supporting cast
+            builder.add(f"{name} name", f"- {name} ({data.get('role','N/A')}):\n", priority=85 + rank)
+            builder.add(f"{name} profile", f"  Description: {data.get('description','N/A')}\n"
+                        f"  Motivations: {data.get('motivation','N/A')}. Initial Arc: {data.get('arc_summary','N/A')}\n", priority=60 + rank, trim="head")
+            builder.add(f"{name} status", f"  Current Status: {data.get('current_status','unknown')}, Location: {data.get('current_location','unknown')}, Emotion: {data.get('emotional_state','unknown')}\n", priority=85 + rank)
+            builder.add(f"{name} known facts", f"{', '.join(data.get('knowledge',[]))}\n", priority=50 + rank, trim="tail", header="  Known Facts: ")
             if data.get('development_log'):
                 relevant_logs = [log for log in data['development_log'] if log['chapter'] < chapter_num]
                 if relevant_logs:
                     last_dev = relevant_logs[-1]
-                    context += f"  Last Noted Development (Ch {last_dev['chapter']}): {last_dev.get('summary', 'N/A')}\n"
-        context += "\n"
+                    builder.add(f"{name} last development", f"  Last Noted Development (Ch {last_dev['chapter']}): {last_dev.get('summary', 'N/A')}\n", priority=75 + rank, trim="head")
+        builder.add("character spacing", "\n", priority=100, required=True)
 
         if chapter_num > 1:
             prev_chap_num = chapter_num - 1
             prev_continuity = self.chapter_continuity_data.get(prev_chap_num, {})
             prev_plan = self.chapter_plans.get(prev_chap_num, {})
-            context += f"Summary of Previous Chapter ({prev_chap_num} - '{prev_plan.get('title', 'Untitled')}'):\n"
-            context += f"{prev_continuity.get('summary', 'N/A')}\n"
-            context += f"Ended with Emotional Tone: {prev_continuity.get('emotional_tone_end_achieved_in_summary', 'N/A')}\n"
-            context += f"Timeline at end of Ch {prev_chap_num}: {prev_continuity.get('timeline_end', 'N/A')}\n"
-            context += f"Hook for current chapter (from prev chapter's plan): {prev_plan.get('connection_to_next', 'N/A')}\n\n"
+            builder.add("previous chapter summary", f"{prev_continuity.get('summary', 'N/A')}\n", priority=90, trim="tail",
+                        header=f"Summary of Previous Chapter ({prev_chap_num} - '{prev_plan.get('title', 'Untitled')}'):\n")
+            builder.add("previous chapter ending", f"Ended with Emotional Tone: {prev_continuity.get('emotional_tone_end_achieved_in_summary', 'N/A')}\n"
+                        f"Timeline at end of Ch {prev_chap_num}: {prev_continuity.get('timeline_end', 'N/A')}\n"
+                        f"Hook for current chapter (from prev chapter's plan): {prev_plan.get('connection_to_next', 'N/A')}\n\n", priority=95, required=True)
 
-        return context
+        return builder.build()
 
     def _generate_chapter_opener(self, chapter_num, current_chapter_plan):
         """Generates the opening paragraph(s) for the current chapter."""
@@ -785,19 +1113,30 @@ Begin your response with Act I.
 
         Opening paragraph(s) for Chapter {chapter_num}:
         """
-        opener_text = self._ollama_generate(prompt, system_prompt, temperature=0.68)
+        opener_text = self._ollama_generate(prompt, system_prompt, temperature=0.68, stage="opener")
         return f"{chapter_title_line}\n\n{opener_text}\n\n"
 
 
-    def _generate_scene_prose(self, chapter_num, scene_index, scene_description, current_chapter_plan, continuity_context, previous_scene_prose=""):
-        """Generates prose for a single scene within a chapter."""
+    def _generate_scene_prose(self, chapter_num, scene_index, scene_description, current_chapter_plan, continuity_context, previous_scene_prose="", on_token=None):
+        """Generates prose for a single scene within a chapter. Streams tokens to on_token when OLLAMA_STREAM_SCENES is on."""
         system_prompt = f"You are a celebrated novelist in the style of {self.author_style}, writing a {self.genre} novel. Your prose is vivid, emotionally resonant, and drives the plot forward. You excel at 'showing, not telling' and making fantastical elements relatable."
 
         motif_to_weave = "N/A"
         if self.themes_motifs.get("motifs") and len(self.themes_motifs["motifs"]) > 0 :
             motif_to_weave = self.themes_motifs["motifs"][(chapter_num + scene_index -1) % len(self.themes_motifs["motifs"])]
 
-        prompt = f"""
+        # Scene-specific, so it goes in the per-scene request rather than the reusable chapter context
+        relevant_passages = self.passage_index.relevant_passages_text(scene_description, k=RELEVANT_PASSAGES_K, exclude_chapters=(chapter_num - 1, chapter_num))
+        relevant_passages_block = ""
+        if relevant_passages:
+            relevant_passages_block = f"""
+        Relevant passages from EARLIER chapters (keep callbacks consistent with them; do not repeat them):
+        ---
+        {relevant_passages}
+        ---
+"""
+
+        chapter_context = f"""
         {continuity_context}
 
         Current Chapter Plan ({chapter_num} - "{current_chapter_plan.get('title', 'Untitled')}"):
@@ -807,12 +1146,13 @@ Begin your response with Act I.
         - Plot Advancement for this chapter: {current_chapter_plan.get('plot_advancement', 'N/A')}
         - Planned Emotional Tone (End of Chapter): {current_chapter_plan.get('emotional_tone_end', 'N/A')}
         - Timeline & Pacing for this chapter: {current_chapter_plan.get('timeline_pacing', 'N/A')}
-
+        """
+        scene_request = f"""
         Prose written SO FAR in THIS CHAPTER (before this scene):
         ---
         {previous_scene_prose[-2000:] if previous_scene_prose else "This is the first scene of the chapter (after the chapter title and opener)."}
         ---
-
+{relevant_passages_block}
         YOUR TASK: Write the narrative prose for THE FOLLOWING SPECIFIC SCENE ONLY.
         Scene {scene_index + 1} Description (from chapter plan): "{scene_description}"
 
@@ -830,9 +1170,51 @@ Begin your response with Act I.
 
         Begin Scene {scene_index + 1} prose now:
         """
-        scene_prose = self._ollama_generate(prompt, system_prompt, temperature=0.72, top_p=0.92)
+        if OLLAMA_SCENE_PREFIX_REUSE:
+            # Identical for every scene of the chapter, so Ollama can serve this prefix from its KV cache
+            system_prompt = f"{system_prompt}\n\nSTORY AND CHAPTER CONTEXT:\n{chapter_context}"
+            prompt = scene_request
+        else:
+            prompt = chapter_context + scene_request
+
+        if OLLAMA_STREAM_SCENES:
+            scene_prose = self._ollama_generate_stream(prompt, system_prompt, temperature=0.72, top_p=0.92, on_token=on_token, stop_pattern=SCENE_STOP_PATTERN, use_chat=OLLAMA_SCENE_PREFIX_REUSE, stage="scene")
+        else:
+            scene_prose = self._ollama_generate(prompt, system_prompt, temperature=0.72, top_p=0.92, use_chat=OLLAMA_SCENE_PREFIX_REUSE, stage="scene")
+        self._record_scene_prefill(len(system_prompt) + len(prompt))
         return scene_prose
 
+    def _record_scene_prefill(self, prompt_chars):
+        """
+        Reports how much prefill the last scene call needed. The first uncached scene of the run is the cold
+        baseline (whole prompt prefilled); for later scenes the tokens Ollama did not have to evaluate are
+        estimated from that baseline's tokens-per-char and priced at its seconds-per-token.
+        """
+        metrics = self.last_call_metrics
+        if not metrics or not metrics["prompt_eval_count"]:
+            return # Served from the response cache, or the stream was aborted before the final counters
+        evaluated = metrics["prompt_eval_count"]
+        if self.prefill_baseline is None:
+            self.prefill_baseline = {
+                "tokens_per_char": evaluated / prompt_chars,
+                "seconds_per_token": metrics["prompt_eval_seconds"] / evaluated,
+            }
+            self.token_estimator.calibrate(prompt_chars, evaluated)
+            print(f"    (Prefill: {evaluated} prompt tokens in {metrics['prompt_eval_seconds']:.2f}s, cold baseline)")
+            return
+        expected = int(prompt_chars * self.prefill_baseline["tokens_per_char"])
+        reused = max(0, expected - evaluated)
+        saved_seconds = reused * self.prefill_baseline["seconds_per_token"]
+        self.prefill_savings["scenes"] += 1
+        self.prefill_savings["reused_tokens"] += reused
+        self.prefill_savings["saved_seconds"] += saved_seconds
+        print(f"    (Prefill: {evaluated} new prompt tokens in {metrics['prompt_eval_seconds']:.2f}s; ~{reused} cached tokens reused, ~{saved_seconds:.1f}s saved)")
+
+    def _index_chapter(self, chapter_num, content):
+        """Adds a finished chapter to the passage index used for retrieval in later scenes."""
+        if content and not content.startswith("[ERROR"):
+            self.passage_index.add_chapter(chapter_num, content)
+
     def _analyze_inter_chapter_flow(self, previous_chapter_num, current_chapter_num, current_chapter_opening_text):
         """
         Analyzes the narrative flow between the end of the previous chapter and the start of the current chapter.
@@ -884,7 +1266,7 @@ Begin your response with Act I.
         Be concise and constructive.
         Flow Analysis:
         """
-        flow_analysis_text = self._ollama_generate(prompt, system_prompt, temperature=0.5)
+        flow_analysis_text = self._ollama_generate(prompt, system_prompt, temperature=0.5, stage="flow-analysis")
         print(f"    Flow Analysis Result: {flow_analysis_text[:200]}...")
 
         if current_chapter_num not in self.chapter_continuity_data:
@@ -894,12 +1276,19 @@ Begin your response with Act I.
         return flow_analysis_text
 
 
-    def _update_chapter_continuity_data(self, chapter_num, full_chapter_content, is_final_pass_for_chapter=False):
+    def _update_chapter_continuity_data(self, chapter_num, full_chapter_content, is_final_pass_for_chapter=False, characters=None):
         """
         Analyzes generated chapter content to update continuity data (summary, character states, timeline, emotion).
+        With characters (a copy of self.characters) the pass is detached: character updates go into that copy and
+        the entry is only returned, so it can run on a worker thread while the next chapter is drafted.
         """
         print(f"Updating continuity data for Chapter {chapter_num} ({'final pass' if is_final_pass_for_chapter else 'interim pass'})...")
+        detached = characters is not None
+        if characters is None:
+            characters = self.characters
         entry = self.chapter_continuity_data.get(chapter_num, {})
+        if detached:
+            entry = dict(entry)
 
         summary_system_prompt = "You are a literary analyst. Your task is to summarize chapter content accurately and concisely for continuity purposes."
         summary_prompt = f"""
@@ -912,7 +1301,7 @@ Begin your response with Act I.
         ---
         Detailed Summary of Chapter {chapter_num}:
         """
-        entry["summary"] = self._ollama_generate(summary_prompt, summary_system_prompt, temperature=0.5)
+        entry["summary"] = self._ollama_generate(summary_prompt, summary_system_prompt, temperature=0.5, stage="continuity")
 
         if is_final_pass_for_chapter:
             active_chars_in_chapter = []
@@ -925,14 +1314,14 @@ Begin your response with Act I.
                         potential_names = re.split(r'[,\s]+and\s+|\s*,\s*|[,\s]+with\s+', names_str)
                         for char_name_candidate in potential_names:
                             clean_name = char_name_candidate.strip().rstrip('.').strip()
-                            if clean_name and clean_name in self.characters and clean_name not in active_chars_in_chapter:
+                            if clean_name and clean_name in characters and clean_name not in active_chars_in_chapter:
                                 active_chars_in_chapter.append(clean_name)
                 char_dev_focus = current_chapter_plan.get("character_development", "")
-                for char_name in self.characters.keys():
+                for char_name in characters.keys():
                     if re.search(r'\b' + re.escape(char_name) + r'\b', char_dev_focus, re.IGNORECASE) and char_name not in active_chars_in_chapter:
                             active_chars_in_chapter.append(char_name)
 
-            if not active_chars_in_chapter: active_chars_in_chapter = list(self.characters.keys())
+            if not active_chars_in_chapter: active_chars_in_chapter = list(characters.keys())
 
             char_update_system_prompt = "You are a narrative continuity expert. Update character states based on chapter events."
             char_update_prompt = f"""
@@ -954,7 +1343,7 @@ Begin your response with Act I.
 
             Format clearly for each character.
             """
-            character_updates_text = self._ollama_generate(char_update_prompt, char_update_system_prompt, temperature=0.55)
+            character_updates_text = self._ollama_generate(char_update_prompt, char_update_system_prompt, temperature=0.55, stage="continuity")
             entry["character_updates_text"] = character_updates_text
 
             current_char_name_update = None
@@ -963,20 +1352,20 @@ Begin your response with Act I.
                 line = line.strip()
                 name_match = re.match(r"CHARACTER NAME:\s*(.*)", line, re.IGNORECASE)
                 if name_match:
-                    if current_char_name_update and parsed_updates_for_log and current_char_name_update in self.characters:
-                        self.characters[current_char_name_update]["development_log"].append(
+                    if current_char_name_update and parsed_updates_for_log and current_char_name_update in characters:
+                        characters[current_char_name_update]["development_log"].append(
                             {"chapter": chapter_num, "summary": "Updates from chapter events", **parsed_updates_for_log}
                         )
                     current_char_name_update = name_match.group(1).strip()
                     parsed_updates_for_log = {}
-                    if current_char_name_update not in self.characters:
+                    if current_char_name_update not in characters:
                         current_char_name_update = None
-                    elif self.characters[current_char_name_update].get("first_appearance_chapter", 0) == 0:
-                            self.characters[current_char_name_update]["first_appearance_chapter"] = chapter_num
+                    elif characters[current_char_name_update].get("first_appearance_chapter", 0) == 0:
+                            characters[current_char_name_update]["first_appearance_chapter"] = chapter_num
                     continue
 
-                if current_char_name_update and current_char_name_update in self.characters:
-                    char_obj = self.characters[current_char_name_update]
+                if current_char_name_update and current_char_name_update in characters:
+                    char_obj = characters[current_char_name_update]
                     def get_value(text, key_phrase):
                         # Match key phrase at start of line, possibly after "- "
                         if re.match(r"-\s*" + re.escape(key_phrase.upper()), text.upper()) or text.upper().startswith(key_phrase.upper()):
@@ -1016,8 +1405,8 @@ Begin your response with Act I.
                             char_obj["knowledge"].append(know_val)
                         parsed_updates_for_log["new_knowledge"] = know_val if know_val is not None else "No change"
                         continue
-            if current_char_name_update and parsed_updates_for_log and current_char_name_update in self.characters:
-                self.characters[current_char_name_update]["development_log"].append(
+            if current_char_name_update and parsed_updates_for_log and current_char_name_update in characters:
+                characters[current_char_name_update]["development_log"].append(
                     {"chapter": chapter_num, "summary": "Updates from chapter events", **parsed_updates_for_log}
                 )
 
@@ -1037,7 +1426,7 @@ Begin your response with Act I.
         END_TIME: [answer]
         MARKERS: [answer]
         """
-        timeline_text = self._ollama_generate(timeline_prompt, timeline_system_prompt, temperature=0.4)
+        timeline_text = self._ollama_generate(timeline_prompt, timeline_system_prompt, temperature=0.4, stage="continuity")
         
         # More efficient regex use
         elapsed_match = re.search(r"ELAPSED:\s*(.*?)(?:\n|$)", timeline_text, re.IGNORECASE)
@@ -1054,7 +1443,38 @@ Begin your response with Act I.
             entry["ending_hook_text"] = "N/A (Last chapter or hook not generated)"
 
 
-        self.chapter_continuity_data[chapter_num] = entry
+        if not detached:
+            self.chapter_continuity_data[chapter_num] = entry
+        return entry
+
+    def _reconcile_pending_continuity(self):
+        """
+        Waits for the background final continuity pass (if any) and folds its result in: the chapter's
+        continuity entry and the updated characters. Returns True if any character's status, location or
+        emotional state differs from the snapshot the current chapter was started from.
+        """
+        if not self.pending_continuity:
+            return False
+        chapter_num, characters, future = self.pending_continuity
+        self.pending_continuity = None
+        entry = None
+        if future is not None:
+            try:
+                entry = future.result()
+            except Exception as e:
+                print(f"  Warning: Background continuity pass for Chapter {chapter_num} failed ({e}); rerunning it inline.")
+        if entry is None:
+            characters = copy.deepcopy(self.characters)
+            entry = self._update_chapter_continuity_data(chapter_num, self.generated_chapters_content[chapter_num], True, characters)
+
+        changed = [name for name, data in characters.items()
+                   if any(data.get(field) != self.characters.get(name, {}).get(field) for field in CHARACTER_STATE_FIELDS)]
+        self.characters = characters
+        self.chapter_continuity_data.setdefault(chapter_num, {}).update(entry)
+        self._save_checkpoint()
+        if changed:
+            print(f"  Reconciled Chapter {chapter_num} continuity: updated state for {', '.join(changed)}.")
+        return bool(changed)
 
     def _generate_chapter_transition_hook(self, chapter_num, current_chapter_content, current_chapter_continuity):
         """Generates the transition hook/paragraph(s) for the end of the current chapter."""
@@ -1092,7 +1512,7 @@ Begin your response with Act I.
 
         Final transition paragraph(s) for Chapter {chapter_num}:
         """
-        hook_text = self._ollama_generate(prompt, system_prompt, temperature=0.75)
+        hook_text = self._ollama_generate(prompt, system_prompt, temperature=0.75, stage="hook")
 
         if chapter_num in self.chapter_continuity_data:
             self.chapter_continuity_data[chapter_num]["ending_hook_text"] = hook_text.strip()
@@ -1111,23 +1531,52 @@ Begin your response with Act I.
             print("ERROR: Cannot generate novel content without detailed chapter plans or chapter count.")
             return False
 
+        for chapter_num, content in self.generated_chapters_content.items(): # Chapters restored from a checkpoint
+            self._index_chapter(chapter_num, content)
+        self._reconcile_pending_continuity() # A final pass interrupted by a crash is rerun inline
+
+        continuity_worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="continuity") if OLLAMA_PIPELINE_CHAPTERS else None
+        try:
+            self._generate_chapters(continuity_worker)
+        finally:
+            if continuity_worker:
+                continuity_worker.shutdown(wait=True)
+        self._reconcile_pending_continuity()
+        return True
+
+    def _generate_chapters(self, continuity_worker):
+        """Chapter loop of generate_novel_content; with a continuity_worker, final passes overlap the next chapter."""
         for i in range(1, self.num_chapters + 1):
+            if i in self.generated_chapters_content:
+                print(f"\n--- Chapter {i} restored from checkpoint, skipping ---")
+                continue
+
             print(f"\n--- Generating Chapter {i} of {self.num_chapters} ---")
             current_chapter_plan = self.chapter_plans.get(i)
             if not current_chapter_plan:
                 print(f"ERROR: No plan found for Chapter {i}. Skipping.")
                 self.generated_chapters_content[i] = f"[ERROR: No plan found for Chapter {i}]"
                 self.chapter_continuity_data[i] = {"summary": "Error: No plan.", "character_updates_text": "", "timeline_end": "Unknown", "emotional_tone_end_achieved_in_summary": "Error", "ending_hook_text": "", "flow_analysis_from_previous": "N/A"}
+                self._save_checkpoint()
                 continue
 
             continuity_context = self._get_continuity_context_for_chapter(i)
 
-            chapter_opener_text_with_title = self._generate_chapter_opener(i, current_chapter_plan)
+            resumed_chapter = self.in_progress_chapter if self.in_progress_chapter and self.in_progress_chapter.get("chapter") == i else None
+            if resumed_chapter:
+                print(f"  Resuming Chapter {i} from checkpoint at scene {resumed_chapter['next_scene_index'] + 1}.")
+                chapter_opener_text_with_title = resumed_chapter["opener_text"]
+                chapter_prose = resumed_chapter["chapter_prose"]
+            else:
+                chapter_opener_text_with_title = self._generate_chapter_opener(i, current_chapter_plan)
+
+                chapter_prose = chapter_opener_text_with_title
 
-            chapter_prose = chapter_opener_text_with_title
+                if i > 1:
+                    self._analyze_inter_chapter_flow(i - 1, i, chapter_opener_text_with_title)
 
-            if i > 1:
-                self._analyze_inter_chapter_flow(i - 1, i, chapter_opener_text_with_title)
+                self.in_progress_chapter = {"chapter": i, "opener_text": chapter_opener_text_with_title, "chapter_prose": chapter_prose, "next_scene_index": 0}
+                self._save_checkpoint()
 
             scenes = current_chapter_plan.get("scenes", [])
             if not scenes:
@@ -1135,18 +1584,34 @@ Begin your response with Act I.
                 if chapter_prose.strip() == chapter_opener_text_with_title.strip(): # If only opener was generated
                      chapter_prose += "\n\n[This chapter's plan had no specific scenes. The narrative continues based on the chapter goal.]\n\n"
             else:
-                accumulated_scene_prose_for_chapter = chapter_opener_text_with_title # Start with opener
+                accumulated_scene_prose_for_chapter = chapter_prose # Start with opener (plus any scenes restored from checkpoint)
+                first_scene_idx = self.in_progress_chapter["next_scene_index"]
                 for scene_idx, scene_desc in enumerate(scenes):
+                    if scene_idx < first_scene_idx:
+                        continue
+                    if scene_idx > 0 and self._reconcile_pending_continuity():
+                        continuity_context = self._get_continuity_context_for_chapter(i) # Previous chapter's final character states
                     print(f"  Generating Scene {scene_idx + 1} of {len(scenes)} for Chapter {i}: {scene_desc[:80]}...")
-                    scene_specific_prose = self._generate_scene_prose(i, scene_idx, scene_desc, current_chapter_plan, continuity_context, accumulated_scene_prose_for_chapter)
+                    self.in_progress_chapter["streaming_scene_prose"] = "" # Chapter buffer for the scene while it streams in
+                    def show_streamed_text(text):
+                        self.in_progress_chapter["streaming_scene_prose"] += text
+                        sys.stdout.write(text)
+                        sys.stdout.flush()
+                    scene_specific_prose = self._generate_scene_prose(i, scene_idx, scene_desc, current_chapter_plan, continuity_context, accumulated_scene_prose_for_chapter, on_token=show_streamed_text)
                     if "[OLLAMA" in scene_specific_prose:
                         print(f"    ERROR generating scene {scene_idx+1}: {scene_specific_prose}")
                         scene_specific_prose = f"\n\n[Error generating scene: {scene_desc[:50]}...]\n\n"
 
                     chapter_prose += scene_specific_prose + "\n\n" # Append scene to overall chapter prose
                     accumulated_scene_prose_for_chapter += scene_specific_prose + "\n\n" # Update context for next scene in this chapter
+                    self.in_progress_chapter["chapter_prose"] = chapter_prose
+                    self.in_progress_chapter["streaming_scene_prose"] = ""
+                    self.in_progress_chapter["next_scene_index"] = scene_idx + 1
+                    self._save_checkpoint()
                     time.sleep(0.2)
 
+            self._reconcile_pending_continuity() # Hook and this chapter's passes need the previous chapter's final state
+
             # Interim continuity update (based on content BEFORE the hook for this chapter)
             # This is useful for the hook generation itself, if it needs summary of current chapter.
             self._update_chapter_continuity_data(i, chapter_prose.strip(), is_final_pass_for_chapter=False)
@@ -1157,40 +1622,42 @@ Begin your response with Act I.
                 chapter_prose += hook_text
 
             self.generated_chapters_content[i] = chapter_prose.strip()
+            self._index_chapter(i, self.generated_chapters_content[i])
             print(f"  Chapter {i} ('{current_chapter_plan.get('title', 'Untitled')}') content generated (approx length: {len(chapter_prose)} chars).")
 
             # FINAL continuity update for the chapter (with opener, scenes, and hook included)
-            self._update_chapter_continuity_data(i, self.generated_chapters_content[i], is_final_pass_for_chapter=True)
+            if continuity_worker and i < self.num_chapters:
+                characters = copy.deepcopy(self.characters)
+                future = continuity_worker.submit(self._update_chapter_continuity_data, i, self.generated_chapters_content[i], True, characters)
+                self.pending_continuity = (i, characters, future)
+                print(f"  Final continuity pass for Chapter {i} running in the background while Chapter {i + 1} is drafted.")
+            else:
+                self._update_chapter_continuity_data(i, self.generated_chapters_content[i], is_final_pass_for_chapter=True)
+            self.in_progress_chapter = None
+            self._save_checkpoint()
 
             if i < self.num_chapters:
                 print("Pausing briefly before next chapter...")
                 time.sleep(0.5)
 
-        return True
-
     # --- Transition Checking Phase ---
-    def _check_and_improve_transition(self, prev_chapter_num, current_chapter_num):
-        """Checks transition from prev to current chapter and improves if needed."""
-        print(f"\n--- Checking transition from Chapter {prev_chapter_num} to {current_chapter_num} ---")
+    def _request_transition_check(self, prev_chapter_num, current_chapter_num):
+        """Asks the editor model to judge (and if needed rewrite) a chapter opening. Only reads chapter text, so it can run on worker threads."""
 
         prev_chapter_content = self.generated_chapters_content.get(prev_chapter_num)
         current_chapter_content = self.generated_chapters_content.get(current_chapter_num)
 
-        if not prev_chapter_content or not current_chapter_content:
-            print("  Skipping transition check: Missing content for one or both chapters.")
-            return
-
         system_prompt = """You are a professional editor specializing in narrative flow and chapter transitions."""
         prompt = f"""Analyze the transition between the end of the previous chapter and the beginning of the current chapter.
 
         END OF PREVIOUS CHAPTER ({prev_chapter_num}):
         ---
-        {prev_chapter_content[-1000:]}
+        {prev_chapter_content[-TRANSITION_CONTEXT_CHARS:]}
         ---
 
         BEGINNING OF CURRENT CHAPTER ({current_chapter_num}):
         ---
-        {current_chapter_content[:1000]}
+        {current_chapter_content[:TRANSITION_CONTEXT_CHARS]}
         ---
 
         If the transition is already smooth and logical, respond ONLY with the exact text:
@@ -1205,7 +1672,12 @@ Begin your response with Act I.
 
         Start your response with the exact text "TRANSITION: REVISED" followed by the revised beginning paragraphs. Do NOT include the chapter title in the revised text.
         """
-        transition_check_result = self._ollama_generate(prompt, system_prompt, temperature=0.6)
+        return self._ollama_generate(prompt, system_prompt, temperature=0.6, stage="transition-check")
+
+    def _apply_transition_check(self, prev_chapter_num, current_chapter_num, transition_check_result):
+        """Applies a transition check result to the current chapter. Returns True if its opening was revised."""
+        print(f"\n--- Checking transition from Chapter {prev_chapter_num} to {current_chapter_num} ---")
+        current_chapter_content = self.generated_chapters_content[current_chapter_num]
 
         if "[OLLAMA" in transition_check_result:
             print(f"  Error during transition check: {transition_check_result}")
@@ -1241,9 +1713,11 @@ Begin your response with Act I.
 
                         self.generated_chapters_content[current_chapter_num] = f"{original_title_line}\n\n{revised_beginning}\n\n{original_rest_of_chapter}".strip()
                         print(f"  Chapter {current_chapter_num} opening revised successfully.")
+                        return True
                     else: # Chapter content was just the title line or title + one block
                          self.generated_chapters_content[current_chapter_num] = f"{original_title_line}\n\n{revised_beginning}".strip()
                          print(f"  Chapter {current_chapter_num} (short) opening revised successfully.")
+                         return True
 
                 else:
                     print("  Transition check indicated revision needed, but no revised text was provided by LLM.")
@@ -1253,21 +1727,48 @@ Begin your response with Act I.
             print("  Transition is smooth. No changes needed.")
         else:
             print(f"  Transition check response was unclear: {transition_check_result[:200]}... No changes applied.")
+        return False
 
 
     def _perform_final_transition_checks(self):
-        """Loops through all chapters to check and improve transitions."""
+        """
+        Checks every chapter boundary. All pairs of a wave are sent to the model concurrently (each check only reads
+        the tail of chapter i-1 and the head of chapter i); revisions are then applied in chapter order. A revision
+        that also changed a chapter's tail makes the next boundary's verdict stale, so that pair is re-checked in the
+        following wave instead of being applied.
+        """
         print("\n--- Performing Final Pass: Checking Chapter Transitions ---")
         if len(self.generated_chapters_content) < 2:
             print("  Skipping transition checks (less than 2 chapters generated).")
             return
 
-        for i in range(2, self.num_chapters + 1):
+        pending_pairs = []
+        for i in range(2, self.num_chapters + 1): # Start from chapter 2
             if i in self.generated_chapters_content and (i - 1) in self.generated_chapters_content:
-                self._check_and_improve_transition(i - 1, i)
-                time.sleep(0.5)
+                pending_pairs.append(i)
             else:
                 print(f"  Skipping transition check for Chapter {i} (missing previous or current chapter content).")
+
+        wave = 0
+        while pending_pairs and wave < TRANSITION_CHECK_MAX_WAVES:
+            wave += 1
+            print(f"  Wave {wave}: checking {len(pending_pairs)} transition(s) with up to {TRANSITION_CHECK_PARALLELISM} in parallel...")
+            with ThreadPoolExecutor(max_workers=min(TRANSITION_CHECK_PARALLELISM, len(pending_pairs))) as executor:
+                futures = {i: executor.submit(self._request_transition_check, i - 1, i) for i in pending_pairs}
+
+            changed_tails = set()
+            for i in pending_pairs:
+                if i - 1 in changed_tails:
+                    print(f"\n  Chapter {i - 1}'s ending changed in this wave; its transition to Chapter {i} will be re-checked.")
+                    continue
+                tail_before = self.generated_chapters_content[i][-TRANSITION_CONTEXT_CHARS:]
+                if self._apply_transition_check(i - 1, i, futures[i].result()):
+                    if self.generated_chapters_content[i][-TRANSITION_CONTEXT_CHARS:] != tail_before:
+                        changed_tails.add(i)
+            pending_pairs = sorted(i + 1 for i in changed_tails if i + 1 in self.generated_chapters_content)
+
+        if pending_pairs:
+            print(f"  Stopped after {TRANSITION_CHECK_MAX_WAVES} waves; transitions into chapter(s) {pending_pairs} were not re-checked.")
         print("--- Finished Final Transition Checks ---")
 
 
@@ -1297,7 +1798,7 @@ Begin your response with Act I.
         Return ONLY the generated title itself, without any quotation marks, labels (like "Title:"), or explanatory text.
         Novel Title:
         """
-        title_text = self._ollama_generate(prompt, system_prompt, temperature=0.8)
+        title_text = self._ollama_generate(prompt, system_prompt, temperature=0.8, stage="title")
         if "[OLLAMA" in title_text or not title_text.strip():
             print(f"ERROR generating title: {title_text}. Using placeholder.")
             main_char_name = list(self.characters.keys())[0] if self.characters else 'Adventure'
@@ -1413,7 +1914,7 @@ Begin your response with Act I.
         safe_title = re.sub(r'[^\w\s-]', '', self.novel_title).strip().replace(' ', '_')
         safe_genre = self.genre.replace('/','-').replace(' ','')
         filename = f"{safe_title[:50]}_Novel_{safe_genre}.docx"
-        filepath = os.path.join(OUTPUT_DIR, filename)
+        filepath = os.path.join(self.output_dir, filename)
 
         try:
             doc.save(filepath)
@@ -1440,18 +1941,20 @@ Begin your response with Act I.
             "author_style": self.author_style,
             "genre": self.genre,
             "num_chapters_determined": self.num_chapters,
-            "ollama_model_used": OLLAMA_MODEL,
+            "ollama_model_used": self.model,
+            "ollama_small_model_used": self.small_model,
             "generation_timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
             "characters_final": serialize_for_json(self.characters),
             "world_details": serialize_for_json(self.world_details),
             "themes_motifs": serialize_for_json(self.themes_motifs),
             "plot_outline": self.plot_outline,
             "chapter_plans": serialize_for_json(self.chapter_plans),
+            "chapter_plan_texts": self.chapter_plan_texts,
             "chapter_continuity_data": serialize_for_json(self.chapter_continuity_data),
         }
         
         meta_filename = f"{safe_title[:50]}_Novel_METADATA.json"
-        meta_filepath = os.path.join(OUTPUT_DIR, meta_filename)
+        meta_filepath = os.path.join(self.output_dir, meta_filename)
         try:
             with open(meta_filepath, "w", encoding="utf-8") as f:
                 json.dump(metadata, f, indent=2, ensure_ascii=False)
@@ -1463,23 +1966,36 @@ Begin your response with Act I.
     def orchestrate_generation(self):
         """
         Main public method to run the entire novel generation pipeline.
+        Returns True once the novel is compiled, False if a phase failed (the checkpoint keeps finished phases).
         """
         start_time = time.time()
         print("--- Starting Novel Generation Pipeline ---")
 
-        if not self.generate_foundational_elements():
+        if "foundation" in self.completed_phases:
+            print("Foundational elements restored from checkpoint.")
+        elif not self.generate_foundational_elements():
             # Error message already printed in generate_foundational_elements
-            return
+            return False
+        else:
+            self._mark_phase_complete("foundation")
 
-        if not self.generate_detailed_chapter_plans():
+        if "plans" in self.completed_phases:
+            print("Chapter plans restored from checkpoint.")
+        elif not self.generate_detailed_chapter_plans():
             # Error message already printed in generate_detailed_chapter_plans
-            return
+            return False
+        else:
+            self._mark_phase_complete("plans")
 
-        if not self.generate_novel_content():
-            print("Halting: Novel content generation failed.")
-            return
+        if "content" not in self.completed_phases:
+            if not self.generate_novel_content():
+                print("Halting: Novel content generation failed.")
+                return False
+            self._mark_phase_complete("content")
 
-        self._perform_final_transition_checks()
+        if "transitions" not in self.completed_phases:
+            self._perform_final_transition_checks()
+            self._mark_phase_complete("transitions")
 
         self.compile_and_save_novel()
 
@@ -1487,6 +2003,12 @@ Begin your response with Act I.
         total_time_minutes = (end_time - start_time) / 60
         print(f"--- Novel Generation Pipeline Finished ---")
         print(f"Total time taken: {total_time_minutes:.2f} minutes.")
+        print(self.response_cache.stats_line())
+        if self.prefill_savings["scenes"]:
+            print(f"Scene prefix reuse: ~{self.prefill_savings['reused_tokens']} prompt tokens served from Ollama's KV cache "
+                  f"across {self.prefill_savings['scenes']} scenes, ~{self.prefill_savings['saved_seconds']:.1f}s of prefill saved.")
+        self.telemetry.print_summary()
+        return True
 
 
 def get_user_input_multiline(prompt_message):
@@ -1583,13 +2105,35 @@ def load_resume_text(file_path):
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AI Novel Generator")
+    parser.add_argument("--resume", metavar="RUN_DIR", help="Continue an interrupted run from its checkpoint directory")
+    args = parser.parse_args()
+
     print("Welcome to the AI Novel Generator!")
     print("Please ensure your Ollama server is running and the model is available.")
+
+    if args.resume:
+        # Keep using the model the interrupted run was started with
+        checkpoint_state = RunJournal(args.resume).load()
+        if checkpoint_state and checkpoint_state.get("ollama_model"):
+            OLLAMA_MODEL = checkpoint_state["ollama_model"]
+        print(f"Using Ollama Model: {OLLAMA_MODEL} at {OLLAMA_BASE_URL}")
+        if checkpoint_state and checkpoint_state.get("ollama_small_model"):
+            print(f"Extraction/analysis model: {checkpoint_state['ollama_small_model']}")
+        generator = NovelGenerator.resume_from_checkpoint(args.resume)
+        if generator:
+            generator.orchestrate_generation()
+        raise SystemExit(0 if generator else 1)
+
     # OLLAMA_MODEL can be overridden by user input if desired, or set here.
     user_ollama_model = input(f"Enter Ollama model name (default: {OLLAMA_MODEL}): ").strip()
     if user_ollama_model:
         OLLAMA_MODEL = user_ollama_model
+    user_small_model = input(f"Enter a small model for extraction/analysis calls (default: {OLLAMA_SMALL_MODEL or 'none'}, '-' for none): ").strip()
+    if user_small_model:
+        OLLAMA_SMALL_MODEL = "" if user_small_model == "-" else user_small_model
     print(f"Using Ollama Model: {OLLAMA_MODEL} at {OLLAMA_BASE_URL}")
+    print(f"Extraction/analysis model: {OLLAMA_SMALL_MODEL or OLLAMA_MODEL}")
     print("----------------------------------------------------")
 
     resume_file_path_input = input("Enter path to resume file (text or PDF) (or press Enter to skip): ").strip()
@@ -0,0 +1,241 @@
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import traceback
+
+import ULTIMATE_POWER_UPDT as novel
+from ollama_client import get_client
+from run_journal import RunJournal
+
+# --- Configuration ---
+BATCH_DB_PATH = os.path.join(novel.OUTPUT_DIR, "batch_jobs.sqlite")
+BATCH_RUNS_DIR = os.path.join(novel.OUTPUT_DIR, "batch") # One run directory (checkpoint + .docx) per job
+BATCH_WORKERS = 2 # Novels generated concurrently
+# Ollama requests on the wire at once across every novel; keep it at the server's OLLAMA_NUM_PARALLEL
+BATCH_MAX_IN_FLIGHT = max(1, int(os.getenv("OLLAMA_NUM_PARALLEL", "4")))
+BATCH_MAX_ATTEMPTS = 2 # A failed job is retried from its checkpoint until it has run this many times
+
+MANIFEST_FIELDS = ("resume", "subject", "author_style", "genre", "model", "small_model")
+
+
+def job_id_for(spec):
+    """Stable id for a manifest entry, so re-submitting the same manifest does not queue duplicates."""
+    fields = {field: spec.get(field) for field in MANIFEST_FIELDS}
+    if fields["small_model"] is None: # Unset keeps the ids of manifests written before the field existed
+        del fields["small_model"]
+    material = json.dumps(fields, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()[:16]
+
+
+class JobQueue:
+    """
+    Persistent table of batch jobs backed by SQLite.
+
+    A job moves queued -> running -> done/failed. Jobs still marked running when a
+    runner starts were interrupted by a crash or Ctrl-C; recover() queues them
+    again and their run directory's checkpoint picks up where they stopped.
+    """
+
+    def __init__(self, path=BATCH_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                   seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                   id TEXT UNIQUE NOT NULL,
+                   spec TEXT NOT NULL,
+                   status TEXT NOT NULL DEFAULT 'queued',
+                   attempts INTEGER NOT NULL DEFAULT 0,
+                   run_dir TEXT,
+                   novel_title TEXT,
+                   error TEXT,
+                   queued_at REAL NOT NULL,
+                   started_at REAL,
+                   finished_at REAL
+               )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, seq)")
+        self._conn.commit()
+
+    def enqueue_manifest(self, manifest_path):
+        """Queues every valid line of a JSONL manifest. Returns (added, already known, invalid)."""
+        added = known = invalid = 0
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            lines = [line for line in f if line.strip()]
+        with self._lock:
+            for line_num, line in enumerate(lines, 1):
+                try:
+                    spec = json.loads(line)
+                except json.JSONDecodeError as e:
+                    print(f"[BATCH] Manifest line {line_num}: invalid JSON ({e}). Skipped.")
+                    invalid += 1
+                    continue
+                if not isinstance(spec, dict) or not str(spec.get("subject", "")).strip():
+                    print(f"[BATCH] Manifest line {line_num}: a job needs at least a 'subject'. Skipped.")
+                    invalid += 1
+                    continue
+                job_id = str(spec.get("id") or job_id_for(spec))
+                cursor = self._conn.execute("INSERT OR IGNORE INTO jobs (id, spec, queued_at) VALUES (?, ?, ?)",
+                                            (job_id, json.dumps(spec, ensure_ascii=False), time.time()))
+                if cursor.rowcount:
+                    added += 1
+                else:
+                    known += 1
+            self._conn.commit()
+        return added, known, invalid
+
+    def recover(self):
+        """Re-queues jobs left running by a previous runner. Returns how many."""
+        with self._lock:
+            cursor = self._conn.execute("UPDATE jobs SET status = 'queued' WHERE status = 'running'")
+            self._conn.commit()
+            return cursor.rowcount
+
+    def claim(self):
+        """Marks the oldest queued job running and returns it (as a dict), or None when the queue is empty."""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE status = 'queued' ORDER BY seq LIMIT 1").fetchone()
+            if row is None:
+                return None
+            run_dir = row["run_dir"] or os.path.join(BATCH_RUNS_DIR, row["id"])
+            self._conn.execute("UPDATE jobs SET status = 'running', attempts = attempts + 1, run_dir = ?, started_at = ?, error = NULL "
+                               "WHERE id = ?", (run_dir, time.time(), row["id"]))
+            self._conn.commit()
+            job = dict(row)
+            job.update(status="running", attempts=row["attempts"] + 1, run_dir=run_dir)
+            return job
+
+    def finish(self, job, succeeded, novel_title=None, error=None, max_attempts=BATCH_MAX_ATTEMPTS):
+        """Records a job's outcome; a failure with attempts left goes back to the queue."""
+        if succeeded:
+            status = "done"
+        else:
+            status = "queued" if job["attempts"] < max_attempts else "failed"
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET status = ?, novel_title = ?, error = ?, finished_at = ? WHERE id = ?",
+                               (status, novel_title, error, time.time(), job["id"]))
+            self._conn.commit()
+        return status
+
+    def counts(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def jobs(self):
+        with self._lock:
+            return [dict(row) for row in self._conn.execute("SELECT * FROM jobs ORDER BY seq").fetchall()]
+
+    def close(self):
+        self._conn.close()
+
+
+def run_job(job):
+    """Generates (or resumes) one novel. Returns (succeeded, novel title, error message)."""
+    spec = json.loads(job["spec"])
+    generator = None
+    if RunJournal(job["run_dir"]).exists():
+        generator = novel.NovelGenerator.resume_from_checkpoint(job["run_dir"])
+    if generator is None:
+        generator = novel.NovelGenerator(
+            resume_content=novel.load_resume_text(spec.get("resume", "")),
+            subject=spec["subject"],
+            author_style=spec.get("author_style") or "Generic",
+            genre=spec.get("genre") or "Fiction",
+            run_dir=job["run_dir"],
+            model=spec.get("model"),
+            small_model=spec.get("small_model"), # None: OLLAMA_SMALL_MODEL; "": everything on `model`
+            output_dir=job["run_dir"], # Jobs with the same title must not overwrite each other's .docx
+        )
+    succeeded = generator.orchestrate_generation()
+    return succeeded, generator.novel_title, None if succeeded else "A generation phase failed (see the job's output)."
+
+
+def _worker(queue, max_attempts):
+    while True:
+        job = queue.claim()
+        if job is None:
+            return
+        print(f"[BATCH] Job {job['id']} started (attempt {job['attempts']}), run directory: {job['run_dir']}")
+        start = time.time()
+        try:
+            succeeded, title, error = run_job(job)
+        except Exception as e:
+            traceback.print_exc()
+            succeeded, title, error = False, None, f"{type(e).__name__}: {e}"
+        status = queue.finish(job, succeeded, novel_title=title, error=error, max_attempts=max_attempts)
+        print(f"[BATCH] Job {job['id']} {status} after {(time.time() - start) / 60:.1f} minutes"
+              f"{f' ({error})' if error else ''}.")
+
+
+def run_batch(queue, workers=BATCH_WORKERS, max_in_flight=BATCH_MAX_IN_FLIGHT, max_attempts=BATCH_MAX_ATTEMPTS, adaptive=False):
+    """
+    Runs queued jobs on `workers` threads until the queue is empty, sharing one Ollama request limit.
+    With adaptive the limit moves (AIMD) and max_in_flight is only its ceiling.
+    """
+    if adaptive:
+        get_client().set_adaptive_concurrency(maximum=max_in_flight)
+    else:
+        get_client().set_max_in_flight(max_in_flight)
+    threads = [threading.Thread(target=_worker, args=(queue, max_attempts), name=f"batch-worker-{i + 1}", daemon=True)
+               for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        while thread.is_alive():
+            thread.join(timeout=1.0) # Short joins keep the main thread responsive to Ctrl-C
+
+
+def print_status(queue):
+    print(f"{'Job':<18}{'Status':<9}{'Tries':>6}  {'Model':<16}{'Title / error'}")
+    for job in queue.jobs():
+        spec = json.loads(job["spec"])
+        detail = job["novel_title"] or job["error"] or spec["subject"][:60]
+        print(f"{job['id']:<18}{job['status']:<9}{job['attempts']:>6}  {(spec.get('model') or novel.OLLAMA_MODEL):<16}{detail}")
+    print(", ".join(f"{status}: {count}" for status, count in sorted(queue.counts().items())) or "No jobs.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless batch novel generation from a JSONL manifest.")
+    parser.add_argument("manifest", nargs="?", help="JSONL manifest: one object per line with subject (required), resume, "
+                                                    "author_style, genre, model, small_model and an optional id. Omit to continue the existing queue.")
+    parser.add_argument("--db", default=BATCH_DB_PATH, help="SQLite job database.")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS, help="Novels generated concurrently.")
+    parser.add_argument("--max-in-flight", type=int, default=BATCH_MAX_IN_FLIGHT, help="Ollama requests outstanding at once, across all novels.")
+    parser.add_argument("--adaptive", action="store_true", help="Raise the request limit while tokens/sec improves and cut it on "
+                                                                 "latency spikes, timeouts and 503s; --max-in-flight becomes its ceiling.")
+    parser.add_argument("--max-attempts", type=int, default=BATCH_MAX_ATTEMPTS, help="Runs per job before it is marked failed.")
+    parser.add_argument("--status", action="store_true", help="Print the job table and exit.")
+    args = parser.parse_args()
+
+    queue = JobQueue(args.db)
+    if args.status:
+        print_status(queue)
+        raise SystemExit(0)
+
+    if args.manifest:
+        added, known, invalid = queue.enqueue_manifest(args.manifest)
+        print(f"[BATCH] Manifest '{args.manifest}': {added} job(s) queued, {known} already known, {invalid} invalid.")
+    recovered = queue.recover()
+    if recovered:
+        print(f"[BATCH] {recovered} interrupted job(s) queued again; they resume from their checkpoints.")
+
+    counts = queue.counts()
+    print(f"[BATCH] {counts.get('queued', 0)} job(s) to run on {args.workers} worker(s), "
+          f"at most {args.max_in_flight} Ollama request(s) in flight{' (adaptive)' if args.adaptive else ''}. "
+          f"Model default: {novel.OLLAMA_MODEL}")
+    try:
+        run_batch(queue, workers=args.workers, max_in_flight=args.max_in_flight, max_attempts=args.max_attempts,
+                  adaptive=args.adaptive)
+    except KeyboardInterrupt:
+        print("\n[BATCH] Interrupted. Running jobs are checkpointed and resume on the next start.")
+        raise SystemExit(130)
+    print("[BATCH] Queue drained. " + ", ".join(f"{status}: {count}" for status, count in sorted(queue.counts().items())))
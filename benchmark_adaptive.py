@@ -0,0 +1,60 @@
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from mock_ollama import MockOllamaConfig, MockOllamaServer
+from ollama_client import OllamaClient
+
+# --- Configuration ---
+BENCHMARK_NUM_PARALLEL = 4 # Generations the stand-in server runs at once (its OLLAMA_NUM_PARALLEL)
+BENCHMARK_MAX_QUEUE = 4 # Waiting requests before it answers 503 (its OLLAMA_MAX_QUEUE)
+BENCHMARK_CALLS = 240
+BENCHMARK_CALLERS = 24 # Threads issuing calls concurrently, i.e. more demand than the server can take
+BENCHMARK_LATENCY = 0.05 # Stand-in prefill seconds per call
+BENCHMARK_TOKENS_PER_SEC = 2000.0 # Per-call generation speed on the stand-in server
+BENCHMARK_BACKOFF = 0.05 # Retry backoff base, small so a 503 storm costs seconds rather than minutes
+BENCHMARK_PORT = 11560
+
+
+def _run_calls(client, url, calls, callers):
+    """Issues `calls` generate calls from `callers` threads. Returns (seconds, generated tokens, failed calls)."""
+    def call(i):
+        response = client.post(url, json={"model": "mock:latest", "prompt": f"Write scene {i}.", "stream": False})
+        if not response.ok:
+            return None
+        return response.json().get("eval_count", 0)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=callers) as pool:
+        results = list(pool.map(call, range(calls)))
+    return time.perf_counter() - start, sum(r for r in results if r), sum(r is None for r in results)
+
+
+def _report(label, server, seconds, tokens, failed):
+    print(f"{label:<22}{seconds:>8.2f}s{tokens / seconds:>10.0f} tok/s{server.stats.rejected:>6} x 503{failed:>6} failed")
+    server.stats.reset()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compares fixed request limits with the AIMD adaptive limiter against a "
+                                                 "stand-in Ollama with a finite parallelism and queue.")
+    parser.add_argument("--calls", type=int, default=BENCHMARK_CALLS)
+    parser.add_argument("--callers", type=int, default=BENCHMARK_CALLERS)
+    parser.add_argument("--num-parallel", type=int, default=BENCHMARK_NUM_PARALLEL)
+    parser.add_argument("--max-queue", type=int, default=BENCHMARK_MAX_QUEUE)
+    parser.add_argument("--port", type=int, default=BENCHMARK_PORT)
+    args = parser.parse_args()
+
+    config = MockOllamaConfig(latency=BENCHMARK_LATENCY, tokens_per_sec=BENCHMARK_TOKENS_PER_SEC,
+                              num_parallel=args.num_parallel, max_queue=args.max_queue)
+    with MockOllamaServer(port=args.port, config=config) as server:
+        print(f"{'Client limit':<22}{'Time':>9}{'Throughput':>16}{'503s':>11}{'':>13}")
+        for limit in (1, args.num_parallel, args.callers):
+            client = OllamaClient(max_in_flight=limit, backoff_seconds=BENCHMARK_BACKOFF)
+            _report(f"fixed {limit}", server, *_run_calls(client, server.generate_url, args.calls, args.callers))
+
+        client = OllamaClient(max_in_flight=args.callers, adaptive=True, backoff_seconds=BENCHMARK_BACKOFF)
+        _report(f"adaptive (max {args.callers})", server, *_run_calls(client, server.generate_url, args.calls, args.callers))
+        limits = [d["to"] for d in client.limiter.decisions]
+        print(f"Adaptive limit: {client.limiter.decisions[0]['from'] if limits else client.limiter.limit} -> "
+              f"{' -> '.join(map(str, limits)) or 'unchanged'}")
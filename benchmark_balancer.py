@@ -0,0 +1,81 @@
+import argparse
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from mock_ollama import MockOllamaConfig, MockOllamaServer
+from ollama_balancer import OllamaBalancer
+from ollama_client import OllamaClient
+
+# --- Configuration ---
+BENCHMARK_HOSTS = 3
+BENCHMARK_HOST_PARALLEL = 2 # Requests each stand-in server runs at once (its OLLAMA_NUM_PARALLEL)
+BENCHMARK_CALLS = 60
+BENCHMARK_CALLERS = 12 # Threads issuing calls concurrently
+BENCHMARK_LATENCY = 0.1 # Seconds per call on a stand-in server
+BENCHMARK_LOAD_SECONDS = 0.5 # Extra delay when a server has to load the model first
+BENCHMARK_MODEL = "mock:latest"
+BENCHMARK_BASE_PORT = 11540
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _run_calls(client, calls, callers, url="http://localhost:11434/api/generate"):
+    """Issues `calls` generate calls from `callers` threads; a balancer only uses the URL's path."""
+    def call(i):
+        response = client.post(url, json={"model": BENCHMARK_MODEL, "prompt": f"Call {i}", "stream": False})
+        response.raise_for_status()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=callers) as pool:
+        list(pool.map(call, range(calls)))
+    return time.perf_counter() - start
+
+
+def start_hosts(count, base_port, loaded_on_first=True):
+    """Stand-in servers on consecutive ports; only the first has the model resident at startup."""
+    servers = []
+    for i in range(count):
+        config = MockOllamaConfig(latency=BENCHMARK_LATENCY, tokens_per_sec=0, models=[BENCHMARK_MODEL],
+                                  load_seconds=BENCHMARK_LOAD_SECONDS,
+                                  loaded_models=[BENCHMARK_MODEL] if loaded_on_first and i == 0 else [])
+        servers.append(MockOllamaServer(port=base_port + i, config=config).start())
+    return servers
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compares one Ollama host with the least-outstanding-requests balancer over several stand-in hosts.")
+    parser.add_argument("--hosts", type=int, default=BENCHMARK_HOSTS)
+    parser.add_argument("--calls", type=int, default=BENCHMARK_CALLS)
+    parser.add_argument("--callers", type=int, default=BENCHMARK_CALLERS)
+    parser.add_argument("--base-port", type=int, default=BENCHMARK_BASE_PORT)
+    args = parser.parse_args()
+
+    # One host, its parallelism enforced client-side as the server would
+    single = start_hosts(1, args.base_port)
+    client = OllamaClient(max_in_flight=BENCHMARK_HOST_PARALLEL)
+    single_seconds = _run_calls(client, args.calls, args.callers, url=single[0].generate_url)
+    print(f"1 host:          {args.calls} calls in {single_seconds:.2f}s")
+    for server in single:
+        server.stop()
+
+    servers = start_hosts(args.hosts, args.base_port + 1)
+    balancer = OllamaBalancer([(s.base_url, BENCHMARK_HOST_PARALLEL) for s in servers], health_check_seconds=0)
+    balanced_seconds = _run_calls(balancer, args.calls, args.callers)
+    print(f"{args.hosts} hosts balanced: {args.calls} calls in {balanced_seconds:.2f}s ({single_seconds / balanced_seconds:.1f}x)")
+    for status in balancer.status():
+        print(f"  {status['base_url']:<26}{status['requests']:>4} calls  loaded: {', '.join(status['loaded_models']) or '-'}")
+
+    # A dead endpoint in the list: calls fail over and it is ejected
+    dead_url = f"http://127.0.0.1:{_free_port()}"
+    failover = OllamaBalancer([(dead_url, BENCHMARK_HOST_PARALLEL)] + [(s.base_url, BENCHMARK_HOST_PARALLEL) for s in servers],
+                              health_check_seconds=0, backoff_seconds=0.01)
+    failover_seconds = _run_calls(failover, args.calls, args.callers)
+    dead = failover.status()[0]
+    print(f"With a dead host: {args.calls} calls in {failover_seconds:.2f}s; dead host failures: {dead['failures']}, ejected: {dead['ejected']}")
+    for server in servers:
+        server.stop()
@@ -0,0 +1,301 @@
+import argparse
+import contextlib
+import functools
+import importlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from mock_ollama import MockOllamaConfig, MockOllamaServer
+
+# --- Configuration ---
+BENCHMARK_CHAPTER_COUNTS = (10, 30, 100)
+BENCHMARK_TARGETS = ("novel", "book", "pipeline")
+BENCHMARK_RESUME_PDF = os.path.join("docs", "Profile_Sak.pdf") # Any PDF works; 100.py only needs text to build a profile
+BENCHMARK_SUBJECT = "A cartographer in a fog-bound harbor city discovers that the streets she stops mapping cease to exist."
+BENCHMARK_AUTHOR_STYLE = "Quiet, atmospheric literary fantasy"
+BENCHMARK_GENRE = "Fantasy"
+
+
+class StageTimer:
+    """
+    Wraps methods or module functions so every call is recorded as an interval
+    under a stage name. Calls may overlap (worker threads) or nest (a stage
+    inside another); each stage's wall time is the union of its intervals.
+    Fixed pauses (time.sleep) in patched modules are recorded separately.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.intervals = {} # stage -> [(start, end), ...]
+        self.order = []
+        self.sleeps = [] # (start, end) of every time.sleep in a patched module
+        self._restore = []
+
+    def wrap(self, owner, attribute, stage):
+        original = getattr(owner, attribute)
+
+        @functools.wraps(original)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.intervals[stage].append((start, time.perf_counter()))
+
+        if stage not in self.intervals:
+            self.intervals[stage] = []
+            self.order.append(stage)
+        setattr(owner, attribute, timed)
+
+    def patch_sleep(self, module):
+        """Records the module's time.sleep calls, so fixed pauses are not counted as Python work."""
+        self._restore.append((module, module.time))
+        module.time = _SleepRecordingTime(self)
+
+    def record_sleep(self, start, end):
+        with self._lock:
+            self.sleeps.append((start, end))
+
+    def restore(self):
+        for module, original in reversed(self._restore):
+            module.time = original
+        self._restore.clear()
+
+
+class _SleepRecordingTime:
+    """Stands in for the time module inside a benchmarked module; only sleep() differs."""
+
+    def __init__(self, timer):
+        self._timer = timer
+
+    def sleep(self, seconds):
+        start = time.perf_counter()
+        try:
+            time.sleep(seconds)
+        finally:
+            self._timer.record_sleep(start, time.perf_counter())
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+
+def _union_seconds(intervals):
+    total, current_start, current_end = 0.0, None, None
+    for start, end in sorted(intervals):
+        if current_end is None or start > current_end:
+            if current_end is not None:
+                total += current_end - current_start
+            current_start, current_end = start, end
+        else:
+            current_end = max(current_end, end)
+    if current_end is not None:
+        total += current_end - current_start
+    return total
+
+
+def _sleep_seconds(timer, stats, start, end):
+    """Seconds in [start, end] spent in a recorded sleep while the mock was idle (sleeps overlapping LLM work are LLM time)."""
+    return stats.busy_seconds(start, end, also=timer.sleeps) - stats.busy_seconds(start, end)
+
+
+def _stage_rows(timer, stats):
+    rows = []
+    for stage in timer.order:
+        intervals = timer.intervals[stage]
+        if not intervals:
+            continue
+        wall = _union_seconds(intervals)
+        llm = sum(stats.busy_seconds(start, end) for start, end in intervals)
+        llm = min(llm, wall) # Overlapping calls of the same stage would otherwise count the mock twice
+        sleep = min(sum(_sleep_seconds(timer, stats, start, end) for start, end in intervals), wall - llm)
+        rows.append({"stage": stage, "calls": len(intervals), "wall": wall, "llm": llm, "sleep": sleep,
+                     "python": wall - llm - sleep})
+    return rows
+
+
+@contextlib.contextmanager
+def _captured_output(log_path, verbose):
+    """Sends the generators' (very chatty) stdout to a log file unless verbose."""
+    if verbose:
+        yield
+        return
+    with open(log_path, "w", encoding="utf-8") as log, contextlib.redirect_stdout(log):
+        yield
+
+
+# --- Targets ---
+
+def run_novel_generator(server, chapters, workdir, timer):
+    """NovelGenerator.orchestrate_generation (I_blew_up_a_super_computer.py)."""
+    module = importlib.import_module("I_blew_up_a_super_computer")
+    timer.patch_sleep(module)
+    module.OLLAMA_BASE_URL = server.generate_url
+    module.OLLAMA_CHAT_URL = server.chat_url
+    module.OUTPUT_DIR = workdir
+    module.OLLAMA_CACHE_PATH = os.path.join(workdir, "ollama_response_cache.sqlite") # Fresh cache: every call hits the mock
+
+    generator = module.NovelGenerator("Benchmark resume: archivist, mapmaker.", BENCHMARK_SUBJECT, BENCHMARK_AUTHOR_STYLE,
+                                      BENCHMARK_GENRE, run_dir=os.path.join(workdir, "run"))
+
+    # The outline's suggested chapter count is clamped to 10-50, so pin the size right after the foundation phase.
+    foundation = generator.generate_foundational_elements
+
+    def foundation_with_fixed_size():
+        succeeded = foundation()
+        generator.num_chapters = chapters
+        return succeeded
+
+    generator.generate_foundational_elements = foundation_with_fixed_size
+    timer.wrap(generator, "generate_foundational_elements", "foundation")
+    timer.wrap(generator, "generate_detailed_chapter_plans", "chapter plans")
+    timer.wrap(generator, "generate_novel_content", "chapter content")
+    timer.wrap(generator, "_generate_scene_prose", "  scene prose")
+    timer.wrap(generator, "_update_chapter_continuity_data", "  continuity updates")
+    timer.wrap(generator, "_perform_final_transition_checks", "transition checks")
+    timer.wrap(generator, "compile_and_save_novel", "compile & save")
+    generator.orchestrate_generation()
+    return len(generator.generated_chapters_content)
+
+
+def run_book_generator(server, chapters, workdir, timer):
+    """BookGenerator.generate_book (new_better_way.py)."""
+    module = importlib.import_module("new_better_way")
+    timer.patch_sleep(module)
+    module.OUTPUT_DIR = workdir
+    generator = module.BookGenerator()
+    generator.base_url = server.generate_url
+    generator.story_premise = BENCHMARK_SUBJECT
+    generator.genre = BENCHMARK_GENRE
+    generator.num_chapters = chapters
+    generator.get_user_input = lambda: None # Inputs are set above instead of read from stdin
+
+    timer.wrap(generator, "create_story_outline", "outline & plan")
+    timer.wrap(generator, "generate_chapter", "chapters")
+    timer.wrap(generator, "validate_chapter_consistency", "  consistency checks")
+    timer.wrap(generator, "run_post_chapter_analyses", "  post-chapter analyses")
+    timer.wrap(generator, "create_chapter_transition", "  transitions")
+    timer.wrap(generator, "check_chapter_transitions", "transition checks")
+    timer.wrap(generator, "compile_book", "compile")
+    generator.generate_book()
+    return len(generator.chapters)
+
+
+def run_chain_pipeline(server, chapters, workdir, timer):
+    """run_generation_pipeline (100.py)."""
+    module = importlib.import_module("100")
+    timer.patch_sleep(module) # LLM_CALL_DELAY_SECONDS pauses between calls
+    module.OLLAMA_BASE_URL = server.base_url
+    module.OUTPUT_FOLDER = workdir
+    shutil.copy(BENCHMARK_RESUME_PDF, workdir)
+
+    components = module.initialize_components()
+    for key, stage in (("main_character_chain", "profile"), ("setting_chain", "setting"), ("theme_chain", "themes"),
+                       ("title_chain", "title"), ("plot_chain", "plot"), ("chapters_chain", "chapter list")):
+        timer.wrap(components[key], "run", stage)
+    timer.wrap(module, "generate_events_for_all_chapters", "events")
+    timer.wrap(module, "write_book", "write chapters")
+    timer.wrap(components["doc_writer"], "write_doc", "write docx")
+    module.run_generation_pipeline(components, os.path.basename(BENCHMARK_RESUME_PDF), BENCHMARK_SUBJECT,
+                                   BENCHMARK_AUTHOR_STYLE, BENCHMARK_GENRE, enable_refinement=False)
+    return chapters
+
+
+TARGETS = {
+    "novel": ("NovelGenerator.orchestrate_generation", run_novel_generator),
+    "book": ("BookGenerator.generate_book", run_book_generator),
+    "pipeline": ("run_generation_pipeline (100.py)", run_chain_pipeline),
+}
+
+
+def benchmark(server, target, chapters, verbose=False):
+    """Runs one target for one novel size against the mock and returns its measurements."""
+    label, runner = TARGETS[target]
+    server.config.chapters = chapters
+    server.stats.reset()
+    timer = StageTimer()
+
+    with tempfile.TemporaryDirectory(prefix=f"bench_{target}_{chapters}_") as workdir:
+        start = time.perf_counter()
+        try:
+            with _captured_output(os.path.join(workdir, "output.log"), verbose):
+                produced = runner(server, chapters, workdir, timer)
+            error = None
+        except ImportError as e:
+            return {"target": target, "label": label, "chapters": chapters, "skipped": f"missing dependency: {e.name or e}"}
+        except Exception as e:
+            produced, error = 0, f"{type(e).__name__}: {e}"
+        finally:
+            timer.restore()
+        end = time.perf_counter()
+
+    wall = end - start
+    llm = server.stats.busy_seconds(start, end)
+    sleep = _sleep_seconds(timer, server.stats, start, end)
+    return {
+        "target": target, "label": label, "chapters": chapters, "chapters_produced": produced, "error": error,
+        "wall": wall, "llm": llm, "sleep": sleep, "python": wall - llm - sleep, "requests": server.stats.requests,
+        "prompt_tokens": server.stats.prompt_tokens, "eval_tokens": server.stats.eval_tokens,
+        "families": dict(server.stats.families.most_common()), "stages": _stage_rows(timer, server.stats),
+    }
+
+
+def print_result(result):
+    print(f"\n=== {result['label']}: {result['chapters']} chapters ===")
+    if result.get("skipped"):
+        print(f"Skipped ({result['skipped']}).")
+        return
+    if result["error"]:
+        print(f"FAILED: {result['error']}")
+    print(f"Wall time: {result['wall']:.2f}s | waiting on LLM: {result['llm']:.2f}s | fixed sleeps: {result['sleep']:.2f}s | "
+          f"Python-side: {result['python']:.2f}s ({100 * result['python'] / max(result['wall'], 1e-9):.0f}%) | "
+          f"{result['requests']} requests, {result['chapters_produced']} chapters produced")
+    print(f"  {'Stage':<26}{'Calls':>7}{'Wall s':>10}{'LLM s':>10}{'Sleep s':>10}{'Python s':>10}")
+    for row in result["stages"]:
+        print(f"  {row['stage']:<26}{row['calls']:>7}{row['wall']:>10.2f}{row['llm']:>10.2f}{row['sleep']:>10.2f}{row['python']:>10.2f}")
+    print("  Requests by prompt family: " + ", ".join(f"{family} {count}" for family, count in result["families"].items()))
+
+
+def print_summary(results):
+    print("\n=== Summary ===")
+    print(f"{'Target':<42}{'Chapters':>9}{'Wall s':>10}{'LLM s':>10}{'Sleep s':>10}{'Python s':>10}{'Requests':>10}")
+    for result in results:
+        if result.get("skipped"):
+            print(f"{result['label']:<42}{result['chapters']:>9}  skipped ({result['skipped']})")
+            continue
+        print(f"{result['label']:<42}{result['chapters']:>9}{result['wall']:>10.2f}{result['llm']:>10.2f}"
+              f"{result['sleep']:>10.2f}{result['python']:>10.2f}{result['requests']:>10}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end throughput benchmark of the generators against a mock Ollama server.")
+    parser.add_argument("--targets", nargs="+", choices=BENCHMARK_TARGETS, default=list(BENCHMARK_TARGETS))
+    parser.add_argument("--chapters", nargs="+", type=int, default=list(BENCHMARK_CHAPTER_COUNTS), help="Novel sizes to run.")
+    parser.add_argument("--latency", type=float, default=MockOllamaConfig().latency, help="Mock seconds before the first token.")
+    parser.add_argument("--tokens-per-sec", type=float, default=MockOllamaConfig().tokens_per_sec, help="Mock generation speed (0 = instant).")
+    parser.add_argument("--scene-words", type=int, default=MockOllamaConfig().scene_words, help="Words of prose per mock scene response.")
+    parser.add_argument("--json", help="Also write the results to this JSON file.")
+    parser.add_argument("--verbose", action="store_true", help="Show the generators' own output instead of logging it to a temp file.")
+    args = parser.parse_args()
+
+    config = MockOllamaConfig(latency=args.latency, tokens_per_sec=args.tokens_per_sec, scene_words=args.scene_words)
+    results = []
+    with MockOllamaServer(port=0, config=config) as server:
+        print(f"Mock Ollama on {server.base_url} (latency {config.latency}s, {config.tokens_per_sec} tokens/s, {config.scene_words} words/scene)")
+        for target in args.targets:
+            for chapters in args.chapters:
+                print(f"Running {TARGETS[target][0]} with {chapters} chapters...", file=sys.stderr)
+                result = benchmark(server, target, chapters, verbose=args.verbose)
+                print_result(result)
+                results.append(result)
+    print_summary(results)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.json}")
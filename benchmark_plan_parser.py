@@ -0,0 +1,132 @@
+import argparse
+import glob
+import os
+import re
+import timeit
+
+from plan_parser import empty_chapter_plan, parse_chapter_plans
+
+# --- Configuration ---
+PLAN_FIXTURE_DIR = os.path.join("docs", "plan_fixtures")
+BENCHMARK_PLAN_SIZES = (50, 200)
+BENCHMARK_REPEATS = 5
+
+_FIXTURE_HEADING_RE = re.compile(r"^[ \t#*]*Chapter[ \t]*(\d+)(?:\*\*)?[ \t]*(?:[-:–—][^\n]*)?$", re.MULTILINE | re.IGNORECASE)
+
+
+# --- The multi-regex parser ULTIMATE_POWER_UPDT.py used before plan_parser, kept as the baseline ---
+
+LEGACY_CHAPTER_PATTERNS = [
+    r"(?:^|\n)(?:\*\*)?Chapter\s*(\d+)\s*-\s*(.*?)(?:\*\*)?(?=\n|$)",
+    r"(?:^|\n)(?:\*\*)?Chapter\s*(\d+)\s*:\s*(.*?)(?:\*\*)?(?=\n|$)",
+    r"(?:^|\n)#\s*(?:\*\*)?Chapter\s*(\d+)\s*[-:]\s*(.*?)(?:\*\*)?(?=\n|$)",
+    r"(?:^|\n)(?:\*\*)?Chapter\s*(\d+)(?:\*\*)?(?=\n|$)",
+]
+LEGACY_SECTION_PATTERNS = {
+    "goal": r"(?:1\.\s*CHAPTER GOAL:|CHAPTER GOAL:)\s*(.*?)(?=\n\s*(?:2\.\s*KEY SCENES:|KEY SCENES:|$))",
+    "scenes": r"(?:2\.\s*KEY SCENES:|KEY SCENES:)\s*(.*?)(?=\n\s*(?:3\.\s*CHARACTER DEVELOPMENT|CHARACTER DEVELOPMENT|$))",
+    "character_development": r"(?:3\.\s*CHARACTER DEVELOPMENT FOCUS:|CHARACTER DEVELOPMENT FOCUS:)\s*(.*?)(?=\n\s*(?:4\.\s*PLOT ADVANCEMENT|PLOT ADVANCEMENT|$))",
+    "plot_advancement": r"(?:4\.\s*PLOT ADVANCEMENT:|PLOT ADVANCEMENT:)\s*(.*?)(?=\n\s*(?:5\.\s*TIMELINE|TIMELINE|$))",
+    "timeline_pacing": r"(?:5\.\s*TIMELINE & PACING:|TIMELINE & PACING:)\s*(.*?)(?=\n\s*(?:6\.\s*EMOTIONAL|EMOTIONAL|$))",
+    "emotional_tone_end": r"(?:6\.\s*EMOTIONAL TONE \(End of Chapter\):|EMOTIONAL TONE:)\s*(.*?)(?=\n\s*(?:7\.\s*CONNECTION|CONNECTION|$))",
+    "connection_to_next": r"(?:7\.\s*CONNECTION TO NEXT CHAPTER|CONNECTION TO NEXT CHAPTER:)\s*(.*?)(?=$)",
+}
+
+
+def legacy_parse_chapter_plans(text):
+    """Four heading scans plus seven DOTALL section searches per chapter; duplicates dropped by the exists-check."""
+    positions = []
+    for pattern in LEGACY_CHAPTER_PATTERNS:
+        for match in re.finditer(pattern, text, re.MULTILINE):
+            try:
+                number = int(match.group(1))
+                title = match.group(2).strip() if len(match.groups()) > 1 else f"Chapter {number}"
+                positions.append((number, title, match.start()))
+            except (IndexError, ValueError):
+                continue
+    positions.sort(key=lambda x: x[2])
+
+    plans = {}
+    for i, (number, title, start) in enumerate(positions):
+        end = positions[i + 1][2] if i + 1 < len(positions) else len(text)
+        if number in plans:
+            continue
+        content = text[start:end].strip()
+        plan = empty_chapter_plan(number, title)
+        for key, pattern in LEGACY_SECTION_PATTERNS.items():
+            match = re.search(pattern, content, re.IGNORECASE | re.DOTALL)
+            if match:
+                if key == "scenes":
+                    scenes = re.split(r'\n\s*(?:-\s*|\*\s*|•\s*|\d+\.\s*)', match.group(1).strip())
+                    plan[key] = [s.strip() for s in scenes if s.strip()]
+                else:
+                    plan[key] = match.group(1).strip()
+        plans[number] = plan
+    return plans
+
+
+# --- Corpus ---
+
+def load_fixtures(fixture_dir=PLAN_FIXTURE_DIR):
+    """Returns {file name: text} for every plan fixture (README excluded)."""
+    paths = sorted(glob.glob(os.path.join(fixture_dir, "*.txt")) + glob.glob(os.path.join(fixture_dir, "*.md")))
+    return {os.path.basename(p): open(p, encoding="utf-8").read() for p in paths if os.path.basename(p) != "README.md"}
+
+
+def scale_plan(text, chapters):
+    """
+    Repeats a fixture's chapter blocks, renumbered, until it covers `chapters` chapters.
+    Each copy shifts every chapter number by the fixture's highest one, so repeated headings stay repeated.
+    """
+    headings = list(_FIXTURE_HEADING_RE.finditer(text))
+    if not headings:
+        return text
+    blocks = [(int(m.group(1)), text[m.start():headings[i + 1].start() if i + 1 < len(headings) else len(text)])
+              for i, m in enumerate(headings)]
+    highest = max(number for number, _ in blocks)
+    preamble, parts, offset = text[:headings[0].start()], [], 0
+    while offset < chapters:
+        for number, block in blocks:
+            if number + offset <= chapters:
+                parts.append(re.sub(r"Chapter[ \t]*\d+", f"Chapter {number + offset}", block, count=1, flags=re.IGNORECASE))
+        offset += highest
+    return preamble + "".join(parts)
+
+
+def _filled_sections(plans):
+    return sum(1 for plan in plans.values() for key, value in plan.items() if key not in ("number", "title") and value not in ("N/A", []))
+
+
+def _differing_fields(new, old):
+    """(chapter, field) pairs both parsers produced but with different values."""
+    return sum(1 for n in set(new) & set(old) for key in new[n] if new[n][key] != old[n][key])
+
+
+def benchmark(name, text, chapters, repeats=BENCHMARK_REPEATS):
+    plan_text = scale_plan(text, chapters)
+    new_plans, old_plans = parse_chapter_plans(plan_text), legacy_parse_chapter_plans(plan_text)
+    number = max(1, 2000 // chapters)
+    new_seconds = min(timeit.repeat(lambda: parse_chapter_plans(plan_text), number=number, repeat=repeats)) / number
+    old_seconds = min(timeit.repeat(lambda: legacy_parse_chapter_plans(plan_text), number=number, repeat=repeats)) / number
+    return {
+        "fixture": name, "chapters": chapters, "chars": len(plan_text),
+        "new_ms": new_seconds * 1000, "old_ms": old_seconds * 1000,
+        "new_found": len(new_plans), "old_found": len(old_plans),
+        "new_sections": _filled_sections(new_plans), "old_sections": _filled_sections(old_plans),
+        "differing_fields": _differing_fields(new_plans, old_plans),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compares the single-pass chapter-plan parser with the old multi-regex one.")
+    parser.add_argument("--chapters", nargs="+", type=int, default=list(BENCHMARK_PLAN_SIZES), help="Plan sizes to build from each fixture.")
+    parser.add_argument("--fixtures", default=PLAN_FIXTURE_DIR, help="Directory of plan fixture texts.")
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.fixtures)
+    print(f"{'Fixture':<38}{'Chapters':>9}{'KB':>7}{'Old ms':>9}{'New ms':>9}{'Speedup':>9}{'Found old/new':>15}{'Sections old/new':>18}{'Differing':>11}")
+    for name, text in fixtures.items():
+        for chapters in args.chapters:
+            r = benchmark(name, text, chapters)
+            print(f"{name:<38}{chapters:>9}{r['chars'] / 1024:>7.0f}{r['old_ms']:>9.2f}{r['new_ms']:>9.2f}{r['old_ms'] / r['new_ms']:>8.1f}x"
+                  f"{r['old_found']:>8}/{r['new_found']:<6}{r['old_sections']:>11}/{r['new_sections']:<6}{r['differing_fields']:>11}")
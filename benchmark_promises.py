@@ -0,0 +1,128 @@
+import argparse
+import random
+import time
+
+from promise_scheduler import PromiseScheduler, promise_score
+
+# --- Configuration ---
+BENCHMARK_PROMISE_COUNTS = (1000, 4000)
+BENCHMARK_SCENES = 300 # Scenes simulated with the scheduler
+BENCHMARK_LEGACY_SCENES = 15 # The old scan is O(P^2 * D) per scene, so it gets fewer
+EPIC_ARC_LENGTH = 8 # Promises per serialized arc; each waits on the one before it
+CROSS_DEPENDENCY_RATE = 0.1 # Chance a promise also waits on a random earlier arc
+BACKSLIDE_RATE = 0.15
+
+
+class SimPromise:
+    """The PlotPromise fields and state changes the schedulers look at (half.py needs langchain to import)."""
+
+    def __init__(self, promise_id, importance, dependencies):
+        self.id = promise_id
+        self.importance = importance
+        self.status = "active"
+        self.progression = 0
+        self.last_progressed = 0
+        self.dependencies = dependencies
+
+    def progress(self, amount, scene_num):
+        self.progression = min(100, self.progression + amount)
+        self.last_progressed = scene_num
+        if self.progression >= 100:
+            self.status = "completed"
+
+    def backslide(self, amount, scene_num):
+        self.progression = max(0, self.progression - amount)
+        self.status = "backsliding"
+        self.last_progressed = scene_num
+
+
+def build_epic(count, seed):
+    """`count` promises in serialized arcs of EPIC_ARC_LENGTH, some arcs also waiting on earlier ones."""
+    rng = random.Random(seed)
+    promises = []
+    for i in range(count):
+        dependencies = []
+        if i % EPIC_ARC_LENGTH:
+            dependencies.append(f"p{i - 1}")
+        elif i and rng.random() < CROSS_DEPENDENCY_RATE * EPIC_ARC_LENGTH:
+            dependencies.append(f"p{rng.randrange(i)}")
+        if rng.random() < CROSS_DEPENDENCY_RATE:
+            dependencies.append(f"p{rng.randrange(count)}") # May point forward: not yet "known" when added
+        promises.append(SimPromise(f"p{i}", rng.randint(1, 10), dependencies))
+    return promises
+
+
+# --- The list-scanning selection half.py's PromiseManager used before promise_scheduler ---
+
+def legacy_is_progressable(promise, all_promises):
+    if promise.status in ("completed", "paused"):
+        return False
+    for dep_id in promise.dependencies:
+        dep_promise = next((p for p in all_promises if p.id == dep_id), None)
+        if dep_promise and dep_promise.status != "completed":
+            return False
+    return True
+
+
+def legacy_top(promises, scene_count, n=5):
+    scores = {p.id: promise_score(p, scene_count) for p in promises if legacy_is_progressable(p, promises)}
+    progressable = [p for p in promises if legacy_is_progressable(p, promises)]
+    return sorted(progressable, key=lambda p: scores.get(p.id, 0), reverse=True)[:n]
+
+
+# --- Simulation ---
+
+def _advance(promise, rng, scene_count):
+    if rng.random() < BACKSLIDE_RATE:
+        promise.backslide(rng.randint(5, 15), scene_count)
+    else:
+        promise.progress(rng.randint(10, 30), scene_count)
+
+
+def simulate_legacy(count, scenes, seed):
+    promises, rng, chosen = build_epic(count, seed), random.Random(seed + 1), []
+    start = time.perf_counter()
+    for scene_count in range(scenes):
+        top = legacy_top(promises, scene_count)
+        if not top:
+            break
+        chosen.append(top[0].id)
+        _advance(top[0], rng, scene_count + 1)
+    return chosen, time.perf_counter() - start
+
+
+def simulate_scheduler(count, scenes, seed):
+    promises, rng, chosen = build_epic(count, seed), random.Random(seed + 1), []
+    start = time.perf_counter()
+    scheduler = PromiseScheduler()
+    for promise in promises:
+        scheduler.add(promise)
+    build_seconds = time.perf_counter() - start
+    for scene_count in range(scenes):
+        top = scheduler.top(scene_count, 5)
+        if not top:
+            break
+        promise = top[0][0]
+        chosen.append(promise.id)
+        _advance(promise, rng, scene_count + 1)
+        scheduler.refresh(promise)
+    return chosen, time.perf_counter() - start, build_seconds
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compares the dependency-indexed promise scheduler with the old list scan.")
+    parser.add_argument("--promises", nargs="+", type=int, default=list(BENCHMARK_PROMISE_COUNTS), help="Promise counts to simulate.")
+    parser.add_argument("--scenes", type=int, default=BENCHMARK_SCENES, help="Scenes simulated with the scheduler.")
+    parser.add_argument("--legacy-scenes", type=int, default=BENCHMARK_LEGACY_SCENES, help="Scenes simulated with the old scan.")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"{'Promises':>9}{'Old ms/scene':>14}{'New ms/scene':>14}{'Speedup':>9}{'Index ms':>10}{'Same picks':>12}")
+    for count in args.promises:
+        old_chosen, old_seconds = simulate_legacy(count, args.legacy_scenes, args.seed)
+        new_chosen, new_seconds, build_seconds = simulate_scheduler(count, args.scenes, args.seed)
+        old_per_scene = old_seconds / max(1, len(old_chosen)) * 1000
+        new_per_scene = (new_seconds - build_seconds) / max(1, len(new_chosen)) * 1000
+        same = new_chosen[:len(old_chosen)] == old_chosen
+        print(f"{count:>9}{old_per_scene:>14.2f}{new_per_scene:>14.4f}{old_per_scene / new_per_scene:>8.0f}x"
+              f"{build_seconds * 1000:>10.1f}{str(same) + f' ({len(old_chosen)})':>12}")
@@ -3,6 +3,9 @@ import os
 import re
 import time
 import random
+import queue
+import threading
+import statistics
 from fpdf import FPDF
 
 # --- LangChain Imports ---
@@ -14,6 +17,9 @@ from langchain_core.output_parsers import StrOutputParser
 OLLAMA_MODEL = 'gemma3:4b' # Model specified by the user
 NUM_CHARACTERS = 100
 OUTPUT_DIR = './characters'
+# Concurrent workers pulling (archetype, setting) jobs; match the server's OLLAMA_NUM_PARALLEL
+NUM_WORKERS = max(1, int(os.getenv("OLLAMA_NUM_PARALLEL", "4")))
+USED_NAMES_FLUSH_EVERY = 10 # Append newly used names to used_names.txt once per this many characters
 
 # Define character archetypes to introduce variety
 CHARACTER_ARCHETYPES = [
@@ -195,6 +201,146 @@ def save_character(character_text, base_filename):
         print(f"   [Error] Failed to save character: {e}")
         return False
 
+# Suggested first names offered to the model to steer it away from repeats
+SUGGESTED_FIRST_NAMES = [
+    "Aria", "Zephyr", "Marcus", "Lyra", "Thorne", "Ember", "Jasper", "Elara", "Knox", "Nova",
+    "Orion", "Seraphina", "Cyrus", "Amara", "Rowan", "Freya", "Darius", "Kira", "Rhys", "Luna",
+    "Felix", "Vega", "Maddox", "Bianca", "Finn", "Astrid", "Lucian", "Octavia", "Griffin", "Ivy",
+    "Soren", "Athena", "Caspian", "Juniper", "Tobias", "Celine", "Axel", "Dahlia", "Benedict", "Isolde",
+    "Malcolm", "Raven", "Dorian", "Thalia", "Evander", "Willow", "Roman", "Scarlett", "Vincent", "Hope"
+]
+
+class UsedNames:
+    """Names already generated, shared in memory by all workers and appended to disk in batches."""
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._names = []
+        self._unflushed = []
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    self._names = [line.strip() for line in f.readlines() if line.strip()]
+            except Exception as e:
+                print(f"   [Warning] Could not read used names file: {e}")
+
+    def snapshot(self):
+        with self._lock:
+            return list(self._names)
+
+    def add(self, name):
+        with self._lock:
+            if name not in self._names:
+                self._names.append(name)
+                self._unflushed.append(name)
+
+    def flush(self):
+        with self._lock:
+            pending, self._unflushed = self._unflushed, []
+        if not pending:
+            return
+        try:
+            with open(self.path, 'a+') as f:
+                f.writelines(f"{name}\n" for name in pending)
+        except Exception as e:
+            print(f"   [Warning] Could not update used names file: {e}")
+
+class GenerationStats:
+    """Thread-safe per-character timing and failure record."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.results = [] # (unique_id, seconds, succeeded, detail)
+
+    def record(self, unique_id, seconds, succeeded, detail):
+        """Records one finished character and returns how many have finished so far."""
+        with self._lock:
+            self.results.append((unique_id, seconds, succeeded, detail))
+            return len(self.results)
+
+    def print_summary(self, wall_seconds):
+        with self._lock:
+            results = sorted(self.results)
+        durations = [seconds for _, seconds, ok, _ in results if ok]
+        failures = [(uid, detail) for uid, _, ok, detail in results if not ok]
+        print(f"Successfully generated characters: {len(durations)}")
+        print(f"Failed generations/creations: {len(failures)}")
+        print(f"Wall time: {wall_seconds:.1f}s ({len(results) / wall_seconds * 60 if wall_seconds else 0:.1f} characters/minute)")
+        if durations:
+            print(f"Per-character time: min {min(durations):.1f}s, median {statistics.median(durations):.1f}s, "
+                  f"mean {statistics.mean(durations):.1f}s, max {max(durations):.1f}s")
+        for uid, detail in failures:
+            print(f"   [Failed] {uid}: {detail}")
+
+def pick_combinations(count):
+    """Picks (archetype, setting) pairs, avoiding repeats until every combination has been used."""
+    total_combinations = len(CHARACTER_ARCHETYPES) * len(CHARACTER_SETTINGS)
+    used_combinations = set()
+    combos = []
+    for _ in range(count):
+        for _ in range(10):  # Limit attempts to avoid infinite loop
+            archetype = random.choice(CHARACTER_ARCHETYPES)
+            setting = random.choice(CHARACTER_SETTINGS)
+            combo = (archetype, setting)
+            # If we've already used this exact combo and we haven't used all combos
+            if combo in used_combinations and len(used_combinations) < total_combinations:
+                continue
+            break
+        used_combinations.add(combo)
+        combos.append(combo)
+    return combos
+
+def generate_character(chain, unique_id, archetype, setting, used_names):
+    """Generates and saves a single character. Returns the base file name; raises on failure."""
+    print(f"   [{unique_id}] Creating {archetype} in {setting}...")
+    random_names = ", ".join(random.sample(SUGGESTED_FIRST_NAMES, 3))
+    seed_value = random.randint(1, 10000)
+    previous_names = used_names.snapshot()
+    used_names_str = ", ".join(previous_names) if previous_names else "None yet"
+
+    start_time = time.time()
+    character_description = chain.invoke({
+        "archetype": archetype,
+        "setting": setting,
+        "seed": f"Seed value: {seed_value}. Suggested unique names (but feel free to create your own): {random_names}. IMPORTANT: Create a completely original character with a unique name. Previously used names to AVOID: {used_names_str}"
+    })
+    print(f"   [{unique_id}] ... LangChain response received ({time.time() - start_time:.2f}s).")
+
+    if not character_description or not isinstance(character_description, str):
+        raise ValueError("Received invalid response from LangChain chain.")
+
+    first_name = extract_first_name(character_description)
+    if not first_name:
+        print(f"   [{unique_id}] [Warning] Could not extract a valid first name. Using 'Character'.")
+        base_name = "Character"
+    else:
+        base_name = first_name
+        print(f"   [{unique_id}] Extracted first name: {base_name}")
+
+    base_filename = os.path.join(OUTPUT_DIR, f"{base_name}_{unique_id}")
+    if not save_character(character_description, base_filename):
+        raise IOError(f"Could not save {base_filename}")
+    if first_name:
+        used_names.add(first_name) # Record the name for future uniqueness checks
+    return f"{base_name}_{unique_id}"
+
+def character_worker(chain, job_queue, used_names, stats, stop_event):
+    """Pulls jobs off the queue until it is empty or the run is interrupted."""
+    while not stop_event.is_set():
+        try:
+            unique_id, archetype, setting = job_queue.get_nowait()
+        except queue.Empty:
+            return
+        start_time = time.time()
+        try:
+            saved_as = generate_character(chain, unique_id, archetype, setting, used_names)
+            finished = stats.record(unique_id, time.time() - start_time, True, saved_as)
+        except Exception as e:
+            print(f"   [{unique_id}] [Error] Failed to generate or process character: {e}")
+            finished = stats.record(unique_id, time.time() - start_time, False, str(e))
+        if finished % USED_NAMES_FLUSH_EVERY == 0:
+            used_names.flush()
+            print(f"--- {finished}/{NUM_CHARACTERS} characters finished ---")
+
 # --- Main Script Logic ---
 
 if __name__ == "__main__":
@@ -239,118 +385,38 @@ if __name__ == "__main__":
         print(f"[Error] Failed to initialize LangChain components: {e}")
         exit()
 
-    # 3. Generation Loop
-    print(f"\nGenerating {NUM_CHARACTERS} characters...")
+    # 3. Generation (worker pool)
+    print(f"\nGenerating {NUM_CHARACTERS} characters with {NUM_WORKERS} workers...")
     os.makedirs(OUTPUT_DIR, exist_ok=True)
     print(f"Output directory: {os.path.abspath(OUTPUT_DIR)}")
 
-    generated_count = 0
-    failed_count = 0
-    
-    # Track used combinations to avoid repetition
-    used_combinations = set()
-
-    for i in range(1, NUM_CHARACTERS + 1):
-        unique_id = f"{i:03d}"
-        print(f"\nGenerating character {i}/{NUM_CHARACTERS}...")
-
-        try:
-            # Select random archetype and setting for this character
-            # Keep trying until we get a new combination
-            for _ in range(10):  # Limit attempts to avoid infinite loop
-                archetype = random.choice(CHARACTER_ARCHETYPES)
-                setting = random.choice(CHARACTER_SETTINGS)
-                combo = (archetype, setting)
-                
-                # If we've already used this exact combo and we haven't used all combos
-                if combo in used_combinations and len(used_combinations) < len(CHARACTER_ARCHETYPES) * len(CHARACTER_SETTINGS):
-                    continue
-                
-                used_combinations.add(combo)
-                break
-            
-            print(f"   Creating {archetype} in {setting}...")
-            
-            # Generate a list of suggested first names to avoid repetition
-            first_names = [
-                "Aria", "Zephyr", "Marcus", "Lyra", "Thorne", "Ember", "Jasper", "Elara", "Knox", "Nova",
-                "Orion", "Seraphina", "Cyrus", "Amara", "Rowan", "Freya", "Darius", "Kira", "Rhys", "Luna",
-                "Felix", "Vega", "Maddox", "Bianca", "Finn", "Astrid", "Lucian", "Octavia", "Griffin", "Ivy",
-                "Soren", "Athena", "Caspian", "Juniper", "Tobias", "Celine", "Axel", "Dahlia", "Benedict", "Isolde",
-                "Malcolm", "Raven", "Dorian", "Thalia", "Evander", "Willow", "Roman", "Scarlett", "Vincent", "Hope"
-            ]
-            
-            # Generate a random name suggestion
-            random_names = ", ".join(random.sample(first_names, 3))
-            
-            # Generate a unique seed value
-            seed_value = random.randint(1, 10000)
-            
-            start_time = time.time()
-            # Create a temporary file with previously generated names to avoid repetition
-            previously_used_names_file = os.path.join(OUTPUT_DIR, "used_names.txt")
-            
-            # Check for existing names
-            used_names = []
-            if os.path.exists(previously_used_names_file):
-                try:
-                    with open(previously_used_names_file, 'r') as f:
-                        used_names = [line.strip() for line in f.readlines() if line.strip()]
-                except Exception as e:
-                    print(f"   [Warning] Could not read used names file: {e}")
-            
-            used_names_str = ", ".join(used_names) if used_names else "None yet"
-                
-            character_description = chain.invoke({
-                "archetype": archetype,
-                "setting": setting,
-                "seed": f"Seed value: {seed_value}. Suggested unique names (but feel free to create your own): {random_names}. IMPORTANT: Create a completely original character with a unique name. Previously used names to AVOID: {used_names_str}"
-            })
-            end_time = time.time()
-            print(f"   ... LangChain response received ({end_time - start_time:.2f}s).")
-
-            if not character_description or not isinstance(character_description, str):
-                 print("   [Error] Received invalid response from LangChain chain.")
-                 failed_count += 1
-                 continue
-
-            first_name = extract_first_name(character_description)
-            if not first_name:
-                print("   [Warning] Could not extract a valid first name. Using 'Character'.")
-                base_name = "Character"
-            else:
-                 base_name = first_name
-                 print(f"   Extracted first name: {base_name}")
-
-            base_filename = os.path.join(OUTPUT_DIR, f"{base_name}_{unique_id}")
-            
-            print(f"   Saving character: {base_name}_{unique_id}")
-            if save_character(character_description, base_filename):
-                generated_count += 1
-                
-                # Record the name for future uniqueness checks
-                if first_name:
-                    try:
-                        with open(previously_used_names_file, 'a+') as f:
-                            f.write(f"{first_name}\n")
-                    except Exception as e:
-                        print(f"   [Warning] Could not update used names file: {e}")
-            else:
-                failed_count += 1
-
-        except KeyboardInterrupt:
-            print("\n\n[User Interrupt] Generation stopped by user.")
-            break
-        except Exception as e:
-            print(f"   [Error] Failed to generate or process character {i}: {e}")
-            failed_count += 1
-            time.sleep(2)
-
-        # Add a pause between generations to not overload the Ollama server
-        time.sleep(1.5)
+    used_names = UsedNames(os.path.join(OUTPUT_DIR, "used_names.txt"))
+    stats = GenerationStats()
+    stop_event = threading.Event()
+
+    job_queue = queue.Queue()
+    for i, (archetype, setting) in enumerate(pick_combinations(NUM_CHARACTERS), start=1):
+        job_queue.put((f"{i:03d}", archetype, setting))
+
+    run_start_time = time.time()
+    workers = [
+        threading.Thread(target=character_worker, args=(chain, job_queue, used_names, stats, stop_event), daemon=True)
+        for _ in range(NUM_WORKERS)
+    ]
+    for worker in workers:
+        worker.start()
+    try:
+        while any(worker.is_alive() for worker in workers):
+            for worker in workers:
+                worker.join(timeout=0.5)
+    except KeyboardInterrupt:
+        print("\n\n[User Interrupt] Generation stopped by user. Waiting for in-flight characters to finish...")
+        stop_event.set()
+        for worker in workers:
+            worker.join()
+    used_names.flush()
 
     # 4. Final Summary
     print("\n--- Generation Complete ---")
-    print(f"Successfully generated characters: {generated_count}")
-    print(f"Failed generations/creations: {failed_count}")
+    stats.print_summary(time.time() - run_start_time)
     print(f"Files saved in: {os.path.abspath(OUTPUT_DIR)}")
\ No newline at end of file
@@ -0,0 +1,100 @@
+DEFAULT_CHARS_PER_TOKEN = 4.0 # Typical for English prose with Llama/Gemma tokenizers
+MIN_TRIMMED_SECTION_TOKENS = 40 # Below this a trimmed section is useless; drop it instead
+TRIM_MARKER = " [...]"
+
+
+class TokenEstimator:
+    """
+    Cheap token counter for prompt budgeting.
+
+    Starts from a chars-per-token ratio and can be calibrated against real
+    token counts reported by the server (e.g. Ollama's prompt_eval_count for a
+    prompt that was fully prefilled).
+    """
+
+    def __init__(self, chars_per_token=DEFAULT_CHARS_PER_TOKEN):
+        self.chars_per_token = chars_per_token
+        self.calibrated = False
+
+    def count(self, text):
+        return int(len(text) / self.chars_per_token) + 1 if text else 0
+
+    def calibrate(self, chars, tokens):
+        """Adopts the ratio measured for one prompt (smoothed once calibrated)."""
+        if chars <= 0 or tokens <= 0:
+            return
+        measured = chars / tokens
+        self.chars_per_token = measured if not self.calibrated else 0.7 * self.chars_per_token + 0.3 * measured
+        self.calibrated = True
+
+    def chars_for(self, tokens):
+        return int(tokens * self.chars_per_token)
+
+
+class ContextBuilder:
+    """
+    Assembles a prompt context from prioritized sections under a token budget.
+
+    Sections are emitted in the order they were added. When the total exceeds
+    the budget, the lowest-priority sections are trimmed (if trimmable) or
+    dropped first; required sections are never cut. Every cut is recorded in
+    cut_log and printed.
+    """
+
+    def __init__(self, max_tokens, estimator=None, label="Context"):
+        self.max_tokens = max_tokens
+        self.estimator = estimator or TokenEstimator()
+        self.label = label
+        self.sections = []
+        self.cut_log = []
+
+    def add(self, name, text, priority, required=False, trim=None, header=""):
+        """
+        Adds a section. Higher priority survives longer. trim is None (drop only),
+        "head" (keep the beginning) or "tail" (keep the most recent end). header is
+        kept in front of the text when it is trimmed and dropped together with it.
+        """
+        if text:
+            self.sections.append({"name": name, "header": header, "text": text, "priority": priority, "required": required, "trim": trim})
+
+    def _trim(self, text, target_tokens, keep):
+        target_chars = self.estimator.chars_for(target_tokens) - len(TRIM_MARKER)
+        if keep == "tail":
+            kept = text[-target_chars:]
+            return TRIM_MARKER.strip() + " " + kept.split(" ", 1)[-1]
+        kept = text[:target_chars]
+        return kept.rsplit(" ", 1)[0] + TRIM_MARKER + ("\n" if text.endswith("\n") else "")
+
+    def build(self):
+        """Returns the assembled context, cutting low-priority sections until it fits the budget."""
+        count = self.estimator.count
+        texts = [section["header"] + section["text"] for section in self.sections]
+        total_before = sum(count(text) for text in texts)
+        overflow = total_before - self.max_tokens
+
+        # Lowest priority first; among equals, the later (less central) section goes first
+        cut_order = sorted(range(len(self.sections)), key=lambda i: (self.sections[i]["priority"], -i))
+        for i in cut_order:
+            if overflow <= 0:
+                break
+            section = self.sections[i]
+            if section["required"]:
+                continue
+            tokens = count(texts[i])
+            body_tokens = tokens - count(section["header"])
+            if section["trim"] and body_tokens - overflow >= MIN_TRIMMED_SECTION_TOKENS:
+                texts[i] = section["header"] + self._trim(section["text"], body_tokens - overflow, section["trim"])
+                overflow -= tokens - count(texts[i])
+                self.cut_log.append(f"trimmed '{section['name']}' ({tokens} -> {count(texts[i])} tokens)")
+            else:
+                texts[i] = ""
+                overflow -= tokens
+                self.cut_log.append(f"dropped '{section['name']}' ({tokens} tokens)")
+
+        context = "".join(texts)
+        if self.cut_log:
+            print(f"  {self.label} budget: ~{total_before} -> ~{count(context)} tokens (budget {self.max_tokens}); "
+                  + "; ".join(self.cut_log))
+            if overflow > 0:
+                print(f"  WARNING: {self.label} still ~{overflow} tokens over budget after cutting all optional sections.")
+        return context
@@ -5,6 +5,7 @@ import docx
 import traceback
 import random
 import math
+import itertools
 from datetime import datetime
 
 # --- Langchain Imports ---
@@ -13,6 +14,8 @@ from langchain.chains import LLMChain
 from langchain.prompts import PromptTemplate
 from langchain_community.document_loaders import PyPDFLoader
 
+from promise_scheduler import PromiseScheduler
+
 # Load environment variables
 load_dotenv()
 
@@ -32,6 +35,8 @@ def create_llm():
 class PlotPromise:
     """Represents a single plot promise in the narrative."""
     
+    _id_sequence = itertools.count(1)  # Keeps ids unique when many promises are created within one second
+    
     def __init__(self, description, importance=5, status="active", 
                  progression=0, dependencies=None, sequence=None):
         self.id = self._generate_id()
@@ -48,10 +53,10 @@ class PlotPromise:
         """Generate a unique ID for this promise."""
         timestamp = int(datetime.now().timestamp())
         random_suffix = random.randint(1000, 9999)
-        return f"p{timestamp}{random_suffix}"
+        return f"p{timestamp}{random_suffix}{next(self._id_sequence)}"
     
-    def is_progressable(self, all_promises):
-        """Check if this promise can be progressed."""
+    def is_progressable(self, promises_by_id):
+        """Check if this promise can be progressed (promises_by_id: {id: PlotPromise})."""
         if self.status == "completed":
             return False
         
@@ -60,7 +65,7 @@ class PlotPromise:
             
         # Check dependencies
         for dep_id in self.dependencies:
-            dep_promise = next((p for p in all_promises if p.id == dep_id), None)
+            dep_promise = promises_by_id.get(dep_id)
             if dep_promise and dep_promise.status != "completed":
                 return False
                 
@@ -122,7 +127,8 @@ class PromiseManager:
     """Manages all plot promises for a story."""
     
     def __init__(self, llm):
-        self.promises = []
+        self.promises = []  # In creation order; register new ones through _register()
+        self.scheduler = PromiseScheduler()  # Id index, dependency graph and score heaps over self.promises
         self.scene_count = 0
         self.llm = llm
         self.promise_chain = self._create_promise_chain()
@@ -264,7 +270,7 @@ class PromiseManager:
                             importance=data.get("importance", 5),
                             dependencies=data.get("dependencies", [])
                         )
-                        self.promises.append(promise)
+                        self._register(promise)
                     
                     print(f"Successfully generated {len(self.promises)} initial plot promises")
                 except json.JSONDecodeError as e:
@@ -292,83 +298,55 @@ class PromiseManager:
         ]
         
         for data in basic_promises[:num]:
-            self.promises.append(PlotPromise(
+            self._register(PlotPromise(
                 description=data["description"],
                 importance=data["importance"]
             ))
             
         print(f"Created {len(self.promises)} fallback promises")
         
+    def _register(self, promise):
+        """Add a promise to the list and the scheduler index."""
+        self.promises.append(promise)
+        self.scheduler.add(promise)
+        
     def add_promise(self, description, importance=5, dependencies=None):
         """Add a new plot promise to the story."""
         promise = PlotPromise(description, importance, dependencies=dependencies or [])
-        self.promises.append(promise)
+        self._register(promise)
         return promise.id
         
+    def get_promise(self, promise_id):
+        """Look up a promise by ID (None if unknown)."""
+        return self.scheduler.get(promise_id)
+        
     def complete_promise(self, promise_id):
-        """Mark a promise as completed."""
-        for promise in self.promises:
-            if promise.id == promise_id:
-                promise.status = "completed"
-                promise.progression = 100
-                return True
-        return False
-        
-    def _calculate_promise_scores(self):
-        """Calculate a score for each promise to determine progression priority."""
-        scores = {}
-        
-        for promise in self.promises:
-            if not promise.is_progressable(self.promises):
-                continue
-                
-            # Base score is the importance (1-10)
-            score = promise.importance * 10
-            
-            # Time factor: higher score if it's been a while since this was progressed
-            if promise.last_progressed > 0:
-                time_since_last = self.scene_count - promise.last_progressed
-                time_factor = min(50, time_since_last * 5)  # Cap at +50
-                score += time_factor
-            else:
-                # Bonus for promises that haven't been started yet
-                score += 30
-                
-            # Progress factor: lower score as we get closer to completion
-            progress_factor = 100 - promise.progression
-            score += progress_factor * 0.5
-            
-            scores[promise.id] = score
-            
-        return scores
+        """Mark a promise as completed and unlock the promises that depend on it."""
+        promise = self.scheduler.get(promise_id)
+        if promise is None:
+            return False
+        promise.status = "completed"
+        promise.progression = 100
+        self.scheduler.refresh(promise)
+        return True
         
     def choose_next_promise(self, previous_scene):
         """Intelligently choose which promise to progress next."""
-        # First, calculate algorithmic scores
-        scores = self._calculate_promise_scores()
-        
-        # Filter to progressable promises
-        progressable_promises = [p for p in self.promises if p.is_progressable(self.promises)]
+        # Top 5 candidates by algorithmic score, straight from the scheduler's heaps
+        sorted_promises = [p for p, _ in self.scheduler.top(self.scene_count, 5)]
         
-        if not progressable_promises:
+        if not sorted_promises:
             print("No progressable promises available. Creating a new one...")
             # Create a new promise if none are available
             new_promise = PlotPromise("New narrative development", importance=7)
-            self.promises.append(new_promise)
+            self._register(new_promise)
             return new_promise
-            
-        # Sort by score
-        sorted_promises = sorted(
-            progressable_promises, 
-            key=lambda p: scores.get(p.id, 0),
-            reverse=True
-        )
         
         # Format the available promises for the LLM
         available_promises_text = "\n".join([
             f"ID: {p.id} - {p.description} (Importance: {p.importance}, "
             f"Progress: {p.progression}%, Last Progressed: Scene {p.last_progressed or 'Never'})"
-            for p in sorted_promises[:5]  # Top 5 candidates
+            for p in sorted_promises
         ])
         
         # Use LLM to make the final choice based on narrative context
@@ -388,7 +366,7 @@ class PromiseManager:
                     break
                     
             if chosen_id:
-                chosen_promise = next((p for p in self.promises if p.id == chosen_id), None)
+                chosen_promise = self.scheduler.get(chosen_id)
                 if chosen_promise:
                     return chosen_promise
                     
@@ -441,6 +419,7 @@ class PromiseManager:
             elif direction == "BACKSLIDE":
                 promise.backslide(amount, self.scene_count)
             # STATIC requires no update
+            self.scheduler.refresh(promise)
             
             # Return the event description
             return event
@@ -450,6 +429,7 @@ class PromiseManager:
             traceback.print_exc()
             # Default progression
             promise.progress(15, self.scene_count)
+            self.scheduler.refresh(promise)
             return f"The story advances with respect to {promise.description.lower()}"
         
     def get_active_promises(self):
@@ -6,11 +6,16 @@ from langchain_ollama import ChatOllama # New recommended import
 from langchain_core.messages import HumanMessage, SystemMessage # For direct message construction
 # from langchain.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate # Less needed now for direct construction
 # from langchain.chains import LLMChain # LLMChain is still used for some agents, but not in the problematic path
-from tenacity import retry, stop_after_attempt, wait_exponential, RetryError
 import json
 import datetime
+import time
 import asyncio
-from typing import List, Dict, Any, Optional, Union
+from typing import List, Dict, Any, Optional, Tuple, Union
+
+from passage_index import PassageIndex
+from llm_cache import AsyncSingleFlight
+from llm_telemetry import LLMTelemetry, call_metrics
+from model_routing import OLLAMA_SMALL_MODEL, available_small_model, effective_tier, model_for
 
 # Rich for beautiful terminal output
 from rich.console import Console
@@ -24,8 +29,15 @@ from rich.rule import Rule
 # --- CONFIGURATION ---
 SELECTED_MODEL_NAME = "qwen3" # Default, user can override
 OLLAMA_BASE_URL = "http://localhost:11434"
-MAX_EXTRACTION_ATTEMPTS = 2 
+MAX_EXTRACTION_ATTEMPTS = 2 # Retries after the first extraction attempt
+EXTRACTION_RACE_WIDTH = 1 # Extraction attempts in flight at once; the first that parses wins, the rest are cancelled
+EXTRACTION_HEDGE_SECONDS = 30.0 # With a width above 1, a further attempt starts only once the running one is this slow
 MAX_PROSE_REVISION_ATTEMPTS = 1 # Max times to run editor/reviser loop per chapter
+RELEVANT_PASSAGES_K = 3 # Earlier-chapter passages retrieved into the agents' continuity context
+OLLAMA_MAX_CONCURRENT_CALLS = max(1, int(os.getenv("OLLAMA_NUM_PARALLEL", "4"))) # Ollama calls in flight at once (match the server)
+# Summarize and update character states from the draft while the editor reviews it. The work is kept only if the
+# editor accepts the draft unchanged and is thrown away on every revision, while holding LLM slots the editor needs.
+SPECULATIVE_CONTINUITY = False
 
 # --- RICH CONSOLE ---
 console = Console(width=120)
@@ -43,17 +55,32 @@ Finally, style and voice refer to the author's unique way of using language. Thi
 Beyond these core components, elements like pacing (the speed at which the story unfolds), a strong opening that hooks the reader, and a satisfying ending that provides a sense of closure contribute significantly to a novel's success. Ultimately, what is necessary in a novel are the elements that work in harmony to create a cohesive, engaging, and meaningful story that resonates with its readers.
 """
 
+async def gather_bounded(awaitables, limit: int = OLLAMA_MAX_CONCURRENT_CALLS, return_exceptions: bool = False) -> List[Any]:
+    """asyncio.gather that runs at most `limit` of the awaitables at a time. Results keep the input order."""
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def bounded(awaitable):
+        async with semaphore:
+            return await awaitable
+
+    return await asyncio.gather(*(bounded(a) for a in awaitables), return_exceptions=return_exceptions)
+
+
 # --- NOVEL GENERATOR CLASS ---
 class NovelGenerator:
     def __init__(self, subject: str, author_style: str, genre: str,
                  ollama_model_name: str = "llama3",
                  ollama_base_url: str = "http://localhost:11434",
-                 resume_text: Optional[str] = None):
+                 resume_text: Optional[str] = None,
+                 small_model_name: Optional[str] = None):
         self.subject = subject
         self.author_style = author_style
         self.genre = genre
         self.ollama_model_name = ollama_model_name
         self.ollama_base_url = ollama_base_url
+        # Extraction/analysis tier ("" = main model); dropped if the server does not have it
+        self.small_model_name = available_small_model(OLLAMA_SMALL_MODEL if small_model_name is None else small_model_name,
+                                                      ollama_base_url)
         self.resume_text = resume_text
         self.console = console
         
@@ -69,6 +96,11 @@ class NovelGenerator:
         self.detailed_chapter_plans: List[Dict[str, Any]] = []
         self.generated_chapters_prose: Dict[int, str] = {} 
         self.character_states_after_chapter: Dict[int, Dict[str, Any]] = {}
+        self.passage_index = PassageIndex() # Chunks of finished chapters for long-range retrieval
+        self._llm_pool: Dict[tuple, ChatOllama] = {} # (model, temperature, num_predict, timeout, seed) -> reused client
+        self._single_flight = AsyncSingleFlight() # Identical concurrent calls share one request
+        self._llm_slots = asyncio.Semaphore(OLLAMA_MAX_CONCURRENT_CALLS) # Caps this generator's concurrent Ollama calls
+        self.telemetry = LLMTelemetry(os.path.join(self.log_dir, "llm_calls.jsonl")) # Per-call latency by stage and model tier
 
         self.console.print(f"NovelGenerator initialized for Ollama (Model: [bold cyan]{self.ollama_model_name}[/bold cyan]). Output: [green]{self.output_dir}[/green]")
         self._log_to_file("initialization.log", f"Subject: {self.subject}\nAuthor Style: {self.author_style}\nGenre: {self.genre}\nModel: {self.ollama_model_name}")
@@ -90,34 +122,56 @@ class NovelGenerator:
         except Exception as e:
             self.console.print(f"[bold red]Error writing to log file {filename}: {e}[/bold red]")
 
-    def _get_ollama_llm(self, temperature=0.7, num_predict=-1, timeout=300):
-        return ChatOllama(
-            model=self.ollama_model_name,
-            base_url=self.ollama_base_url,
-            temperature=temperature,
-            num_predict=num_predict, 
-            timeout=timeout,
-        )
+    def _get_ollama_llm(self, model_name, temperature=0.7, num_predict=-1, timeout=300, seed=None):
+        """Returns the pooled ChatOllama for these settings; it (and its HTTP client) is built once and reused."""
+        key = (model_name, temperature, num_predict, timeout, seed)
+        llm = self._llm_pool.get(key)
+        if llm is None:
+            llm = self._llm_pool[key] = ChatOllama(
+                model=model_name,
+                base_url=self.ollama_base_url,
+                temperature=temperature,
+                num_predict=num_predict, 
+                timeout=timeout,
+                seed=seed,
+            )
+        return llm
 
-    async def _ollama_generate_text(self, prompt: str, system_message: Optional[str] = None, temperature: Optional[float]=None, json_mode: bool = False) -> str:
-        """Generates text using Ollama, returns raw string output. Can request JSON format from Ollama."""
+    async def _ollama_generate_text(self, prompt: str, system_message: Optional[str] = None, temperature: Optional[float]=None, json_mode: bool = False, num_predict: int = -1, stage: str = "other", seed: Optional[int] = None) -> str:
+        """Generates text using Ollama, returns raw string output. Can request JSON format from Ollama.
+        At most OLLAMA_MAX_CONCURRENT_CALLS calls are in flight at once; the rest wait for a slot.
+        The model comes from the stage's model_routing tier, and the call is recorded in self.telemetry.
+        A call identical to one already in flight waits for that one's result instead of being sent again."""
         messages = []
         if system_message:
             messages.append(SystemMessage(content=system_message)) # Direct construction
         messages.append(HumanMessage(content=prompt)) # Direct construction
         
         current_temp = temperature if temperature is not None else 0.7
-        llm_instance = self._get_ollama_llm(temperature=current_temp)
+        model_name = model_for(stage, self.ollama_model_name, self.small_model_name)
+        tier = effective_tier(model_name, self.ollama_model_name)
+        llm_instance = self._get_ollama_llm(model_name, temperature=current_temp, num_predict=num_predict, seed=seed)
         
         llm_call_kwargs = {}
         if json_mode:
             llm_call_kwargs['format'] = "json"
 
-        self._log_to_file("ollama_requests.log", f"PROMPT:\nSystem: {system_message}\nUser: {prompt}\nJSON Mode: {json_mode}, Temp: {current_temp}", prefix="OLLAMA_GEN_TEXT")
+        async def upstream():
+            self._log_to_file("ollama_requests.log", f"PROMPT:\nSystem: {system_message}\nUser: {prompt}\nJSON Mode: {json_mode}, Temp: {current_temp}", prefix="OLLAMA_GEN_TEXT")
+            async with self._llm_slots:
+                call_start = time.time()
+                response = await llm_instance.ainvoke(messages, **llm_call_kwargs)
+                self.telemetry.record(stage, call_metrics(getattr(response, "response_metadata", None) or {}),
+                                      time.time() - call_start, model_name, tier=tier)
+            self._log_to_file("ollama_requests.log", f"RESPONSE:\n{response.content}", prefix="OLLAMA_GEN_TEXT")
+            return response.content
+
+        flight_key = (model_name, system_message, prompt, current_temp, json_mode, num_predict, seed)
         try:
-            response = await llm_instance.ainvoke(messages, **llm_call_kwargs)
-            content = response.content
-            self._log_to_file("ollama_requests.log", f"RESPONSE:\n{content}", prefix="OLLAMA_GEN_TEXT")
+            wait_start = time.time()
+            content, shared = await self._single_flight.do(flight_key, upstream)
+            if shared:
+                self.telemetry.record(stage, None, time.time() - wait_start, model_name, cached=True, tier=tier, coalesced=True)
             return content
         except Exception as e:
             self.console.print(f"[bold red]Ollama text generation error: {e}[/bold red]")
@@ -125,11 +179,14 @@ class NovelGenerator:
             return f"Error: Ollama text generation failed: {str(e)}"
 
 
-    @retry(stop=stop_after_attempt(MAX_EXTRACTION_ATTEMPTS + 1), wait=wait_exponential(multiplier=1, min=2, max=30))
     async def _extract_data_with_llm(self, raw_text_from_llm: str, extraction_target_description: str, 
-                                     desired_format_description: str, example_json_output: str, attempt: int = 1) -> Union[Dict, List, str]:
-        self.console.print(f"[dim]Attempting LLM-based extraction for '{extraction_target_description}' (Attempt {attempt})...[/dim]")
-        
+                                     desired_format_description: str, example_json_output: str) -> Union[Dict, List, str]:
+        """
+        Asks the LLM to turn raw text into JSON. Up to MAX_EXTRACTION_ATTEMPTS + 1 attempts are made, one after another
+        as each fails to parse. With EXTRACTION_RACE_WIDTH above 1, an attempt still running after EXTRACTION_HEDGE_SECONDS
+        is hedged with the next one: the first that parses is returned and the others are cancelled. If none parses,
+        returns {"error": ..., "raw_output": ...}.
+        """
         extraction_prompt = f"""
 You are a data extraction expert. Your task is to parse the following raw text and extract specific information, formatting it as a valid JSON object or array.
 
@@ -150,29 +207,53 @@ Begin JSON output now:
 """
         system_extraction_prompt = "You are an AI assistant that converts unstructured or semi-structured text into perfectly valid JSON according to provided instructions."
         
+        total_attempts = MAX_EXTRACTION_ATTEMPTS + 1
+        pending, started = set(), 0
+        last_error, last_output = None, ""
+        try:
+            while started < total_attempts or pending:
+                if started < total_attempts and len(pending) < EXTRACTION_RACE_WIDTH:
+                    started += 1
+                    pending.add(asyncio.ensure_future(self._extraction_attempt(
+                        extraction_prompt, system_extraction_prompt, extraction_target_description, raw_text_from_llm, started)))
+                can_hedge = started < total_attempts and len(pending) < EXTRACTION_RACE_WIDTH
+                done, pending = await asyncio.wait(pending, timeout=EXTRACTION_HEDGE_SECONDS if can_hedge else None,
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    parsed_data, extracted_json_str, error = task.result()
+                    if error is None:
+                        self.console.print(f"[green]Successfully extracted and parsed data for '{extraction_target_description}'.[/green]")
+                        return parsed_data
+                    last_error, last_output = error, extracted_json_str
+        finally:
+            for task in pending:
+                task.cancel()
+        return {"error": f"Failed to parse JSON from LLM extraction after {total_attempts} attempts. Last error: {last_error}", "raw_output": last_output}
+
+    async def _extraction_attempt(self, extraction_prompt: str, system_extraction_prompt: str, extraction_target_description: str,
+                                  raw_text_from_llm: str, attempt: int):
+        """One extraction call. Returns (parsed data, raw JSON string, error); error is None on success."""
+        self.console.print(f"[dim]Attempting LLM-based extraction for '{extraction_target_description}' (Attempt {attempt})...[/dim]")
         extracted_json_str = await self._ollama_generate_text(
             extraction_prompt, 
             system_message=system_extraction_prompt, 
             temperature=0.1, 
-            json_mode=True
+            json_mode=True,
+            stage="extraction",
+            seed=attempt # Hedged attempts differ from each other; the same extraction requested twice still coalesces
         )
         self._log_to_file("llm_extraction_requests.log", f"TARGET: {extraction_target_description}\nRAW_TEXT_INPUT_SNIPPET:\n{raw_text_from_llm[:500]}...\nEXTRACTED_JSON_STRING:\n{extracted_json_str}", prefix="EXTRACTION_ATTEMPT")
             
         if extracted_json_str.startswith("Error:"):
-             raise RuntimeError(f"LLM call for extraction failed: {extracted_json_str}")
+            return None, extracted_json_str, f"LLM call for extraction failed: {extracted_json_str}"
 
         try:
-            parsed_data = json.loads(extracted_json_str)
-            self.console.print(f"[green]Successfully extracted and parsed data for '{extraction_target_description}'.[/green]")
-            return parsed_data
+            return json.loads(extracted_json_str), extracted_json_str, None
         except json.JSONDecodeError as e:
             self.console.print(f"[bold orange_red1]JSON Decode Error after LLM extraction for '{extraction_target_description}' (Attempt {attempt}): {e}[/bold orange_red1]")
             self.console.print(f"Problematic JSON string: {extracted_json_str[:500]}...")
             self._log_to_file("llm_extraction_errors.log", f"TARGET: {extraction_target_description}\nJSONDecodeError: {e}\nData:\n{extracted_json_str}")
-            if attempt < MAX_EXTRACTION_ATTEMPTS:
-                raise 
-            return {"error": f"Failed to parse JSON from LLM extraction after {attempt} attempts. Last error: {e}", "raw_output": extracted_json_str}
-
+            return None, extracted_json_str, e
 
     async def generate_foundational_elements(self):
         self.console.print(Rule("[bold_blue]Generating Foundational Elements (LLM Text Extraction)[/bold_blue]", style="blue"))
@@ -228,7 +309,7 @@ Role: Antagonist
 """
         system_char_gen_prompt = "You are an expert character creator. Generate character profiles as clearly formatted text, using the specified labels and separator."
         
-        raw_character_text = await self._ollama_generate_text(char_gen_prompt, system_message=system_char_gen_prompt, temperature=0.7)
+        raw_character_text = await self._ollama_generate_text(char_gen_prompt, system_message=system_char_gen_prompt, temperature=0.7, stage="foundation")
         if raw_character_text.startswith("Error:"):
             raise RuntimeError(f"Failed to generate raw character text: {raw_character_text}")
         self._log_to_file("foundational_raw_character_text.txt", raw_character_text)
@@ -270,7 +351,7 @@ Provide the following information, clearly labeled:
 - Political Landscape: [Brief overview of the political situation, factions, or governance]
 """
         system_world_gen_prompt = "You are an expert world-builder. Generate world details as clearly formatted text, using the specified labels."
-        raw_world_text = await self._ollama_generate_text(world_gen_prompt, system_message=system_world_gen_prompt, temperature=0.6)
+        raw_world_text = await self._ollama_generate_text(world_gen_prompt, system_message=system_world_gen_prompt, temperature=0.6, stage="foundation")
         if raw_world_text.startswith("Error:"):
             raise RuntimeError(f"Failed to generate raw world details text: {raw_world_text}")
         self._log_to_file("foundational_raw_world_text.txt", raw_world_text)
@@ -305,7 +386,7 @@ Provide the following, clearly labeled:
 - Recurring Motifs or Symbols: [List of motifs or symbols. Use bullet points.]
 """
         system_themes_gen_prompt = "You are a literary analyst. Generate themes and motifs as clearly formatted text."
-        raw_themes_text = await self._ollama_generate_text(themes_gen_prompt, system_message=system_themes_gen_prompt, temperature=0.5)
+        raw_themes_text = await self._ollama_generate_text(themes_gen_prompt, system_message=system_themes_gen_prompt, temperature=0.5, stage="foundation")
         if raw_themes_text.startswith("Error:"):
             raise RuntimeError(f"Failed to generate raw themes text: {raw_themes_text}")
         self._log_to_file("foundational_raw_themes_text.txt", raw_themes_text)
@@ -354,7 +435,7 @@ Provide the following, clearly labeled:
 Use clear labels for each section. Ensure Rising Action Beats and Falling Action Beats are presented as a list under their respective labels.
 """
         system_plot_gen_prompt = "You are a master plotter. Generate a plot outline as clearly formatted text."
-        raw_plot_text = await self._ollama_generate_text(plot_gen_prompt, system_message=system_plot_gen_prompt, temperature=0.65)
+        raw_plot_text = await self._ollama_generate_text(plot_gen_prompt, system_message=system_plot_gen_prompt, temperature=0.65, stage="foundation")
         if raw_plot_text.startswith("Error:"):
             raise RuntimeError(f"Failed to generate raw plot text: {raw_plot_text}")
         self._log_to_file("foundational_raw_plot_text.txt", raw_plot_text)
@@ -454,7 +535,7 @@ Provide the following details for Chapter {i}, clearly labeled using Markdown-st
 - Closing Hook or Cliffhanger Idea: [Optional: Brief idea for a hook or cliffhanger at the chapter's end]
 """
             system_chapter_gen_prompt = "You are an expert chapter planner. Generate the chapter plan as clearly formatted text with labels/Markdown headers."
-            raw_chapter_plan_text = await self._ollama_generate_text(chapter_plan_gen_prompt, system_message=system_chapter_gen_prompt, temperature=0.6)
+            raw_chapter_plan_text = await self._ollama_generate_text(chapter_plan_gen_prompt, system_message=system_chapter_gen_prompt, temperature=0.6, stage="plan")
             if raw_chapter_plan_text.startswith("Error:"):
                 raise RuntimeError(f"Failed to generate raw text for chapter {i} plan: {raw_chapter_plan_text}")
             self._log_to_file(f"chapter_{i}_raw_plan_text.txt", raw_chapter_plan_text)
@@ -486,7 +567,6 @@ Provide the following details for Chapter {i}, clearly labeled using Markdown-st
 
     async def _summarize_prose_with_llm(self, prose: str, chapter_num: int, max_words: int = 250) -> str: 
         self.console.print(f"[dim]Generating LLM-based summary for prose of Chapter {chapter_num}...[/dim]")
-        summarizer_llm = self._get_ollama_llm(temperature=0.3, num_predict=max_words + 100) 
         
         summary_prompt = f"""
 Concisely summarize the key events, critical plot advancements, significant character developments (emotions, decisions, new knowledge, relationship shifts), and any cliffhangers or unresolved threads from the following chapter prose.
@@ -502,7 +582,7 @@ Provide ONLY the summary text. Be factual and objective.
 """
         system_summary_prompt = "You are an expert at summarizing novel chapters for continuity purposes, focusing on plot, character changes, and unresolved elements."
         
-        summary_text = await self._ollama_generate_text(summary_prompt, system_message=system_summary_prompt)
+        summary_text = await self._ollama_generate_text(summary_prompt, system_message=system_summary_prompt, num_predict=max_words + 100, stage="summary")
         if summary_text.startswith("Error:") or not summary_text.strip():
             self.console.print(f"[orange_red1]LLM Summarization failed for Chapter {chapter_num}. Using truncation as fallback.[/orange_red1]")
             self._log_to_file(f"chapter_{chapter_num}_summary_error.txt", f"LLM summarization failed. Fallback to truncation. Original error: {summary_text}")
@@ -559,7 +639,7 @@ Begin JSON object output now:
 """
         system_update_prompt = "You are an expert in character tracking and narrative analysis. Output ONLY the JSON object detailing character state updates."
         
-        raw_state_update_text = await self._ollama_generate_text(update_prompt, system_message=system_update_prompt, temperature=0.2, json_mode=True) 
+        raw_state_update_text = await self._ollama_generate_text(update_prompt, system_message=system_update_prompt, temperature=0.2, json_mode=True, stage="character-state") 
         
         if raw_state_update_text.startswith("Error:"):
             self.console.print(f"[bold red]LLM failed to generate text for character state update after Ch {chapter_num}.[/bold red]")
@@ -591,6 +671,10 @@ Begin JSON object output now:
                     self.console.print(f"[yellow]Warning: LLM provided state update for unknown character '{char_name_from_update}'. Skipping.[/yellow]")
                 continue
 
+            if not isinstance(updates, dict):
+                self._log_to_file("character_state_errors.log", f"Chapter {chapter_num} state update for '{canonical_char_name}' is not an object. Got: {updates}")
+                continue
+
             if canonical_char_name not in final_states: 
                  final_states[canonical_char_name] = {}
             
@@ -606,6 +690,15 @@ Begin JSON object output now:
         return final_states
 
 
+    async def _chapter_continuity(self, chapter_num: int, prose: str, states_before: Dict[str, Any], summarize: bool = True) -> Tuple[Dict[str, Any], str]:
+        """Character states after a chapter and (if `summarize`) its summary, requested concurrently."""
+        calls = [self._update_character_states_from_prose(chapter_num, prose, states_before)]
+        if summarize:
+            calls.append(self._summarize_prose_with_llm(prose, chapter_num, max_words=250))
+        results = await gather_bounded(calls)
+        return results[0], results[1] if summarize else ""
+
+
     def _build_context_string_for_agents(self, chapter_num: int, current_character_states: Dict[str, Any], previous_chapter_llm_summary: str) -> str:
         if not self.foundational_elements:
             return "Error: Foundational elements missing."
@@ -617,6 +710,13 @@ Begin JSON object output now:
         
         context += f"\n--- PREVIOUS CHAPTER SUMMARY (LLM Generated) ---\n{previous_chapter_llm_summary or 'This is the first chapter.'}\n"
 
+        chapter_plan = next((p for p in self.detailed_chapter_plans if p.get('chapter_number') == chapter_num), {})
+        retrieval_query = " ".join(str(chapter_plan.get(key, "")) for key in ("title", "goal_event", "key_conflict_or_tension", "setting_mood_atmosphere"))
+        retrieval_query += " " + " ".join(map(str, chapter_plan.get("plot_advancements", [])))
+        relevant_passages = self.passage_index.relevant_passages_text(retrieval_query, k=RELEVANT_PASSAGES_K, exclude_chapters=(chapter_num - 1, chapter_num))
+        if relevant_passages:
+            context += f"\n--- RELEVANT PASSAGES FROM EARLIER CHAPTERS ---\n{relevant_passages}\n"
+
         context += "\n--- CURRENT CHARACTER STATES (ENTERING THIS CHAPTER) ---\n"
         for char_name, state_data in current_character_states.items():
             context += f"- Character: {char_name}\n"
@@ -689,7 +789,7 @@ Begin JSON object output now:
 """
         system_editor_prompt = "You are a meticulous novel editor. Provide constructive, specific feedback in the requested JSON format."
         
-        raw_editor_feedback_text = await self._ollama_generate_text(editor_prompt, system_message=system_editor_prompt, temperature=0.2, json_mode=True) 
+        raw_editor_feedback_text = await self._ollama_generate_text(editor_prompt, system_message=system_editor_prompt, temperature=0.2, json_mode=True, stage="editor") 
         
         if raw_editor_feedback_text.startswith("Error:"):
             self.console.print(f"[bold red]Editor agent LLM call failed for Chapter {chapter_num}.[/bold red]")
@@ -759,8 +859,7 @@ Begin revised Chapter {chapter_num} prose now:
 """
         system_revision_prompt = "You are a skilled novelist revising a chapter based on editorial feedback. Output ONLY the revised chapter prose."
         
-        reviser_llm = self._get_ollama_llm(temperature=0.7, num_predict=-1) 
-        revised_prose = await self._ollama_generate_text(revision_prompt, system_message=system_revision_prompt)
+        revised_prose = await self._ollama_generate_text(revision_prompt, system_message=system_revision_prompt, stage="revision")
 
         if revised_prose.startswith("Error:"):
             self.console.print(f"[bold red]Prose Revision Agent LLM call failed for Chapter {chapter_num}. Returning original prose.[/bold red]")
@@ -850,15 +949,14 @@ Begin Chapter {chapter_num} prose now:
 """
                 system_prose_prompt = f"You are writing a chapter for a novel. Embody the specified author style and genre. Focus on narrative flow, character depth, and fulfilling the chapter plan."
                 
-                prose_llm = self._get_ollama_llm(temperature=0.75, num_predict=-1) 
-                draft_prose = await self._ollama_generate_text(prose_prompt, system_message=system_prose_prompt)
+                draft_prose = await self._ollama_generate_text(prose_prompt, system_message=system_prose_prompt, stage="prose")
 
                 if draft_prose.startswith("Error:") or not draft_prose.strip():
                     self.console.print(f"[bold red]Error generating DRAFT prose for Chapter {chapter_num}: {draft_prose}.[/bold red]")
                     self.generated_chapters_prose[chapter_num] = f"Error: Could not generate DRAFT prose. Details: {draft_prose}"
-                    current_character_states = await self._update_character_states_from_prose(chapter_num, "PROSE GENERATION FAILED", states_before_this_chapter)
+                    # Nothing to analyze: the states (and previous summary) carry over to the next chapter unchanged
+                    current_character_states = states_before_this_chapter
                     self.character_states_after_chapter[chapter_num] = current_character_states
-                    previous_chapter_llm_summary = await self._summarize_prose_with_llm(self.generated_chapters_prose[chapter_num], chapter_num, max_words=250)
                     progress_bar.advance(prose_task)
                     continue 
 
@@ -866,6 +964,11 @@ Begin Chapter {chapter_num} prose now:
                 self._log_to_file(f"chapter_{chapter_num}_prose_DRAFT.txt", draft_prose)
                 
                 current_prose_iteration = draft_prose
+                summarize_for_next = chapter_num < len(self.detailed_chapter_plans)
+                # Optionally bet on the draft being accepted: its continuity then runs alongside the editor review
+                speculative_continuity = asyncio.ensure_future(
+                    self._chapter_continuity(chapter_num, draft_prose, states_before_this_chapter, summarize=summarize_for_next)
+                ) if SPECULATIVE_CONTINUITY else None
 
                 for rev_attempt in range(MAX_PROSE_REVISION_ATTEMPTS):
                     progress_bar.update(prose_task, description=f"[#FFBF00]Ch. {chapter_num}: Editing (Pass {rev_attempt+1})...[/]")
@@ -894,19 +997,22 @@ Begin Chapter {chapter_num} prose now:
                     self._log_to_file(f"chapter_{chapter_num}_prose_REVISED_Pass{rev_attempt+1}.txt", current_prose_iteration)
                 
                 self.generated_chapters_prose[chapter_num] = current_prose_iteration 
+                self.passage_index.add_chapter(chapter_num, current_prose_iteration)
                 
-                progress_bar.update(prose_task, description=f"[#FFBF00]Ch. {chapter_num}: Updating Character States...[/]")
-                states_after_this_chapter = await self._update_character_states_from_prose(
-                    chapter_num, self.generated_chapters_prose[chapter_num], states_before_this_chapter
-                )
+                progress_bar.update(prose_task, description=f"[#FFBF00]Ch. {chapter_num}: Updating Character States and Summary...[/]")
+                if speculative_continuity is not None and current_prose_iteration is draft_prose:
+                    states_after_this_chapter, chapter_summary = await speculative_continuity
+                else:
+                    if speculative_continuity is not None:
+                        speculative_continuity.cancel() # The draft was revised; its continuity no longer applies
+                    states_after_this_chapter, chapter_summary = await self._chapter_continuity(
+                        chapter_num, current_prose_iteration, states_before_this_chapter, summarize=summarize_for_next
+                    )
                 self.character_states_after_chapter[chapter_num] = states_after_this_chapter
                 current_character_states = states_after_this_chapter 
 
-                if chapter_num < len(self.detailed_chapter_plans): 
-                    progress_bar.update(prose_task, description=f"[#FFBF00]Ch. {chapter_num}: Summarizing for next...[/]")
-                    previous_chapter_llm_summary = await self._summarize_prose_with_llm(
-                        self.generated_chapters_prose[chapter_num], chapter_num, max_words=250
-                    )
+                if summarize_for_next: 
+                    previous_chapter_llm_summary = chapter_summary
                     if previous_chapter_llm_summary.startswith("Error:"):
                          self.console.print(f"[orange_red1]Using truncated summary for Ch {chapter_num} due to LLM summarization error.[/orange_red1]")
                          previous_chapter_llm_summary = self._truncate_prose(self.generated_chapters_prose[chapter_num], max_words=250)
@@ -1001,6 +1107,8 @@ Begin Chapter {chapter_num} prose now:
             tb_str = traceback.format_exc()
             self.console.print(tb_str)
             self._log_to_file("generation_pipeline.log", f"CRITICAL UNEXPECTED ERROR: {e}\n{tb_str}")
+        finally:
+            self.telemetry.print_summary()
 
 
 def get_multiline_input(prompt_message: str) -> str:
@@ -1045,7 +1153,12 @@ async def main_terminal_advanced():
         default=SELECTED_MODEL_NAME
     )
     SELECTED_MODEL_NAME = ollama_model_input
-    console.print(f"Using Ollama Model: [bold cyan]{SELECTED_MODEL_NAME}[/bold cyan]")
+    small_model_input = Prompt.ask(
+        Text("Enter a small model for extraction/analysis calls ('-' = use the main model)", style="bold sky_blue1"),
+        default=OLLAMA_SMALL_MODEL or "-"
+    )
+    small_model_name = "" if small_model_input.strip() == "-" else small_model_input.strip()
+    console.print(f"Using Ollama Model: [bold cyan]{SELECTED_MODEL_NAME}[/bold cyan] (extraction/analysis: [bold cyan]{small_model_name or SELECTED_MODEL_NAME}[/bold cyan])")
 
     resume_text_content = None
     resume_path = Prompt.ask(Text("Enter path to resume file (text/PDF) or press Enter to skip", style="sky_blue1"), default="")
@@ -1073,7 +1186,7 @@ async def main_terminal_advanced():
     generator = NovelGenerator(
         subject=subject, author_style=author_style, genre=genre,
         ollama_model_name=SELECTED_MODEL_NAME, ollama_base_url=OLLAMA_BASE_URL,
-        resume_text=resume_text_content
+        resume_text=resume_text_content, small_model_name=small_model_name
     )
     
     console.print(Panel(
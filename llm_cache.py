@@ -0,0 +1,209 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Default on-disk budget for cached responses (bytes of response text).
+DEFAULT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+
+def make_cache_key(model, system_prompt, prompt, temperature, top_p, seed=None, response_format=None):
+    """Returns a stable content hash for one generation request."""
+    request = {
+        "model": model,
+        "system": system_prompt,
+        "prompt": prompt,
+        "temperature": temperature,
+        "top_p": top_p,
+        "seed": seed,
+    }
+    if response_format is not None: # Only keyed when set, so existing cache entries stay valid
+        request["format"] = response_format
+    material = json.dumps(request, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Persistent, content-addressed cache of LLM responses backed by SQLite.
+
+    Entries are evicted least-recently-used first once the stored response text
+    exceeds max_bytes. In replay mode callers are expected to serve every request
+    from the cache and treat a miss as an error instead of contacting the server.
+    """
+
+    def __init__(self, path, max_bytes=DEFAULT_CACHE_MAX_BYTES, replay=False):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.replay = replay
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        cache_dir = os.path.dirname(os.path.abspath(path))
+        os.makedirs(cache_dir, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                   key TEXT PRIMARY KEY,
+                   response TEXT NOT NULL,
+                   size INTEGER NOT NULL,
+                   created REAL NOT NULL,
+                   last_access REAL NOT NULL
+               )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access)")
+        self._conn.commit()
+
+    def get(self, key):
+        """Returns the cached response for key (refreshing its LRU position), or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, response):
+        """Stores a response and evicts the oldest entries if the cache is over budget."""
+        size = len(response.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, response, size, now, now),
+            )
+            self._evict_locked()
+            self._conn.commit()
+
+    def _evict_locked(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_access ASC").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        print(f"LLM cache: evicted {evicted} least-recently-used entries (now {total / 1024 / 1024:.1f} MB).")
+
+    def total_bytes(self):
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def stats_line(self):
+        """One-line summary suitable for end-of-run output."""
+        mode = "replay" if self.replay else "read/write"
+        return (f"LLM cache ({mode}) at {self.path}: {self.hits} hits, {self.misses} misses, "
+                f"{len(self)} entries, {self.total_bytes() / 1024 / 1024:.1f} MB")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical requests (same cache key) across threads.
+
+    The first caller for a key runs the request; callers arriving while it is in
+    flight wait for it and get its result (or exception) instead of sending a
+    duplicate upstream. Once it finishes the key is free again, so later callers
+    go through the response cache as usual.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {} # key -> _Flight
+        self.leaders = 0
+        self.followers = 0
+
+    def do(self, key, fn):
+        """Returns (fn() or the in-flight call's result, whether it was shared)."""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.leaders += 1
+            else:
+                self.followers += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+        try:
+            flight.result = fn()
+            return flight.result, False
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+
+class _AsyncFlight:
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+
+
+class AsyncSingleFlight:
+    """
+    SingleFlight for coroutines on one event loop. The shared request is cancelled
+    only when every caller waiting on it has been cancelled.
+    """
+
+    def __init__(self):
+        self._flights = {} # key -> _AsyncFlight
+        self.leaders = 0
+        self.followers = 0
+
+    async def do(self, key, make_coroutine):
+        """Returns (result of make_coroutine() or of the in-flight call, whether it was shared)."""
+        flight = self._flights.get(key)
+        shared = flight is not None
+        if shared:
+            self.followers += 1
+        else:
+            self.leaders += 1
+            flight = self._flights[key] = _AsyncFlight(asyncio.ensure_future(make_coroutine()))
+            flight.task.add_done_callback(lambda task: self._flights.pop(key) if self._flights.get(key) is flight else None)
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task), shared
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done():
+                flight.task.cancel()
+
+
+_single_flight = SingleFlight()
+
+
+def get_single_flight():
+    """The process-wide SingleFlight, so generators running side by side (batch jobs) share requests."""
+    return _single_flight
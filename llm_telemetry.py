@@ -0,0 +1,164 @@
+import json
+import threading
+import time
+
+TELEMETRY_TOP_STAGES = 3 # Stages named in the "most expensive" line of the summary
+TELEMETRY_REFERENCE_TIER = "large" # Other tiers' savings are estimated against this tier's measured speed
+TELEMETRY_MIN_RATE_SECONDS = 0.001 # Below this much measured time a tokens/sec rate is noise (cached or mock calls): shown as "-"
+
+
+def call_metrics(response_data):
+    """Extracts Ollama's prompt/eval counters from a response (durations are reported in nanoseconds)."""
+    if "prompt_eval_duration" not in response_data and "eval_duration" not in response_data:
+        return None
+    return {
+        "prompt_eval_count": response_data.get("prompt_eval_count", 0),
+        "prompt_eval_seconds": response_data.get("prompt_eval_duration", 0) / 1e9,
+        "eval_count": response_data.get("eval_count", 0),
+        "eval_seconds": response_data.get("eval_duration", 0) / 1e9,
+        "load_seconds": response_data.get("load_duration", 0) / 1e9,
+    }
+
+
+def _rate_column(tokens, seconds, width, decimals):
+    """A right-aligned tokens/sec cell that always fits its column."""
+    if seconds < TELEMETRY_MIN_RATE_SECONDS:
+        return f"{'-':>{width}}"
+    text = f"{tokens / seconds:.{decimals}f}"
+    if len(text) >= width: # Keep one space to the previous column
+        text = f">{10 ** (width - 2) - 1}"
+    return f"{text:>{width}}"
+
+
+class LLMTelemetry:
+    """
+    Per-call record of Ollama's eval counters, tagged by pipeline stage.
+
+    Every call is appended as one JSON line to trace_path (if given) as soon as
+    it finishes, so a crashed run still leaves its trace behind. print_summary()
+    aggregates the calls per stage into tokens/sec, prefill share and wall time.
+    Adaptive concurrency limit changes are traced as "concurrency" events.
+    """
+
+    def __init__(self, trace_path=None):
+        self.trace_path = trace_path
+        self.calls = []
+        self.concurrency = [] # AdaptiveLimiter decisions made during the run
+        self._lock = threading.Lock()
+
+    def record(self, stage, metrics, wall_seconds, model="", cached=False, tier="", coalesced=False):
+        """
+        Records one call. metrics is call_metrics() output, or None for cache hits. tier is its model_routing tier.
+        A coalesced call was served by an identical call already in flight; it is counted as cached too.
+        """
+        call = {"time": round(time.time(), 3), "stage": stage, "model": model, "tier": tier, "cached": cached,
+                "coalesced": coalesced, "wall_seconds": round(wall_seconds, 4)}
+        call.update(metrics or {})
+        with self._lock:
+            self.calls.append(call)
+            self._trace(call)
+
+    def record_concurrency(self, decision):
+        """Records one adaptive limit change (an OllamaClient concurrency listener)."""
+        with self._lock:
+            self.concurrency.append(decision)
+            self._trace(dict(decision, event="concurrency"))
+
+    def _trace(self, entry):
+        if self.trace_path:
+            with open(self.trace_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def stage_totals(self):
+        """Returns {stage: totals} in the order stages were first seen."""
+        return self._totals(lambda call: call["stage"])
+
+    def tier_totals(self):
+        """Returns {(tier, model): totals} in the order they were first seen."""
+        return self._totals(lambda call: (call.get("tier", ""), call["model"]))
+
+    def _totals(self, group_key):
+        totals = {}
+        with self._lock:
+            calls = list(self.calls)
+        for call in calls:
+            t = totals.setdefault(group_key(call), {"calls": 0, "cached": 0, "coalesced": 0, "prompt_tokens": 0,
+                                                    "eval_tokens": 0, "prefill_seconds": 0.0, "eval_seconds": 0.0,
+                                                    "load_seconds": 0.0, "wall_seconds": 0.0})
+            t["calls"] += 1
+            t["cached"] += call["cached"]
+            t["coalesced"] += call.get("coalesced", False)
+            t["prompt_tokens"] += call.get("prompt_eval_count", 0)
+            t["eval_tokens"] += call.get("eval_count", 0)
+            t["prefill_seconds"] += call.get("prompt_eval_seconds", 0.0)
+            t["eval_seconds"] += call.get("eval_seconds", 0.0)
+            t["load_seconds"] += call.get("load_seconds", 0.0)
+            t["wall_seconds"] += call["wall_seconds"]
+        return totals
+
+    def print_summary(self):
+        totals = self.stage_totals()
+        if not totals:
+            return
+        print("\n--- LLM Call Telemetry ---")
+        print(f"{'Stage':<18}{'Calls':>6}{'Cached':>7}{'Prompt tok':>11}{'Gen tok':>9}{'Prefill/s':>10}{'Gen tok/s':>10}"
+              f"{'Prefill %':>10}{'Load s':>8}{'Wall s':>9}")
+        for stage, t in totals.items():
+            busy = t["prefill_seconds"] + t["eval_seconds"]
+            prefill_share = 100 * t["prefill_seconds"] / busy if busy else 0.0
+            print(f"{stage:<18}{t['calls']:>6}{t['cached']:>7}{t['prompt_tokens']:>11}{t['eval_tokens']:>9}"
+                  f"{_rate_column(t['prompt_tokens'], t['prefill_seconds'], 10, 0)}{_rate_column(t['eval_tokens'], t['eval_seconds'], 10, 1)}"
+                  f"{prefill_share:>9.0f}%{t['load_seconds']:>8.1f}{t['wall_seconds']:>9.1f}")
+
+        total_wall = sum(t["wall_seconds"] for t in totals.values())
+        ranked = sorted(totals.items(), key=lambda item: item[1]["wall_seconds"], reverse=True)[:TELEMETRY_TOP_STAGES]
+        print("Most expensive stages: " + ", ".join(
+            f"{stage} ({t['wall_seconds']:.1f}s, {100 * t['wall_seconds'] / total_wall if total_wall else 0:.0f}%)" for stage, t in ranked))
+        coalesced = sum(t["coalesced"] for t in totals.values())
+        if coalesced:
+            print(f"Coalesced duplicates: {coalesced} call(s) shared an identical request already in flight (included in Cached).")
+        self._print_tier_summary()
+        self._print_concurrency_summary()
+        if self.trace_path:
+            print(f"Per-call trace: {self.trace_path}")
+
+    def _print_tier_summary(self):
+        """Per-tier latency, and what the calls routed away from the reference tier would have cost on it."""
+        tiers = self.tier_totals()
+        if len(tiers) < 2:
+            return
+        print(f"{'Tier / model':<30}{'Calls':>6}{'Avg s/call':>11}{'Prefill/s':>10}{'Gen tok/s':>10}{'Wall s':>9}")
+        for (tier, model), t in tiers.items():
+            uncached = t["calls"] - t["cached"]
+            avg_wall = t["wall_seconds"] / uncached if uncached else 0.0
+            print(f"{(tier or '-') + ' / ' + (model or '-'):<30}{t['calls']:>6}{avg_wall:>11.2f}"
+                  f"{_rate_column(t['prompt_tokens'], t['prefill_seconds'], 10, 0)}{_rate_column(t['eval_tokens'], t['eval_seconds'], 10, 1)}"
+                  f"{t['wall_seconds']:>9.1f}")
+
+        reference = [t for (tier, _), t in tiers.items() if tier == TELEMETRY_REFERENCE_TIER]
+        ref_prefill_seconds = sum(t["prefill_seconds"] for t in reference)
+        ref_eval_seconds = sum(t["eval_seconds"] for t in reference)
+        routed = [t for (tier, _), t in tiers.items() if tier != TELEMETRY_REFERENCE_TIER]
+        if not routed or min(ref_prefill_seconds, ref_eval_seconds) < TELEMETRY_MIN_RATE_SECONDS:
+            return # No measured reference speed to estimate against
+        ref_prefill = sum(t["prompt_tokens"] for t in reference) / ref_prefill_seconds
+        ref_eval = sum(t["eval_tokens"] for t in reference) / ref_eval_seconds
+        if not ref_prefill or not ref_eval:
+            return
+        actual = sum(t["prefill_seconds"] + t["eval_seconds"] + t["load_seconds"] for t in routed)
+        estimated = sum(t["prompt_tokens"] / ref_prefill + t["eval_tokens"] / ref_eval for t in routed)
+        print(f"Calls off the {TELEMETRY_REFERENCE_TIER} tier: {actual:.1f}s of model time, about {estimated:.1f}s at the "
+              f"{TELEMETRY_REFERENCE_TIER} tier's measured speed ({estimated - actual:.1f}s saved)")
+
+    def _print_concurrency_summary(self):
+        """Where the adaptive limit went, and why."""
+        with self._lock:
+            decisions = list(self.concurrency)
+        if not decisions:
+            return
+        reasons = {}
+        for decision in decisions:
+            reasons[decision["reason"]] = reasons.get(decision["reason"], 0) + 1
+        limits = [decisions[0]["from"]] + [d["to"] for d in decisions]
+        print(f"Adaptive concurrency: limit {limits[0]} -> {limits[-1]} (range {min(limits)}-{max(limits)}) over "
+              f"{len(decisions)} change(s): " + ", ".join(f"{reason} x{count}" for reason, count in reasons.items()))
@@ -0,0 +1,591 @@
+import argparse
+import json
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- Configuration ---
+MOCK_OLLAMA_HOST = "127.0.0.1"
+MOCK_OLLAMA_PORT = 11435 # Next to the real Ollama port so both can run side by side
+MOCK_LATENCY_SECONDS = 0.05 # Artificial delay before the first token (stands in for prompt prefill)
+MOCK_TOKENS_PER_SEC = 2000.0 # Artificial generation speed; 0 returns the whole response instantly
+MOCK_CHAPTERS = 10 # Chapter count used in outlines and plans when the prompt does not ask for one
+MOCK_SCENE_WORDS = 350 # Length of generated prose (scenes, openers, summaries, chapters scale from it)
+MOCK_STREAM_CHUNK_TOKENS = 4 # Words per NDJSON chunk when streaming
+MOCK_MODELS = ("mock:latest",) # Models listed by /api/tags
+MOCK_LOAD_SECONDS = 0.0 # Extra delay on the first request for a model that is not loaded yet
+MOCK_NUM_PARALLEL = 0 # Generations served at once, like OLLAMA_NUM_PARALLEL (0 = unlimited); the rest wait
+MOCK_MAX_QUEUE = 0 # Waiting requests beyond which new ones get a 503, like OLLAMA_MAX_QUEUE (0 = unlimited)
+
+CAST = [
+    ("Mara Vell", "Protagonist", "A cartographer who maps places that have stopped existing."),
+    ("Oren Kask", "Antagonist", "The archivist who decides which memories the city keeps."),
+    ("Ilse Varn", "Ally", "A ferrywoman who remembers every passenger she has carried."),
+]
+WORLD_NAME = "Veloria"
+
+_FILLER_SENTENCES = [
+    "The fog rolled in off the harbor and swallowed the lamps one by one.",
+    "Mara traced the edge of the map where the ink had started to fade.",
+    "Somewhere below the archive a bell rang, though no one had pulled the rope.",
+    "Oren watched from the gallery, his hands folded behind his back.",
+    "Ilse said nothing, but she steered the ferry closer to the eastern wall.",
+    "The old streets of Veloria rearranged themselves whenever the tide turned.",
+    "A gull cried once and the silence afterward felt heavier than before.",
+    "She counted the steps twice, because the number had changed since morning.",
+    "\"We are running out of places to hide,\" Ilse said quietly.",
+    "The compass needle spun, hesitated, and pointed at the sealed door.",
+    "Rain hammered the copper roofs and ran in bright threads down the gutters.",
+    "Oren smiled as if he had expected exactly this mistake.",
+]
+
+
+def _prose(words, seed=0, paragraph_words=70):
+    """Deterministic filler prose of roughly the requested length, split into paragraphs."""
+    paragraphs, current, count, i = [], [], 0, seed
+    while count < words:
+        sentence = _FILLER_SENTENCES[i % len(_FILLER_SENTENCES)]
+        current.append(sentence)
+        count += len(sentence.split())
+        i += 1
+        if sum(len(s.split()) for s in current) >= paragraph_words:
+            paragraphs.append(" ".join(current))
+            current = []
+    if current:
+        paragraphs.append(" ".join(current))
+    return "\n\n".join(paragraphs)
+
+
+def _requested_chapters(text, pattern, default):
+    match = re.search(pattern, text, re.IGNORECASE)
+    return int(match.group(1)) if match else default
+
+
+# --- Canned responses, one builder per prompt family ---
+
+def _character_profiles(text, config):
+    blocks = []
+    for name, role, description in CAST:
+        blocks.append(
+            f"CHARACTER NAME: {name}\nROLE: {role}\nDESCRIPTION: {description}\n"
+            f"MOTIVATION: To keep {WORLD_NAME} from forgetting itself.\n"
+            f"INITIAL_ARC_SUMMARY: Learns that some things must be allowed to fade.\n"
+            f"FLAWS: Stubborn, secretive.\nSTRENGTHS: Patient, observant."
+        )
+    return "\n\n".join(blocks) + "\n"
+
+
+def _world_details(text, config):
+    return (f"WORLD NAME: {WORLD_NAME}\n"
+            "ATMOSPHERE/TONE: Melancholy, fog-bound, quietly uncanny.\n"
+            "KEY LOCATIONS:\n1. The Drowned Archive: Where forgotten streets are filed.\n"
+            "2. The Eastern Wall: The last fixed point in the city.\n3. The Ferry Docks: Where Ilse waits.\n"
+            "CULTURAL ELEMENTS:\n1. Memory tithes paid at every new moon.\n2. Maps are illegal without a seal.\n"
+            "KEY RULES/LAWS:\n1. Whatever is unmapped for a year disappears.\n2. The archive may not be entered at night.\n")
+
+
+def _themes_motifs(text, config):
+    return ("CORE THEMES:\n1. Memory and Loss: What a city owes the people it forgets.\n"
+            "2. Control vs. Freedom: Who decides what is remembered.\n"
+            "RECURRING MOTIFS:\n1. Fading ink.\n2. The unpulled bell.\n3. The spinning compass.\n")
+
+
+def _novel_outline(text, config):
+    outline = _prose(config.scene_words // 2)
+    return f"Act I\n{outline}\n\nAct II\n{outline}\n\nAct III\n{outline}\n\nSUGGESTED_CHAPTER_COUNT: {config.chapters}\n"
+
+
+def _novel_chapter_plans(text, config):
+    chapters = _requested_chapters(text, r"Total Chapters to Plan:\s*(\d+)", config.chapters)
+    names = ", ".join(name for name, _, _ in CAST[:2])
+    blocks = []
+    for n in range(1, chapters + 1):
+        scenes = "\n".join(
+            f"- Scene {s}: Mara follows a new lead through the fog, Location: The Drowned Archive, "
+            f"Characters Involved: {names}, Key Revelation/Turning Point/Outcome: A map of chapter {n} changes."
+            for s in range(1, 4))
+        blocks.append(
+            f"Chapter {n} - The Fading Map, Part {n}\n"
+            f"1. CHAPTER GOAL: Mara pushes the investigation forward and pays a price for it in chapter {n}.\n"
+            f"2. KEY SCENES:\n{scenes}\n"
+            f"3. CHARACTER DEVELOPMENT FOCUS: Mara Vell: Learns to trust Ilse Varn a little more.\n"
+            f"4. PLOT ADVANCEMENT: The archive's secret moves one step closer to the surface.\n"
+            f"5. TIMELINE & PACING: One night, building tension.\n"
+            f"6. EMOTIONAL TONE (End of Chapter): Tense and wary.\n"
+            f"7. CONNECTION TO NEXT CHAPTER: The bell rings again, and Mara goes to find out why.\n")
+    return "\n".join(blocks)
+
+
+def _novel_chapter_plans_json(text, config):
+    match = re.search(r"Plan exactly these chapters:\s*([\d,\s]+)", text)
+    numbers = [int(n) for n in re.findall(r"\d+", match.group(1))] if match else list(range(1, config.chapters + 1))
+    names = ", ".join(name for name, _, _ in CAST[:2])
+    chapters = [{
+        "number": n,
+        "title": f"The Fading Map, Part {n}",
+        "goal": f"Mara pushes the investigation forward and pays a price for it in chapter {n}.",
+        "scenes": [f"Scene {s}: Mara follows a new lead through the fog, Location: The Drowned Archive, "
+                   f"Characters Involved: {names}, Key Revelation/Turning Point/Outcome: A map of chapter {n} changes."
+                   for s in range(1, 4)],
+        "character_development": "Mara Vell: Learns to trust Ilse Varn a little more.",
+        "plot_advancement": "The archive's secret moves one step closer to the surface.",
+        "timeline_pacing": "One night, building tension.",
+        "emotional_tone_end": "Tense and wary.",
+        "connection_to_next": "The bell rings again, and Mara goes to find out why.",
+    } for n in numbers]
+    return json.dumps({"chapters": chapters}, indent=1)
+
+
+def _novel_character_updates(text, config):
+    return "\n".join(
+        f"CHARACTER NAME: {name}\n- STATUS CHANGE: Remains alive, more determined.\n"
+        f"- LOCATION AT END OF CHAPTER: The Ferry Docks\n- EMOTIONAL STATE AT END OF CHAPTER: Wary\n"
+        f"- KEY DEVELOPMENT/ACTION: Found another missing street.\n- RELATIONSHIP CHANGES: No change\n"
+        f"- NEW KNOWLEDGE/SECRETS ACQUIRED: The bell rings for the forgotten.\n"
+        for name, _, _ in CAST)
+
+
+def _novel_timeline(text, config):
+    return "ELAPSED: One night\nEND_TIME: Just before dawn\nMARKERS: The bell at midnight\n"
+
+
+def _transition_smooth(text, config):
+    return "TRANSITION: SMOOTH"
+
+
+def _word_smooth(text, config):
+    return "SMOOTH"
+
+
+def _consistent(text, config):
+    return "CONSISTENT"
+
+
+def _title(text, config):
+    return "The Cartographer of Forgotten Streets"
+
+
+def _book_outline(text, config):
+    chapters = _requested_chapters(text, r"story outline for a (\d+)-chapter", config.chapters)
+    parts = [f"Chapter {n}: The Fading Map, Part {n}\n- Mara follows the lead.\n- The archive answers."
+             for n in range(1, chapters + 1)]
+    cast = "\n".join(f"{name}: {description}" for name, _, description in CAST)
+    return ("\n\n".join(parts) + f"\n\nWORLD BUILDING\n1. The Kingdom of {WORLD_NAME}, a fog-bound harbor city.\n"
+            f"\nCHARACTERS\n{cast}\n\nRECURRING MOTIFS\n- Fading ink\n- The unpulled bell\n")
+
+
+def _book_character_guide(text, config):
+    return "\n".join(f"{name}: {role}. {description}" for name, role, description in CAST) + "\n"
+
+
+def _book_character_tracking(text, config):
+    match = re.search(r"CHARACTERS TO TRACK:\s*(.*)", text)
+    names = [n.strip() for n in match.group(1).split(",")] if match else [name for name, _, _ in CAST]
+    return "\n".join(f"{name}: alive|searched the archive|more determined|trusts Ilse more|wary" for name in names if name) + "\n"
+
+
+def _book_world_name(text, config):
+    return WORLD_NAME
+
+
+def _book_motifs(text, config):
+    return "- Fading ink\n- The unpulled bell\n- The spinning compass\n"
+
+
+def _book_chapter_plan(text, config):
+    chapters = _requested_chapters(text, r"For EACH chapter \(1 through (\d+)\)", config.chapters)
+    return "\n\n".join(f"Chapter {n}: The Fading Map, Part {n}\n{_prose(120, seed=n)}" for n in range(1, chapters + 1))
+
+
+def _book_plan_extract(text, config):
+    n = _requested_chapters(text, r"extract ONLY the plan\s+for Chapter (\d+)", 1)
+    return f"Chapter {n}: The Fading Map, Part {n}\n{_prose(120, seed=n)}"
+
+
+def _book_chapter(text, config):
+    n = _requested_chapters(text, r"Write Chapter (\d+) of a", 1)
+    return f"## Chapter {n}: The Fading Map, Part {n}\n\n{_prose(config.scene_words * 4, seed=n)}"
+
+
+def _book_timeline(text, config):
+    return "TIME_ELAPSED: One night\nEND_TIME: Just before dawn\nTIME_MARKERS: The bell at midnight\n"
+
+
+def _book_emotion(text, config):
+    return "EMOTION: Wary resolve\nTENSION: 6\nUNRESOLVED: Who rings the bell\n"
+
+
+def _pipeline_themes(text, config):
+    return "1. Memory and Loss: What a city owes the people it forgets.\n2. Control vs. Freedom: Who decides what is remembered.\n"
+
+
+def _pipeline_chapters(text, config):
+    return "\n".join(f"Chapter {n}: Mara follows the fading map one street further, part {n}." for n in range(1, config.chapters + 1))
+
+
+def _pipeline_events(text, config):
+    return "\n".join(f"{i}. {sentence}" for i, sentence in enumerate(_FILLER_SENTENCES[:5], 1))
+
+
+def _pipeline_attributes(text, config):
+    return "fading maps, an unreliable archive, a bell no one rings, tidal streets, memory tithes"
+
+
+def _pipeline_refinement(text, config):
+    match = re.search(r"<DRAFT_START>(.*?)</DRAFT_END>", text, re.DOTALL)
+    return match.group(1).strip() if match else _prose(config.scene_words)
+
+
+def _summary(text, config):
+    return _prose(max(40, config.scene_words // 3))
+
+
+def _prose_response(text, config):
+    return _prose(config.scene_words, seed=len(text) % len(_FILLER_SENTENCES))
+
+
+# Checked in order; the first marker found in the prompt decides the family.
+# More specific markers come first (e.g. the chapter-plan prompt embeds the outline).
+PROMPT_FAMILIES = [
+    ("transition_check", re.compile(r"respond ONLY with the exact text:\s*TRANSITION: SMOOTH"), _transition_smooth),
+    ("transition_check", re.compile(r'respond ONLY with the word "SMOOTH"'), _word_smooth),
+    ("consistency_check", re.compile(r'respond ONLY with the word "CONSISTENT"'), _consistent),
+    ("character_profiles", re.compile(r"CHARACTER NAME: \[Suggest a fitting name\]"), _character_profiles),
+    ("character_updates", re.compile(r"STATUS CHANGE: \[e\.g\."), _novel_character_updates),
+    ("chapter_plans", re.compile(r"Total Chapters to Plan:"), _novel_chapter_plans),
+    ("chapter_plans", re.compile(r"Plan exactly these chapters:"), _novel_chapter_plans_json),
+    ("world", re.compile(r"WORLD NAME: \[A unique"), _world_details),
+    ("themes", re.compile(r"CORE THEMES \(2-4\)"), _themes_motifs),
+    ("outline", re.compile(r"SUGGESTED_CHAPTER_COUNT: \[Number\]"), _novel_outline),
+    ("timeline", re.compile(r"ELAPSED: \[answer\]"), _novel_timeline),
+    ("title", re.compile(r"Return ONLY the generated title|Respond with ONLY the book title"), _title),
+    ("chapter_prose", re.compile(r"Write Chapter \d+ of a"), _book_chapter),
+    ("plan_extract", re.compile(r"extract ONLY the plan\s+for Chapter \d+"), _book_plan_extract),
+    ("chapter_plans", re.compile(r"create a VERY detailed chapter-by-chapter plan"), _book_chapter_plan),
+    ("outline", re.compile(r"create a detailed story outline for a \d+-chapter"), _book_outline),
+    ("character_profiles", re.compile(r"create a detailed character guide"), _book_character_guide),
+    ("character_updates", re.compile(r"status\|actions/decisions\|development"), _book_character_tracking),
+    ("world", re.compile(r"Reply with ONLY the world name"), _book_world_name),
+    ("motifs", re.compile(r"identify 3-5 recurring motifs"), _book_motifs),
+    ("timeline", re.compile(r"TIME_ELAPSED: \[estimated"), _book_timeline),
+    ("emotion", re.compile(r"TENSION: \[level 1-10\]"), _book_emotion),
+    ("themes", re.compile(r"identify 2-4 central themes"), _pipeline_themes),
+    ("chapter_plans", re.compile(r"Chapters List \(Strict Format"), _pipeline_chapters),
+    ("events", re.compile(r"Numbered Event List for Chapter"), _pipeline_events),
+    ("attributes", re.compile(r"List of Attributes \(comma-separated\)"), _pipeline_attributes),
+    ("refinement", re.compile(r"<DRAFT_START>"), _pipeline_refinement),
+    ("summary", re.compile(r"Detailed Summary of Chapter|Create a detailed summary of the following chapter"), _summary),
+]
+
+
+def classify_prompt(text):
+    """Returns (family, builder) for a prompt; anything unrecognized is answered with scene prose."""
+    for family, marker, builder in PROMPT_FAMILIES:
+        if marker.search(text):
+            return family, builder
+    return "prose", _prose_response
+
+
+class MockOllamaConfig:
+    """Knobs for the mock server; can be changed while it is running."""
+
+    def __init__(self, latency=MOCK_LATENCY_SECONDS, tokens_per_sec=MOCK_TOKENS_PER_SEC,
+                 chapters=MOCK_CHAPTERS, scene_words=MOCK_SCENE_WORDS, models=MOCK_MODELS,
+                 load_seconds=MOCK_LOAD_SECONDS, loaded_models=(), num_parallel=MOCK_NUM_PARALLEL,
+                 max_queue=MOCK_MAX_QUEUE):
+        self.latency = latency
+        self.tokens_per_sec = tokens_per_sec
+        self.chapters = chapters
+        self.scene_words = scene_words
+        self.models = list(models)
+        self.load_seconds = load_seconds
+        self.loaded_models = list(loaded_models) # Resident at startup, as listed by /api/ps
+        self.num_parallel = num_parallel # Read when the server starts
+        self.max_queue = max_queue
+
+
+class MockOllamaStats:
+    """Thread-safe record of every request the mock served."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.intervals = [] # (start, end) perf_counter times of each generation request
+            self.families = Counter()
+            self.prompt_tokens = 0
+            self.eval_tokens = 0
+            self.rejected = 0 # 503s for a full queue
+
+    def record(self, family, start, end, prompt_tokens, eval_tokens):
+        with self._lock:
+            self.intervals.append((start, end))
+            self.families[family] += 1
+            self.prompt_tokens += prompt_tokens
+            self.eval_tokens += eval_tokens
+
+    def record_rejected(self):
+        with self._lock:
+            self.rejected += 1
+
+    @property
+    def requests(self):
+        return len(self.intervals)
+
+    def busy_seconds(self, start=float("-inf"), end=float("inf"), also=()):
+        """Seconds within [start, end] during which at least one request (or one of the `also` intervals) was in flight."""
+        with self._lock:
+            intervals = self.intervals + list(also)
+        clipped = sorted((max(s, start), min(e, end)) for s, e in intervals if e > start and s < end)
+        busy, current_start, current_end = 0.0, None, None
+        for s, e in clipped:
+            if current_end is None or s > current_end:
+                if current_end is not None:
+                    busy += current_end - current_start
+                current_start, current_end = s, e
+            else:
+                current_end = max(current_end, e)
+        if current_end is not None:
+            busy += current_end - current_start
+        return busy
+
+
+def _count_tokens(text):
+    return len(text.split())
+
+
+class _MockOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # Keep-alive, like the real server, so pooled clients reuse connections
+    disable_nagle_algorithm = True # Headers and body are separate writes; avoid delayed-ACK stalls on loopback
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, data, status=200):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json({"models": [{"name": name, "model": name, "size": 0} for name in self.server.config.models]})
+        elif self.path == "/api/ps":
+            with self.server.loaded_lock:
+                loaded = sorted(self.server.loaded_models)
+            self._send_json({"models": [{"name": name, "model": name, "size": 0} for name in loaded]})
+        elif self.path == "/api/version":
+            self._send_json({"version": "0.0.0-mock"})
+        elif self.path == "/":
+            self._send_json({"status": "Ollama is running"})
+        else:
+            self._send_json({"error": f"unknown endpoint {self.path}"}, status=404)
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send_json({"error": "invalid JSON body"}, status=400)
+            return
+
+        if self.path == "/api/show":
+            self._send_json({"modelfile": "", "parameters": "", "details": {"family": "mock"}, "model_info": {}})
+        elif self.path in ("/api/generate", "/api/chat"):
+            if not self._enter_slot():
+                self.server.stats.record_rejected()
+                self._send_json({"error": "server busy, please try again.  maximum pending requests exceeded"}, status=503)
+                return
+            try:
+                self._generate(payload, chat=self.path == "/api/chat")
+            finally:
+                if self.server.slots is not None:
+                    self.server.slots.release()
+        else:
+            self._send_json({"error": f"unknown endpoint {self.path}"}, status=404)
+
+    def _enter_slot(self):
+        """Waits for a generation slot; False when the queue is full, as Ollama rejects with a 503."""
+        server = self.server
+        if server.slots is None or server.slots.acquire(blocking=False):
+            return True
+        with server.queue_lock:
+            if server.config.max_queue and server.queued >= server.config.max_queue:
+                return False
+            server.queued += 1
+        server.slots.acquire()
+        with server.queue_lock:
+            server.queued -= 1
+        return True
+
+    def _generate(self, payload, chat):
+        server = self.server
+        config = server.config
+        start = time.perf_counter()
+
+        if chat:
+            messages = payload.get("messages", [])
+            prompt_text = "\n".join(m.get("content", "") for m in messages)
+            user_text = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), prompt_text)
+        else:
+            prompt_text = (payload.get("system") or "") + "\n" + payload.get("prompt", "")
+            user_text = payload.get("prompt", "")
+        family, builder = classify_prompt(user_text)
+        if family == "prose" and user_text != prompt_text:
+            family, builder = classify_prompt(prompt_text)
+        response_text = builder(prompt_text, config)
+
+        prompt_tokens = _count_tokens(prompt_text)
+        words = re.findall(r"\S+\s*", response_text) or [""]
+        per_token = 1.0 / config.tokens_per_sec if config.tokens_per_sec > 0 else 0.0
+        model = payload.get("model", "mock:latest")
+
+        def chunk_body(text, done):
+            body = {"model": model, "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), "done": done}
+            if chat:
+                body["message"] = {"role": "assistant", "content": text}
+            else:
+                body["response"] = text
+            return body
+
+        def final_counters(body, generation_seconds):
+            body.update({
+                "done_reason": "stop",
+                "total_duration": int((time.perf_counter() - start) * 1e9),
+                "load_duration": 0,
+                "prompt_eval_count": prompt_tokens,
+                "prompt_eval_duration": int(config.latency * 1e9),
+                "eval_count": len(words),
+                "eval_duration": int(generation_seconds * 1e9),
+            })
+            return body
+
+        with server.loaded_lock:
+            needs_load = model not in server.loaded_models
+            server.loaded_models.add(model)
+        time.sleep(config.latency + (config.load_seconds if needs_load else 0.0))
+        generation_start = time.perf_counter()
+        if payload.get("stream", True):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                for i in range(0, len(words), MOCK_STREAM_CHUNK_TOKENS):
+                    piece = words[i:i + MOCK_STREAM_CHUNK_TOKENS]
+                    if per_token:
+                        time.sleep(per_token * len(piece))
+                    self._write_chunk(chunk_body("".join(piece), done=False))
+                self._write_chunk(final_counters(chunk_body("", done=True), time.perf_counter() - generation_start))
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                pass # Client stopped reading (e.g. a stop pattern matched), as with the real server
+        else:
+            if per_token:
+                time.sleep(per_token * len(words))
+            self._send_json(final_counters(chunk_body(response_text, done=True), time.perf_counter() - generation_start))
+
+        server.stats.record(family, start, time.perf_counter(), prompt_tokens, len(words))
+
+    def _write_chunk(self, data):
+        line = (json.dumps(data) + "\n").encode("utf-8")
+        self.wfile.write(f"{len(line):X}\r\n".encode("ascii") + line + b"\r\n")
+        self.wfile.flush()
+
+
+class MockOllamaServer:
+    """
+    Local stand-in for the Ollama REST API, for benchmarks and offline runs.
+
+    Serves /api/generate and /api/chat (streaming NDJSON and non-streaming, with
+    the same eval counters Ollama reports) plus the small metadata endpoints the
+    client libraries probe; /api/ps lists every model requested so far. With
+    num_parallel set, extra generations wait for a slot, and past max_queue
+    waiting ones they are rejected with a 503 as Ollama does.
+
+    Each prompt is matched to the family of prompt this repo sends (character
+    profiles, world, outlines, chapter plans, scene prose, continuity updates,
+    transition checks, ...) and answered with a canned
+    response in the format that family's parser expects, after an artificial
+    prefill latency and at an artificial tokens/sec rate.
+    """
+
+    def __init__(self, host=MOCK_OLLAMA_HOST, port=MOCK_OLLAMA_PORT, config=None):
+        self.config = config or MockOllamaConfig()
+        self.stats = MockOllamaStats()
+        self._httpd = ThreadingHTTPServer((host, port), _MockOllamaHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.config = self.config
+        self._httpd.stats = self.stats
+        self._httpd.loaded_models = set(self.config.loaded_models)
+        self._httpd.loaded_lock = threading.Lock()
+        self._httpd.slots = threading.Semaphore(self.config.num_parallel) if self.config.num_parallel else None
+        self._httpd.queued = 0
+        self._httpd.queue_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def generate_url(self):
+        return self.base_url + "/api/generate"
+
+    @property
+    def chat_url(self):
+        return self.base_url + "/api/chat"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="mock-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a mock Ollama server that returns canned, format-correct responses.")
+    parser.add_argument("--host", default=MOCK_OLLAMA_HOST)
+    parser.add_argument("--port", type=int, default=MOCK_OLLAMA_PORT)
+    parser.add_argument("--latency", type=float, default=MOCK_LATENCY_SECONDS, help="Seconds before the first token.")
+    parser.add_argument("--tokens-per-sec", type=float, default=MOCK_TOKENS_PER_SEC, help="Generation speed (0 = instant).")
+    parser.add_argument("--chapters", type=int, default=MOCK_CHAPTERS, help="Chapters in generated outlines and plans.")
+    parser.add_argument("--scene-words", type=int, default=MOCK_SCENE_WORDS, help="Words of prose per scene response.")
+    parser.add_argument("--models", nargs="+", default=list(MOCK_MODELS), help="Models listed by /api/tags.")
+    parser.add_argument("--load-seconds", type=float, default=MOCK_LOAD_SECONDS, help="Delay on a model's first request.")
+    parser.add_argument("--num-parallel", type=int, default=MOCK_NUM_PARALLEL, help="Generations served at once (0 = unlimited).")
+    parser.add_argument("--max-queue", type=int, default=MOCK_MAX_QUEUE, help="Waiting requests before 503s (0 = unlimited).")
+    args = parser.parse_args()
+
+    config = MockOllamaConfig(args.latency, args.tokens_per_sec, args.chapters, args.scene_words, args.models, args.load_seconds,
+                              num_parallel=args.num_parallel, max_queue=args.max_queue)
+    server = MockOllamaServer(args.host, args.port, config)
+    print(f"Mock Ollama listening on {server.base_url} (latency {config.latency}s, {config.tokens_per_sec} tokens/s). Ctrl+C to stop.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopping mock Ollama.")
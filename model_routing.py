@@ -0,0 +1,85 @@
+import os
+from urllib.parse import urlsplit
+
+import requests
+
+from ollama_client import get_client
+
+# --- Configuration ---
+# Fast model for mechanical calls (summaries, extraction, analysis), e.g. "gemma3:4b"; empty = send everything to the main model
+OLLAMA_SMALL_MODEL = os.getenv("OLLAMA_SMALL_MODEL", "")
+OLLAMA_TAGS_TIMEOUT = 5 # Seconds for the /api/tags check of the small model
+DEFAULT_MODEL_TIER = "large" # Tier of call kinds missing from the table
+# Model tier of each call kind, i.e. the telemetry stage a call is tagged with.
+# Prose and story design stay on the main model; bookkeeping goes to the small one.
+MODEL_TIER_BY_STAGE = {
+    "foundation": "large",
+    "plan": "large",
+    "opener": "large",
+    "scene": "large",
+    "hook": "large",
+    "prose": "large",
+    "revision": "large",
+    "editor": "large", # Its feedback drives the revision, so it gets the stronger reader
+    "continuity": "small",
+    "summary": "small",
+    "character-state": "small",
+    "flow-analysis": "small",
+    "transition-check": "small",
+    "extraction": "small",
+    "title": "small",
+}
+# Per-run overrides without editing the table, e.g. "title=large,continuity=large"
+OLLAMA_MODEL_TIERS_ENV = "OLLAMA_MODEL_TIERS"
+
+
+def _tier_overrides(spec):
+    overrides = {}
+    for item in spec.split(","):
+        stage, _, tier = item.partition("=")
+        if stage.strip() and tier.strip():
+            overrides[stage.strip()] = tier.strip()
+    return overrides
+
+
+_TIER_OVERRIDES = _tier_overrides(os.getenv(OLLAMA_MODEL_TIERS_ENV, ""))
+
+
+def tier_for(stage):
+    """The model tier ("large" or "small") a call kind is routed to."""
+    return _TIER_OVERRIDES.get(stage) or MODEL_TIER_BY_STAGE.get(stage, DEFAULT_MODEL_TIER)
+
+
+def effective_tier(model, large_model):
+    """The tier a call actually ran on, for telemetry: "small" only when it was routed off the main model."""
+    return "small" if model != large_model else "large"
+
+
+def model_for(stage, large_model, small_model=None):
+    """The model a call kind uses: small_model for "small" stages when one is configured, else large_model."""
+    if small_model and tier_for(stage) == "small":
+        return small_model
+    return large_model
+
+
+def available_small_model(small_model, ollama_url):
+    """
+    small_model if the Ollama server at ollama_url (any URL on it) has it pulled, else "" with a
+    warning, so its calls go to the main model instead of failing with 404s. Kept as is when
+    /api/tags cannot be read.
+    """
+    if not small_model:
+        return ""
+    parts = urlsplit(ollama_url)
+    try:
+        response = get_client().session.get(f"{parts.scheme}://{parts.netloc}/api/tags", timeout=OLLAMA_TAGS_TIMEOUT)
+        response.raise_for_status()
+        pulled = {m.get("name") or m.get("model", "") for m in response.json().get("models", [])}
+    except (requests.exceptions.RequestException, ValueError):
+        return small_model
+    key = small_model if ":" in small_model else f"{small_model}:latest" # Ollama lists "llama3" as "llama3:latest"
+    if key in pulled or small_model in pulled:
+        return small_model
+    print(f"WARNING: Small model '{small_model}' is not pulled on {parts.netloc} (run 'ollama pull {small_model}'); "
+          f"extraction/analysis calls go to the main model.")
+    return ""
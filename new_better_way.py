@@ -3,6 +3,13 @@ import json
 import time
 import os
 import re
+from concurrent.futures import ThreadPoolExecutor
+
+from ollama_client import get_client
+from passage_index import PassageIndex
+from llm_telemetry import LLMTelemetry, call_metrics
+
+OUTPUT_DIR = "generated_book_output" # The book, its metadata and the LLM call trace
 
 
 class BookGenerator:
@@ -24,6 +31,15 @@ class BookGenerator:
         self.emotional_arc = {}  # Track emotional tone in chapters
         self.transitions = {}  # Store generated transitions between chapters
         self.recurring_motifs = []  # Track recurring motifs or symbols for continuity
+        # Max concurrent requests for independent analyses; match the server's OLLAMA_NUM_PARALLEL
+        self.max_parallel_requests = max(1, int(os.getenv("OLLAMA_NUM_PARALLEL", "4")))
+        self.passage_index = PassageIndex()  # Chunks of finished chapters, searched for long-range continuity
+        self.relevant_passages_k = 3  # Passages retrieved per chapter from beyond the recent-summary window
+        self.output_dir = OUTPUT_DIR
+        os.makedirs(self.output_dir, exist_ok=True)
+        # Per-call Ollama counters by stage
+        self.telemetry = LLMTelemetry(os.path.join(self.output_dir, f"llm_calls_{time.strftime('%Y%m%d_%H%M%S')}.jsonl"))
+        get_client().add_concurrency_listener(self.telemetry.record_concurrency) # Adaptive limit changes land in the trace
 
     def get_user_input(self):
         """Get the story premise, genre, and number of chapters from the user"""
@@ -50,8 +66,8 @@ STORY INPUT: One paragraph up to 830 characters with your plot idea
             except ValueError:
                 print("Please enter a valid number.")
 
-    def generate_text(self, prompt, system_prompt="You are a creative fiction writer."):
-        """Make API call to Ollama with the given prompt"""
+    def generate_text(self, prompt, system_prompt="You are a creative fiction writer.", stage="other"):
+        """Make API call to Ollama with the given prompt, recording its counters under stage"""
         data = {
             "model": self.model,
             "prompt": prompt,
@@ -60,10 +76,12 @@ STORY INPUT: One paragraph up to 830 characters with your plot idea
         }
 
         try:
-            response = requests.post(self.base_url, json=data)
+            call_start = time.time()
+            response = get_client().post(self.base_url, json=data)
             response.raise_for_status()
             # Basic check for empty or error response from the model itself
             response_data = response.json()
+            self.telemetry.record(stage, call_metrics(response_data), time.time() - call_start, self.model)
             if "response" not in response_data or not response_data["response"]:
                  print(f"Warning: Received empty response from model for prompt:\n---\n{prompt[:200]}...\n---")
                  return None # Return None for empty response
@@ -217,7 +235,7 @@ For the climax chapters (chapters {self.num_chapters-2} and {self.num_chapters-1
 Make sure all character names, settings, and plot elements remain 100% consistent throughout.
 """
         print("Generating detailed story outline...")
-        self.story_outline = self.generate_text(prompt, system_prompt)
+        self.story_outline = self.generate_text(prompt, system_prompt, stage="foundation")
         if not self.story_outline:
              print("Error: Failed to generate story outline. Cannot proceed.")
              return # Stop if outline generation fails
@@ -235,7 +253,7 @@ CHARACTER NAME: Brief description, role in story, key personality traits, motiva
 Include EVERY character mentioned in the outline, even minor ones. Ensure names are spelled consistently.
 """
         print("Creating detailed character profiles...")
-        character_text = self.generate_text(char_prompt, char_system_prompt)
+        character_text = self.generate_text(char_prompt, char_system_prompt, stage="foundation")
         self.characters = self.extract_characters(character_text)
         if not self.characters:
             print("Warning: Character extraction yielded no results. Proceeding without pre-defined characters.")
@@ -256,7 +274,7 @@ Include EVERY character mentioned in the outline, even minor ones. Ensure names
 The name should be a single term (or a short phrase like 'City of X'), creative, and fitting the tone and genre ({self.genre}) of the story.
 Reply with ONLY the world name, nothing else.
 """
-            generated_world_name = self.generate_text(world_prompt, world_system_prompt)
+            generated_world_name = self.generate_text(world_prompt, world_system_prompt, stage="foundation")
             if generated_world_name:
                  # Clean up potential extra text from the response
                  self.world_name = generated_world_name.strip().split('\n')[0]
@@ -276,7 +294,7 @@ Format as a simple list of items, one per line.
 These should be concrete objects, symbols, or phrases relevant to the {self.genre} genre that can recur throughout chapters.
 """
         print("Identifying recurring motifs...")
-        motifs_text = self.generate_text(motif_prompt, motif_system_prompt)
+        motifs_text = self.generate_text(motif_prompt, motif_system_prompt, stage="foundation")
         if motifs_text:
             # Filter empty lines and clean up potential bullet points/numbering
             self.recurring_motifs = [re.sub(r"^\s*[-\*\d]+\.?\s*", "", motif).strip()
@@ -310,7 +328,7 @@ For EACH chapter (1 through {self.num_chapters}), provide:
 Be extremely specific and detailed, adhering to the {self.genre} conventions. This plan will be used to ensure narrative consistency.
 """
         print("Creating detailed chapter plan...")
-        self.chapter_plan = self.generate_text(chapter_plan_prompt, plan_system_prompt)
+        self.chapter_plan = self.generate_text(chapter_plan_prompt, plan_system_prompt, stage="plan")
         if not self.chapter_plan:
              print("Error: Failed to generate chapter plan. Book generation quality may be affected.")
 
@@ -338,7 +356,7 @@ CHAPTER CONTENT:
 
 Your summary should be comprehensive enough that another writer could use it to maintain perfect continuity for this {self.genre} story.
 """
-        summary = self.generate_text(prompt, system_prompt)
+        summary = self.generate_text(prompt, system_prompt, stage="continuity")
         if summary:
             self.chapter_summaries[chapter_num] = summary
         else:
@@ -374,7 +392,7 @@ CHARACTER NAME: status|actions/decisions|development|relationships|emotional_sta
 Only include characters who actually appear or are directly impacted in this chapter. Be concise but informative.
 If a character appears but has no significant changes in these areas, note that briefly (e.g., "CHARACTER NAME: present|no major changes|...").
 """
-        character_updates = self.generate_text(prompt, system_prompt)
+        character_updates = self.generate_text(prompt, system_prompt, stage="continuity")
 
         if not character_updates:
             print(f"Warning: No character updates received or generated for Chapter {chapter_num}.")
@@ -457,7 +475,7 @@ If a character appears but has no significant changes in these areas, note that
         TIME_MARKERS: [list any specific markers mentioned, separated by commas]
         """
 
-        time_info = self.generate_text(prompt, system_prompt)
+        time_info = self.generate_text(prompt, system_prompt, stage="continuity")
         if time_info:
             self.timeline[chapter_num] = time_info.strip()
         else:
@@ -487,7 +505,7 @@ If a character appears but has no significant changes in these areas, note that
         UNRESOLVED: [main unresolved question or conflict]
         """
 
-        emotional_status = self.generate_text(prompt, system_prompt)
+        emotional_status = self.generate_text(prompt, system_prompt, stage="continuity")
         if emotional_status:
             self.emotional_arc[chapter_num] = emotional_status.strip()
         else:
@@ -495,6 +513,27 @@ If a character appears but has no significant changes in these areas, note that
             self.emotional_arc[chapter_num] = "EMOTION: Unknown\nTENSION: Unknown\nUNRESOLVED: Unknown"
         return self.emotional_arc[chapter_num]
 
+    def run_post_chapter_analyses(self, chapter_num, chapter_content):
+        """Run the independent post-chapter analyses (summary, characters, timeline, emotional arc) concurrently"""
+        # Each analysis is its own LLM call and writes to a separate store (chapter_summaries,
+        # characters, timeline, emotional_arc), so they can overlap without changing the result.
+        analyses = [
+            ("detailed summary", self.create_chapter_summary),
+            ("character tracking", self.update_character_tracking),
+            ("timeline information", self.update_timeline),
+            ("emotional arc", self.track_emotional_arc),
+        ]
+        print(f"Running {len(analyses)} post-chapter analyses for Chapter {chapter_num} (up to {self.max_parallel_requests} in parallel)...")
+        start_time = time.time()
+        with ThreadPoolExecutor(max_workers=min(self.max_parallel_requests, len(analyses))) as executor:
+            futures = [(label, executor.submit(analysis, chapter_num, chapter_content)) for label, analysis in analyses]
+            for label, future in futures: # Collected in a fixed order
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"Warning: Post-chapter analysis '{label}' failed for Chapter {chapter_num}: {e}")
+        print(f"Post-chapter analyses for Chapter {chapter_num} finished in {time.time() - start_time:.1f}s.")
+
     def create_chapter_transition(self, chapter_num, chapter_content):
         """Create a transition from current chapter to the next"""
         if chapter_num >= self.num_chapters or not chapter_content:
@@ -512,7 +551,7 @@ If a character appears but has no significant changes in these areas, note that
 
         Include ONLY Chapter {chapter_num + 1}'s detailed plan (title, summary, scenes, etc.).
         """
-        next_chapter_plan = self.generate_text(plan_extract_prompt)
+        next_chapter_plan = self.generate_text(plan_extract_prompt, stage="plan")
         if not next_chapter_plan:
              print(f"Warning: Could not extract plan for Chapter {chapter_num + 1} for transition generation.")
              next_chapter_plan = "[Next chapter plan not available]"
@@ -562,7 +601,7 @@ If a character appears but has no significant changes in these areas, note that
         Do not add any extra commentary.
         """
 
-        transition = self.generate_text(prompt, system_prompt)
+        transition = self.generate_text(prompt, system_prompt, stage="hook")
         if transition:
             self.transitions[chapter_num] = transition.strip()
             return self.transitions[chapter_num]
@@ -607,7 +646,7 @@ If a character appears but has no significant changes in these areas, note that
 
         Include ONLY Chapter {chapter_num}'s detailed plan (title, summary, scenes, etc.).
         """
-        this_chapter_plan = self.generate_text(plan_extract_prompt)
+        this_chapter_plan = self.generate_text(plan_extract_prompt, stage="plan")
         if not this_chapter_plan:
              print(f"Warning: Could not extract plan for Chapter {chapter_num} for opener generation.")
              this_chapter_plan = "[This chapter plan not available]"
@@ -642,7 +681,7 @@ If a character appears but has no significant changes in these areas, note that
         Do not add any extra commentary or the chapter title.
         """
 
-        opener = self.generate_text(prompt, system_prompt)
+        opener = self.generate_text(prompt, system_prompt, stage="opener")
         if opener:
             return opener.strip()
         else:
@@ -705,7 +744,7 @@ Your job is to identify and flag any inconsistencies in a narrative based ONLY o
 
         Include ONLY Chapter {chapter_num}'s detailed plan (title, summary, scenes, etc.).
         """
-        this_chapter_plan = self.generate_text(plan_extract_prompt)
+        this_chapter_plan = self.generate_text(plan_extract_prompt, stage="plan")
         if not this_chapter_plan:
              this_chapter_plan = "[Chapter plan not available for validation]"
 
@@ -743,7 +782,7 @@ Identify ANY specific inconsistencies between the CURRENT CHAPTER CONTENT and th
 List ONLY specific inconsistencies found. Be precise.
 If no inconsistencies are found based *solely* on the provided context, respond ONLY with the word "CONSISTENT".
 """
-        consistency_check = self.generate_text(prompt, system_prompt)
+        consistency_check = self.generate_text(prompt, system_prompt, stage="consistency")
 
         # Post-process the check result
         if not consistency_check:
@@ -799,7 +838,7 @@ You excel at seamlessly fixing narrative inconsistencies while preserving the co
 
         Include ONLY Chapter {chapter_num}'s detailed plan (title, summary, scenes, etc.).
         """
-        this_chapter_plan = self.generate_text(plan_extract_prompt)
+        this_chapter_plan = self.generate_text(plan_extract_prompt, stage="plan")
         if not this_chapter_plan:
              this_chapter_plan = "[Chapter plan not available for fix context]"
 
@@ -841,7 +880,7 @@ Guidelines for fixing:
 Rewrite the COMPLETE chapter, starting with the chapter title (e.g., "## Chapter {chapter_num}: [Original or Revised Title]"). Do not include any commentary before or after the rewritten chapter content.
 """
         print(f"Attempting to fix Chapter {chapter_num}...")
-        fixed_chapter = self.generate_text(prompt, system_prompt)
+        fixed_chapter = self.generate_text(prompt, system_prompt, stage="consistency-fix")
         # Basic validation of the fix
         if fixed_chapter and f"Chapter {chapter_num}" in fixed_chapter[:100]: # Check if it seems like a chapter
              # Optional: Run validation again on the fixed chapter? Could be slow.
@@ -922,12 +961,17 @@ and maintain perfect consistency with previously established elements."""
 
         Include ONLY Chapter {chapter_num}'s detailed plan (title, summary, scenes, character dev, plot adv, etc.).
         """
-        this_chapter_plan = self.generate_text(plan_extract_prompt)
+        this_chapter_plan = self.generate_text(plan_extract_prompt, stage="plan")
         if not this_chapter_plan:
              print(f"Critical Warning: Could not extract plan for Chapter {chapter_num}. Generation quality will be severely impacted.")
              this_chapter_plan = f"[PLAN MISSING FOR CHAPTER {chapter_num}] - Improvise based on outline and previous summaries."
 
 
+        # Retrieve passages from older chapters (not covered by the recent summaries) that relate to this chapter's plan
+        relevant_passages = self.passage_index.relevant_passages_text(
+            this_chapter_plan, k=self.relevant_passages_k, exclude_chapters=range(start_chapter, chapter_num))
+
+
         # Choose a recurring motif to include
         motif_instruction = ""
         if self.recurring_motifs:
@@ -955,6 +999,9 @@ CHARACTER CONTEXT (Status before this chapter):
 RECENT PREVIOUS CHAPTER SUMMARIES (Chapters {start_chapter}-{chapter_num-1}):
 {context}
 
+RELEVANT PASSAGES FROM EARLIER CHAPTERS (keep callbacks consistent with these):
+{relevant_passages if relevant_passages else "None."}
+
 TIMELINE CONTEXT:
 {timeline_context}
 
@@ -984,7 +1031,7 @@ Format the chapter with clear paragraph breaks and standard dialogue formatting
 Begin DIRECTLY with the chapter title (## Chapter X: Title). Do not add any introductory text.
 """
         print(f"Generating Chapter {chapter_num}...")
-        chapter_content = self.generate_text(prompt, system_prompt)
+        chapter_content = self.generate_text(prompt, system_prompt, stage="chapter")
 
         if not chapter_content or not re.match(rf"##\s*Chapter\s*{chapter_num}", chapter_content.strip()):
             print(f"Error: Failed to generate valid content for Chapter {chapter_num}.")
@@ -1021,17 +1068,7 @@ Begin DIRECTLY with the chapter title (## Chapter X: Title). Do not add any intr
 
 
         # Create summary and update tracking *after* potential fixes
-        print(f"Creating detailed summary for Chapter {chapter_num}...")
-        self.create_chapter_summary(chapter_num, chapter_content) # Use potentially fixed content
-
-        print(f"Updating character tracking for Chapter {chapter_num}...")
-        self.update_character_tracking(chapter_num, chapter_content) # Use potentially fixed content
-
-        print(f"Updating timeline information for Chapter {chapter_num}...")
-        self.update_timeline(chapter_num, chapter_content) # Use potentially fixed content
-
-        print(f"Analyzing emotional arc for Chapter {chapter_num}...")
-        self.track_emotional_arc(chapter_num, chapter_content) # Use potentially fixed content
+        self.run_post_chapter_analyses(chapter_num, chapter_content) # Use potentially fixed content
 
         # Add transition if not the last chapter
         if chapter_num < self.num_chapters:
@@ -1092,7 +1129,7 @@ Begin DIRECTLY with the chapter title (## Chapter X: Title). Do not add any intr
             Do NOT include the chapter title or any other commentary.
             """
 
-            transition_check_response = self.generate_text(prompt, system_prompt)
+            transition_check_response = self.generate_text(prompt, system_prompt, stage="transition-check")
 
             if transition_check_response and transition_check_response.strip().upper() == "SMOOTH":
                  print(f"Transition to Chapter {i+1} is smooth.")
@@ -1158,6 +1195,7 @@ Begin DIRECTLY with the chapter title (## Chapter X: Title). Do not add any intr
             chapter = self.generate_chapter(i)
             if chapter and f"Chapter {i}" in chapter[:100]: # Basic check for valid chapter
                 self.chapters.append(chapter)
+                self.passage_index.add_chapter(i, chapter)
                 chapter_end_time = time.time()
                 print(f"--- Chapter {i} generated in {chapter_end_time - chapter_start_time:.2f} seconds ---")
             else:
@@ -1178,6 +1216,7 @@ Begin DIRECTLY with the chapter title (## Chapter X: Title). Do not add any intr
 
         end_time = time.time()
         print(f"\n--- Book generation complete in {end_time - start_time:.2f} seconds ---")
+        self.telemetry.print_summary()
         return self.compile_book()
 
     def compile_book(self):
@@ -1195,7 +1234,7 @@ Respond with ONLY the book title, nothing else. Make it appropriate for the {sel
 """
         # Use a more robust system prompt for title generation
         title_system_prompt = f"You are an expert book marketer specializing in catchy titles for the {self.genre} genre."
-        book_title = self.generate_text(title_prompt, title_system_prompt)
+        book_title = self.generate_text(title_prompt, title_system_prompt, stage="title")
 
         # Clean up the generated title
         if not book_title:
@@ -1253,8 +1292,8 @@ Respond with ONLY the book title, nothing else. Make it appropriate for the {sel
         # Sanitize title for filename
         safe_title = re.sub(r'[\\/*?:"<>|]', "", book_title).strip()
         safe_title = re.sub(r'\s+', '_', safe_title) # Replace spaces with underscores
-        filename_md = f"{filename_prefix}_{safe_title}_{self.genre}.md"
-        filename_json = f"{filename_prefix}_{safe_title}_{self.genre}_metadata.json"
+        filename_md = os.path.join(self.output_dir, f"{filename_prefix}_{safe_title}_{self.genre}.md")
+        filename_json = os.path.join(self.output_dir, f"{filename_prefix}_{safe_title}_{self.genre}_metadata.json")
 
 
         try:
@@ -0,0 +1,234 @@
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+
+from ollama_client import CONGESTION_STATUS_CODES, RETRYABLE_STATUS_CODES, OllamaClient
+
+# --- Configuration ---
+# Comma-separated endpoints, each optionally followed by =<max in-flight>, e.g.
+# "http://gpu-a:11434=4,http://gpu-b:11434=2". When set, get_client() returns a balancer over them.
+OLLAMA_HOSTS_ENV = "OLLAMA_HOSTS"
+OLLAMA_ENDPOINT_MAX_IN_FLIGHT = 4 # Per-endpoint limit when the spec does not give one (match its OLLAMA_NUM_PARALLEL)
+OLLAMA_EJECT_AFTER_FAILURES = 3 # Consecutive failures (connection errors, 5xx) before an endpoint is ejected
+OLLAMA_EJECT_SECONDS = 30.0 # An ejected endpoint gets traffic again after this long, or sooner if a health check passes
+OLLAMA_HEALTH_CHECK_SECONDS = 15.0 # Interval of the background /api/ps poll (0 = no background checks)
+OLLAMA_HEALTH_CHECK_TIMEOUT = 3.0
+
+
+def _model_key(name):
+    """Ollama treats "llama3" and "llama3:latest" as the same model."""
+    return name if ":" in name else f"{name}:latest"
+
+
+def parse_endpoints(spec, default_max_in_flight=OLLAMA_ENDPOINT_MAX_IN_FLIGHT):
+    """Parses an OLLAMA_HOSTS value into [(base_url, max_in_flight)]."""
+    endpoints = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        url, _, limit = item.rpartition("=") if "=" in item else (item, "", "")
+        endpoints.append((url.rstrip("/"), int(limit) if limit else default_max_in_flight))
+    return endpoints
+
+
+class OllamaEndpoint:
+    """One Ollama server as the balancer sees it. Mutated only under the balancer's lock."""
+
+    def __init__(self, base_url, max_in_flight=OLLAMA_ENDPOINT_MAX_IN_FLIGHT):
+        self.base_url = base_url.rstrip("/")
+        self.max_in_flight = max(1, max_in_flight)
+        self.in_flight = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.loaded_models = set() # Resident in memory (/api/ps), so a call starts without a load
+        self.available_models = None # Pulled (/api/tags); None until the first successful health check
+        self.requests = 0
+        self.failures = 0
+
+    def is_ejected(self, now):
+        return now < self.ejected_until
+
+    def affinity(self, model):
+        """0: model loaded, 1: model pulled or unknown, 2: endpoint known not to have it."""
+        if model is None or _model_key(model) in self.loaded_models:
+            return 0
+        if self.available_models is None or _model_key(model) in self.available_models:
+            return 1
+        return 2
+
+    def __repr__(self):
+        return f"OllamaEndpoint({self.base_url!r}, in_flight={self.in_flight}/{self.max_in_flight})"
+
+
+class OllamaBalancer(OllamaClient):
+    """
+    OllamaClient that spreads calls over several Ollama servers.
+
+    Callers keep passing full URLs (http://localhost:11434/api/generate); only the path is
+    used, and each call goes to the endpoint that has the payload's model loaded and the
+    fewest requests in flight. Endpoints without the model loaded are used when every one
+    that has it is at its max_in_flight; when every endpoint is full, callers wait.
+
+    A connection error or retryable 5xx counts as a failure of that endpoint and the retry
+    goes to another one. After eject_after_failures consecutive failures an endpoint is
+    ejected for eject_seconds; a background health check (/api/ps) reinstates it early once
+    it answers again, and keeps each endpoint's set of loaded models current.
+    """
+
+    def __init__(self, endpoints, eject_after_failures=OLLAMA_EJECT_AFTER_FAILURES,
+                 eject_seconds=OLLAMA_EJECT_SECONDS, health_check_seconds=OLLAMA_HEALTH_CHECK_SECONDS, **client_kwargs):
+        if not endpoints:
+            raise ValueError("OllamaBalancer needs at least one endpoint.")
+        super().__init__(**client_kwargs)
+        self.endpoints = [e if isinstance(e, OllamaEndpoint) else OllamaEndpoint(*e) for e in endpoints]
+        self.eject_after_failures = eject_after_failures
+        self.eject_seconds = eject_seconds
+        self._lock = threading.Condition()
+        self._closed = threading.Event()
+        self._health_thread = None
+        self.check_health()
+        if health_check_seconds:
+            self._health_thread = threading.Thread(target=self._health_loop, args=(health_check_seconds,),
+                                                   name="ollama-health", daemon=True)
+            self._health_thread.start()
+
+    # --- Routing ---
+
+    def _pick(self, model, exclude, now):
+        """Best endpoint with a free slot, or None if all are full. Raises if every endpoint is ejected."""
+        healthy = [e for e in self.endpoints if not e.is_ejected(now)]
+        if not healthy:
+            raise requests.exceptions.ConnectionError(
+                f"All {len(self.endpoints)} Ollama endpoints are ejected after repeated failures.")
+        # Prefer endpoints this call has not failed on yet, unless that leaves none
+        candidates = [e for e in healthy if e.base_url not in exclude] or healthy
+        # Endpoints known not to have the model only get it when no other endpoint might
+        candidates = [e for e in candidates if e.affinity(model) < 2] or candidates
+        free = [e for e in candidates if e.in_flight < e.max_in_flight]
+        if not free:
+            return None
+        return min(free, key=lambda e: (e.affinity(model), e.in_flight, e.in_flight / e.max_in_flight))
+
+    def _acquire(self, model, exclude=()):
+        with self._lock:
+            while True:
+                endpoint = self._pick(model, exclude, time.monotonic())
+                if endpoint is not None:
+                    endpoint.in_flight += 1
+                    endpoint.requests += 1
+                    return endpoint
+                self._lock.wait(timeout=1.0) # Re-checks periodically so an ejection expiring is noticed
+
+    def _release(self, endpoint, model=None, failed=False):
+        with self._lock:
+            endpoint.in_flight -= 1
+            if failed:
+                endpoint.failures += 1
+                endpoint.consecutive_failures += 1
+                if endpoint.consecutive_failures >= self.eject_after_failures:
+                    if not endpoint.is_ejected(time.monotonic()):
+                        print(f"Ollama endpoint {endpoint.base_url} ejected after {endpoint.consecutive_failures} "
+                              f"consecutive failures; retrying it in {self.eject_seconds:.0f}s.")
+                    endpoint.ejected_until = time.monotonic() + self.eject_seconds
+            else:
+                endpoint.consecutive_failures = 0
+                if model:
+                    endpoint.loaded_models.add(_model_key(model)) # Ollama loads the model to serve the call
+            self._lock.notify_all()
+
+    def _post(self, url, json, timeout, stream):
+        payload = dict(json)
+        if self.keep_alive is not None:
+            payload.setdefault("keep_alive", self.keep_alive)
+        model = payload.get("model")
+        parts = urlsplit(url)
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+
+        tried = set()
+        for attempt in range(self.max_retries + 1):
+            endpoint = self._acquire(model, exclude=tried)
+            tried.add(endpoint.base_url)
+            try:
+                response = self.session.post(endpoint.base_url + path, json=payload, timeout=self._timeout(timeout), stream=stream)
+            except (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError) as e:
+                self._release(endpoint, failed=True)
+                if attempt >= self.max_retries:
+                    raise
+                self._sleep_before_retry(attempt, reason=f"{type(e).__name__} from {endpoint.base_url}")
+                continue
+            except BaseException:
+                self._release(endpoint) # e.g. a read timeout: the server is slow, not down
+                raise
+
+            if response.status_code in CONGESTION_STATUS_CODES:
+                self._congestion(f"HTTP {response.status_code} from {endpoint.base_url}")
+            failed = response.status_code in RETRYABLE_STATUS_CODES
+            if failed and attempt < self.max_retries:
+                response.close()
+                self._release(endpoint, failed=True)
+                self._sleep_before_retry(attempt, reason=f"HTTP {response.status_code} from {endpoint.base_url}")
+                continue
+            served_model = model if response.ok else None
+            if stream:
+                self._release_on_close(response, endpoint, served_model, failed)
+            else:
+                self._release(endpoint, served_model, failed)
+            return response
+
+    def _release_on_close(self, response, endpoint, model, failed):
+        """A streamed response occupies its endpoint until the caller closes it (stream() always does)."""
+        self._on_close(response, lambda: self._release(endpoint, model, failed))
+
+    # --- Health checks ---
+
+    def check_health(self):
+        """Polls /api/ps and /api/tags on every endpoint: refreshes loaded models, reinstates ejected endpoints that answer."""
+        for endpoint in self.endpoints:
+            try:
+                loaded = self.session.get(endpoint.base_url + "/api/ps", timeout=OLLAMA_HEALTH_CHECK_TIMEOUT)
+                loaded.raise_for_status()
+                pulled = self.session.get(endpoint.base_url + "/api/tags", timeout=OLLAMA_HEALTH_CHECK_TIMEOUT)
+                pulled.raise_for_status()
+                # A 200 that is not Ollama's JSON (e.g. a proxy's error page) fails the check too
+                loaded_models = {_model_key(m.get("name") or m.get("model", "")) for m in loaded.json().get("models", [])}
+                available_models = {_model_key(m.get("name") or m.get("model", "")) for m in pulled.json().get("models", [])}
+            except (requests.exceptions.RequestException, ValueError, AttributeError):
+                with self._lock:
+                    endpoint.consecutive_failures += 1
+                    if endpoint.consecutive_failures >= self.eject_after_failures:
+                        endpoint.ejected_until = time.monotonic() + self.eject_seconds
+                continue
+            with self._lock:
+                if endpoint.is_ejected(time.monotonic()):
+                    print(f"Ollama endpoint {endpoint.base_url} is answering again; back in rotation.")
+                endpoint.ejected_until = 0.0
+                endpoint.consecutive_failures = 0
+                endpoint.loaded_models = loaded_models
+                endpoint.available_models = available_models
+                self._lock.notify_all()
+
+    def _health_loop(self, interval):
+        while not self._closed.wait(interval):
+            self.check_health()
+
+    def status(self):
+        """One dict per endpoint, for logging."""
+        now = time.monotonic()
+        with self._lock:
+            return [{"base_url": e.base_url, "in_flight": e.in_flight, "max_in_flight": e.max_in_flight,
+                     "requests": e.requests, "failures": e.failures, "ejected": e.is_ejected(now),
+                     "loaded_models": sorted(e.loaded_models)} for e in self.endpoints]
+
+    def close(self):
+        self._closed.set()
+        super().close()
+
+
+def balancer_from_env(**client_kwargs):
+    """An OllamaBalancer over OLLAMA_HOSTS, or None when the variable is unset or empty."""
+    endpoints = parse_endpoints(os.getenv(OLLAMA_HOSTS_ENV, ""))
+    return OllamaBalancer(endpoints, **client_kwargs) if endpoints else None
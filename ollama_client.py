@@ -0,0 +1,233 @@
+import contextlib
+import json as jsonlib
+import random
+import threading
+import time
+import weakref
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from ollama_limiter import (ADAPTIVE_INITIAL_IN_FLIGHT, ADAPTIVE_MAX_IN_FLIGHT, ADAPTIVE_MIN_IN_FLIGHT,
+                            OLLAMA_ADAPTIVE_CONCURRENCY, AdaptiveLimiter)
+
+# --- Configuration ---
+OLLAMA_CONNECT_TIMEOUT = 10 # Seconds to establish the TCP connection
+OLLAMA_READ_TIMEOUT = 360 # Seconds to wait for a (non-streamed) generation to finish
+# How long Ollama keeps the model resident after a call (e.g. "30m", "-1" = forever)
+OLLAMA_KEEP_ALIVE = "30m"
+OLLAMA_MAX_RETRIES = 3
+OLLAMA_BACKOFF_SECONDS = 1.0 # Base delay; doubled on every retry, plus jitter
+OLLAMA_POOL_SIZE = 8 # Connections kept open per host
+RETRYABLE_STATUS_CODES = {500, 502, 503, 504}
+CONGESTION_STATUS_CODES = {429, 503} # Ollama answers 503 when its request queue (OLLAMA_MAX_QUEUE) is full
+OLLAMA_MAX_IN_FLIGHT = None # Requests allowed on the wire at once across all callers (None = unlimited)
+
+
+class OllamaClient:
+    """
+    Pooled HTTP client for the Ollama REST API.
+
+    A single requests.Session is shared by every caller so connections are
+    reused across calls. Requests carry Ollama's keep_alive so the model stays
+    loaded, and are retried with exponential backoff on 5xx responses and
+    connection errors (read timeouts are not retried: the server may still be
+    generating).
+
+    With max_in_flight set, at most that many requests (a stream counts until
+    it is closed) are outstanding at once; further callers block until a slot
+    frees up. Several generators sharing one client therefore share one limit.
+    With adaptive set, an AdaptiveLimiter moves that limit instead (see
+    ollama_limiter); its decisions go to every concurrency listener.
+    """
+
+    def __init__(self, connect_timeout=OLLAMA_CONNECT_TIMEOUT, read_timeout=OLLAMA_READ_TIMEOUT,
+                 keep_alive=OLLAMA_KEEP_ALIVE, max_retries=OLLAMA_MAX_RETRIES,
+                 backoff_seconds=OLLAMA_BACKOFF_SECONDS, pool_size=OLLAMA_POOL_SIZE,
+                 max_in_flight=OLLAMA_MAX_IN_FLIGHT, adaptive=OLLAMA_ADAPTIVE_CONCURRENCY):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.keep_alive = keep_alive
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self._concurrency_listeners = []
+        if adaptive:
+            self.set_adaptive_concurrency(maximum=max_in_flight or ADAPTIVE_MAX_IN_FLIGHT)
+        else:
+            self.set_max_in_flight(max_in_flight)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def set_max_in_flight(self, max_in_flight):
+        """Caps concurrent requests (None = unlimited). Requests already waiting keep the old limit."""
+        self.max_in_flight = max_in_flight
+        self._slots = threading.BoundedSemaphore(max_in_flight) if max_in_flight else None
+        self.limiter = None
+
+    def set_adaptive_concurrency(self, maximum=ADAPTIVE_MAX_IN_FLIGHT, minimum=ADAPTIVE_MIN_IN_FLIGHT,
+                                 initial=ADAPTIVE_INITIAL_IN_FLIGHT):
+        """Lets an AdaptiveLimiter move the request limit between minimum and maximum (replaces max_in_flight)."""
+        self.max_in_flight = maximum
+        self._slots = None
+        self.limiter = AdaptiveLimiter(min(initial, maximum), minimum, maximum, on_decision=self._publish_decision)
+
+    def add_concurrency_listener(self, listener):
+        """Calls listener(decision) on every adaptive limit change. Bound methods are held weakly."""
+        ref = weakref.WeakMethod(listener) if hasattr(listener, "__self__") else (lambda: listener)
+        self._concurrency_listeners.append(ref)
+
+    def _publish_decision(self, decision):
+        self._concurrency_listeners = [ref for ref in self._concurrency_listeners if ref() is not None]
+        for ref in list(self._concurrency_listeners):
+            listener = ref()
+            if listener is not None:
+                listener(decision)
+
+    def _slot(self):
+        if self.limiter is not None:
+            return self.limiter.slot()
+        return self._slots or contextlib.nullcontext()
+
+    def _congestion(self, reason):
+        if self.limiter is not None:
+            self.limiter.congestion(reason)
+
+    def _observe(self, wall_seconds, response_data):
+        """Feeds a finished generation's wall time and eval_count to the adaptive limiter."""
+        if self.limiter is not None and isinstance(response_data, dict):
+            self.limiter.observe(wall_seconds, response_data.get("eval_count") or 0)
+
+    def _timeout(self, timeout):
+        if timeout is None:
+            return (self.connect_timeout, self.read_timeout)
+        if isinstance(timeout, tuple):
+            return timeout
+        return (self.connect_timeout, timeout)
+
+    def _sleep_before_retry(self, attempt, reason):
+        delay = self.backoff_seconds * (2 ** attempt) + random.uniform(0, self.backoff_seconds)
+        print(f"Ollama request failed ({reason}); retry {attempt + 1}/{self.max_retries} in {delay:.1f}s...")
+        time.sleep(delay)
+
+    def post(self, url, json, timeout=None, stream=False):
+        """
+        Drop-in replacement for requests.post(url, json=...) against an Ollama endpoint.
+        Returns the final requests.Response; the caller still calls raise_for_status().
+        With stream=True the request keeps its slot until the caller closes the response.
+        """
+        slot = contextlib.ExitStack()
+        slot.enter_context(self._slot())
+        try:
+            response = self._post(url, json, timeout, stream)
+        except requests.exceptions.Timeout:
+            self._congestion("timeout") # While still holding the slot, so the limiter knows when it was admitted
+            slot.close()
+            raise
+        except BaseException:
+            slot.close()
+            raise
+        if stream:
+            self._on_close(response, slot.close)
+            return response
+        with slot:
+            if self.limiter is not None and response.ok:
+                try:
+                    self._observe(response.elapsed.total_seconds(), response.json())
+                except ValueError:
+                    pass
+        return response
+
+    @staticmethod
+    def _on_close(response, callback):
+        """Runs callback once, when the (streamed) response is closed."""
+        close = response.close
+        called = []
+
+        def close_and_call():
+            try:
+                close()
+            finally:
+                if not called:
+                    called.append(True)
+                    callback()
+
+        response.close = close_and_call
+
+    def _post(self, url, json, timeout, stream):
+        payload = dict(json)
+        if self.keep_alive is not None:
+            payload.setdefault("keep_alive", self.keep_alive)
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.post(url, json=payload, timeout=self._timeout(timeout), stream=stream)
+            except (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError) as e:
+                if attempt >= self.max_retries:
+                    raise
+                self._sleep_before_retry(attempt, reason=type(e).__name__)
+                continue
+
+            if response.status_code in CONGESTION_STATUS_CODES:
+                self._congestion(f"HTTP {response.status_code}")
+            if response.status_code in RETRYABLE_STATUS_CODES and attempt < self.max_retries:
+                response.close()
+                self._sleep_before_retry(attempt, reason=f"HTTP {response.status_code}")
+                continue
+            return response
+
+    def stream(self, url, json, timeout=None):
+        """
+        Streams an Ollama /api/generate or /api/chat call, yielding each parsed NDJSON chunk.
+        Closing the generator early closes the connection, which makes Ollama stop generating.
+        """
+        payload = dict(json)
+        payload["stream"] = True
+        with self._slot(): # Held until the stream is finished or closed
+            start = time.monotonic()
+            try:
+                response = self._post(url, payload, timeout, stream=True)
+            except requests.exceptions.Timeout:
+                self._congestion("timeout")
+                raise
+            try:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = jsonlib.loads(line)
+                    if "error" in chunk:
+                        raise OllamaStreamError(chunk["error"])
+                    if chunk.get("done"):
+                        self._observe(time.monotonic() - start, chunk)
+                    yield chunk
+                    if chunk.get("done"):
+                        break
+            finally:
+                response.close()
+
+    def close(self):
+        self.session.close()
+
+
+class OllamaStreamError(requests.exceptions.RequestException):
+    """Raised when Ollama reports an error in the middle of a streamed response."""
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Returns the process-wide shared OllamaClient, creating it on first use.
+    With OLLAMA_HOSTS set it is an OllamaBalancer over those servers (see ollama_balancer).
+    """
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            from ollama_balancer import balancer_from_env # Imports this module
+            _default_client = balancer_from_env() or OllamaClient()
+        return _default_client
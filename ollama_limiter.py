@@ -0,0 +1,148 @@
+import contextlib
+import os
+import threading
+import time
+
+# --- Configuration ---
+# "1": the shared client finds its own request limit (AIMD) instead of using a fixed max_in_flight
+OLLAMA_ADAPTIVE_CONCURRENCY = os.getenv("OLLAMA_ADAPTIVE_CONCURRENCY", "0") == "1"
+ADAPTIVE_MIN_IN_FLIGHT = 1
+ADAPTIVE_MAX_IN_FLIGHT = int(os.getenv("OLLAMA_ADAPTIVE_MAX_IN_FLIGHT", "16")) # The limit is never raised past this
+ADAPTIVE_INITIAL_IN_FLIGHT = 2
+ADAPTIVE_WINDOW_CALLS = 4 # A decision is taken every max(this, 2 x limit) completed calls
+ADAPTIVE_MIN_GAIN = 0.05 # Keep raising the limit while each window's tokens/sec beats the last by this fraction
+ADAPTIVE_PROBE_WINDOWS = 5 # Flat windows at the limit before probing one step higher anyway
+ADAPTIVE_LATENCY_SPIKE = 2.0 # Back off when a window's seconds per generated token reach this multiple of the baseline
+ADAPTIVE_BASELINE_DRIFT = 1.25 # The baseline rises by this factor per spike, so a slower workload stops counting as one
+ADAPTIVE_BACKOFF = 0.5 # Multiplicative decrease on a latency spike, timeout or 503
+
+
+class AdaptiveLimiter:
+    """
+    AIMD limit on concurrent Ollama requests.
+
+    Completed calls are grouped into windows. While every slot was in use during a
+    window and it generated more tokens/sec than the previous full window, the limit
+    goes up by one (after ADAPTIVE_PROBE_WINDOWS flat windows it goes up once more to
+    probe). It is multiplied by ADAPTIVE_BACKOFF when a window's wall seconds per
+    generated token spike above the baseline, and at once on a timeout or 503.
+    Congestion reported by a request admitted before the last cut is ignored, so one
+    overload does not halve the limit several times over.
+
+    Every change is appended to decisions and passed to on_decision as a dict.
+    """
+
+    def __init__(self, initial=ADAPTIVE_INITIAL_IN_FLIGHT, minimum=ADAPTIVE_MIN_IN_FLIGHT,
+                 maximum=ADAPTIVE_MAX_IN_FLIGHT, on_decision=None):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = min(max(initial, self.minimum), self.maximum)
+        self.in_flight = 0
+        self.decisions = []
+        self.on_decision = on_decision
+        self._cond = threading.Condition()
+        self._local = threading.local() # Epoch the calling thread's request was admitted in
+        self._epoch = 0 # Bumped on every cut
+        self._baseline = None # Seconds per generated token of an uncongested window
+        self._last_throughput = None # Tokens/sec of the last window that used every slot
+        self._flat_windows = 0
+        self._new_window()
+
+    def _new_window(self):
+        self._window_start = time.monotonic()
+        self._window_calls = 0
+        self._window_tokens = 0
+        self._window_seconds = 0.0
+        self._window_full = self.in_flight >= self.limit
+
+    @contextlib.contextmanager
+    def slot(self):
+        """Holds one request slot; blocks while the current limit is reached."""
+        with self._cond:
+            while self.in_flight >= self.limit:
+                self._window_full = True
+                self._cond.wait()
+            self.in_flight += 1
+            if self.in_flight >= self.limit:
+                self._window_full = True
+            epoch = self._epoch
+        outer_epoch = getattr(self._local, "epoch", None)
+        self._local.epoch = epoch
+        try:
+            yield
+        finally:
+            self._local.epoch = outer_epoch
+            with self._cond:
+                self.in_flight -= 1
+                self._cond.notify_all()
+
+    def observe(self, wall_seconds, eval_tokens):
+        """Feeds one successful call: its wall time and the tokens it generated."""
+        with self._cond:
+            self._window_calls += 1
+            if eval_tokens:
+                self._window_tokens += eval_tokens
+                self._window_seconds += wall_seconds
+            decision = None
+            if self._window_calls >= max(ADAPTIVE_WINDOW_CALLS, 2 * self.limit):
+                decision = self._end_window()
+        self._publish(decision)
+
+    def congestion(self, reason):
+        """Reports a timeout or 503 for the calling thread's request; cuts the limit unless it was cut since that request started."""
+        with self._cond:
+            if getattr(self._local, "epoch", self._epoch) < self._epoch:
+                return
+            decision = self._decrease(reason)
+        self._publish(decision)
+
+    def _end_window(self):
+        elapsed = max(1e-6, time.monotonic() - self._window_start)
+        throughput = self._window_tokens / elapsed
+        latency = self._window_seconds / self._window_tokens if self._window_tokens else None
+        full = self._window_full
+        self._new_window()
+
+        if latency is not None:
+            if self._baseline is not None and latency >= self._baseline * ADAPTIVE_LATENCY_SPIKE:
+                self._baseline *= ADAPTIVE_BASELINE_DRIFT
+                return self._decrease("latency spike", throughput, latency)
+            self._baseline = latency if self._baseline is None else min(latency, self._baseline)
+        if not full or self.limit >= self.maximum:
+            return None # Demand, not the limit, set this window's pace
+        previous, self._last_throughput = self._last_throughput, throughput
+        if previous is None or throughput > previous * (1 + ADAPTIVE_MIN_GAIN):
+            self._flat_windows = 0
+            return self._change(self.limit + 1, "throughput up", throughput, latency)
+        self._flat_windows += 1
+        if self._flat_windows >= ADAPTIVE_PROBE_WINDOWS:
+            self._flat_windows = 0
+            return self._change(self.limit + 1, "probe", throughput, latency)
+        return None
+
+    def _decrease(self, reason, throughput=None, latency=None):
+        self._epoch += 1
+        self._last_throughput = None
+        self._flat_windows = 0
+        decision = self._change(max(self.minimum, int(self.limit * ADAPTIVE_BACKOFF)), reason, throughput, latency)
+        self._new_window()
+        return decision
+
+    def _change(self, new_limit, reason, throughput, latency):
+        if new_limit == self.limit:
+            return None
+        decision = {"time": round(time.time(), 3), "from": self.limit, "to": new_limit, "reason": reason,
+                    "tokens_per_sec": round(throughput, 1) if throughput is not None else None,
+                    "seconds_per_token": round(latency, 4) if latency is not None else None}
+        self.limit = new_limit
+        self.decisions.append(decision)
+        self._cond.notify_all()
+        return decision
+
+    def _publish(self, decision):
+        if decision is None:
+            return
+        rate = f", {decision['tokens_per_sec']:.0f} tok/s" if decision["tokens_per_sec"] is not None else ""
+        print(f"Ollama concurrency limit {decision['from']} -> {decision['to']} ({decision['reason']}{rate}).")
+        if self.on_decision:
+            self.on_decision(decision)
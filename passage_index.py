@@ -0,0 +1,146 @@
+import math
+import os
+import re
+import threading
+from collections import Counter
+
+import numpy as np
+
+# Optional sentence-transformers model (e.g. "all-MiniLM-L6-v2") for dense CPU embeddings.
+# Unset, or if sentence-transformers is not installed, passages are ranked with TF-IDF instead.
+PASSAGE_EMBEDDING_MODEL = os.getenv("PASSAGE_EMBEDDING_MODEL", "")
+PASSAGE_CHUNK_WORDS = 180 # Target chunk size; paragraphs are grouped up to roughly this many words
+PASSAGE_MIN_SCORE = 0.05 # Cosine similarity below this is treated as unrelated
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+_STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below between both but by
+can could did do does doing down during each few for from further had has have having he her here hers herself him
+himself his how i if in into is it its itself just me more most my myself no nor not now of off on once only or other
+our ours ourselves out over own same she should so some such than that the their theirs them themselves then there
+these they this those through to too under until up very was we were what when where which while who whom why will
+with would you your yours yourself yourselves said says into onto upon
+""".split())
+
+
+def chunk_text(text, max_words=PASSAGE_CHUNK_WORDS):
+    """Splits prose into scene-sized chunks along paragraph boundaries."""
+    chunks, current, current_words = [], [], 0
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph or paragraph.startswith("#"):
+            continue
+        words = len(paragraph.split())
+        if current and current_words + words > max_words:
+            chunks.append("\n\n".join(current))
+            current, current_words = [], 0
+        current.append(paragraph)
+        current_words += words
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def _tokenize(text):
+    return [word for word in _WORD_RE.findall(text.lower()) if len(word) > 2 and word not in _STOPWORDS]
+
+
+def _load_encoder(model_name):
+    if not model_name:
+        return None
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        print(f"Passage index: sentence-transformers not installed; using TF-IDF instead of '{model_name}'.")
+        return None
+    return SentenceTransformer(model_name, device="cpu")
+
+
+class PassageIndex:
+    """
+    In-process similarity index over chunks of already generated chapters.
+
+    Chapters are added incrementally as they are finished (re-adding a chapter
+    replaces its chunks). search() returns the top-k chunks most similar to a
+    query such as an upcoming scene description, ranked by cosine similarity of
+    dense embeddings when an embedding model is configured, otherwise of TF-IDF
+    vectors. The TF-IDF matrix is rebuilt lazily after additions, which is cheap
+    at novel scale (a few thousand chunks at most).
+    """
+
+    def __init__(self, embedding_model=PASSAGE_EMBEDDING_MODEL, chunk_words=PASSAGE_CHUNK_WORDS):
+        self.chunk_words = chunk_words
+        self.passages = [] # {"chapter": int, "text": str}
+        self._encoder = _load_encoder(embedding_model)
+        self._embeddings = None # Dense mode: (n, dim) float32, L2-normalized
+        self._tfidf = None # TF-IDF mode: (matrix, vocabulary, idf), rebuilt when stale
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.passages)
+
+    @property
+    def backend(self):
+        return "embeddings" if self._encoder is not None else "tf-idf"
+
+    def add_chapter(self, chapter_num, text):
+        """Indexes (or re-indexes) one chapter's prose."""
+        chunks = chunk_text(text, self.chunk_words)
+        with self._lock:
+            keep = [i for i, p in enumerate(self.passages) if p["chapter"] != chapter_num]
+            self.passages = [self.passages[i] for i in keep] + [{"chapter": chapter_num, "text": c} for c in chunks]
+            if self._encoder is not None:
+                old = self._embeddings[keep] if self._embeddings is not None and keep else np.zeros((0, 0), dtype=np.float32)
+                new = self._encode(chunks) if chunks else np.zeros((0, old.shape[1]), dtype=np.float32)
+                self._embeddings = np.vstack([old, new]) if old.size else new
+            self._tfidf = None
+
+    def _encode(self, texts):
+        vectors = np.asarray(self._encoder.encode(texts, normalize_embeddings=True), dtype=np.float32)
+        return vectors.reshape(len(texts), -1)
+
+    def _build_tfidf(self):
+        documents = [Counter(_tokenize(p["text"])) for p in self.passages]
+        document_frequency = Counter(term for doc in documents for term in doc)
+        vocabulary = {term: i for i, term in enumerate(document_frequency)}
+        n = len(documents)
+        idf = np.array([math.log((1 + n) / (1 + document_frequency[term])) + 1.0 for term in vocabulary], dtype=np.float32)
+        matrix = np.zeros((n, len(vocabulary)), dtype=np.float32)
+        for row, doc in enumerate(documents):
+            for term, tf in doc.items():
+                matrix[row, vocabulary[term]] = 1.0 + math.log(tf)
+        matrix *= idf
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms == 0, 1.0, norms)
+        self._tfidf = (matrix, vocabulary, idf)
+
+    def _query_vector(self, query):
+        if self._encoder is not None:
+            return self._encode([query])[0]
+        matrix, vocabulary, idf = self._tfidf
+        vector = np.zeros(len(vocabulary), dtype=np.float32)
+        for term, tf in Counter(_tokenize(query)).items():
+            if term in vocabulary:
+                vector[vocabulary[term]] = (1.0 + math.log(tf)) * idf[vocabulary[term]]
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def search(self, query, k=3, exclude_chapters=(), min_score=PASSAGE_MIN_SCORE):
+        """Returns up to k (score, passage) pairs most similar to query, best first."""
+        with self._lock:
+            if not self.passages or not query.strip():
+                return []
+            if self._encoder is None and self._tfidf is None:
+                self._build_tfidf()
+            vectors = self._embeddings if self._encoder is not None else self._tfidf[0]
+            scores = vectors @ self._query_vector(query)
+            for i, passage in enumerate(self.passages):
+                if passage["chapter"] in exclude_chapters:
+                    scores[i] = -1.0
+            top = np.argsort(-scores)[:k]
+            return [(float(scores[i]), self.passages[i]) for i in top if scores[i] >= min_score]
+
+    def relevant_passages_text(self, query, k=3, exclude_chapters=()):
+        """Formats the top-k passages for a prompt, or returns "" when nothing relevant is indexed."""
+        results = self.search(query, k=k, exclude_chapters=exclude_chapters)
+        return "\n\n".join(f"[From Chapter {passage['chapter']}]\n{passage['text']}" for _, passage in results)
@@ -0,0 +1,93 @@
+import re
+
+# Section labels the plan prompts ask for, plus the variants models actually write (markdown bold,
+# echoed parentheticals like "KEY SCENES (3-6 scenes):", "Scene Breakdown", "Timeline Indicators").
+# Matched as label prefixes, in order.
+PLAN_SECTION_KEYS = (
+    ("CHAPTER GOAL", "goal"),
+    ("CHAPTER SUMMARY", "goal"),
+    ("KEY SCENES", "scenes"),
+    ("SCENE BREAKDOWN", "scenes"),
+    ("CHARACTER DEVELOPMENT", "character_development"),
+    ("PLOT ADVANCEMENT", "plot_advancement"),
+    ("TIMELINE", "timeline_pacing"),
+    ("EMOTIONAL TONE", "emotional_tone_end"),
+    ("CONNECTION TO NEXT CHAPTER", "connection_to_next"),
+)
+
+# One alternation, one pass: every line is either a chapter heading, a section label, or content.
+# Headings: "Chapter 3 - Title", "Chapter 3: Title", "# Chapter 3 - Title", "**Chapter 3: "Title"**", "Chapter 3".
+# A line that merely starts with "Chapter 3" followed by prose is not a heading.
+_PLAN_TOKEN_RE = re.compile(
+    r"^[ \t]*(?:#+[ \t]*)?(?:\*\*)?Chapter[ \t]*(?P<number>\d+)(?P<title>(?:\*\*)?[ \t]*(?:[-:–—][^\n]*)?)$"
+    r"|^[ \t]*(?:\d+\.[ \t]*)?(?:[-*•][ \t]*)?(?:\*\*)?[ \t]*"
+    r"(?P<label>CHAPTER GOAL|CHAPTER SUMMARY|KEY SCENES|SCENE BREAKDOWN|CHARACTER DEVELOPMENT(?: FOCUS)?|PLOT ADVANCEMENT"
+    r"|TIMELINE(?: & PACING| AND PACING| INDICATORS)?|EMOTIONAL TONE[^:\n*]*|CONNECTION TO NEXT CHAPTER)"
+    r"(?:[ \t]*\([^)\n]*\))?[ \t]*(?:\*\*[ \t]*:|:[ \t]*(?:\*\*)?)",
+    re.MULTILINE | re.IGNORECASE,
+)
+# Scene bullets: "- ", "* ", "• ", "1. " at the start of a line (but not markdown bold "**")
+_SCENE_SPLIT_RE = re.compile(r"(?:^|\n)[ \t]*(?:[-•]|\*(?!\*)|\d+\.)[ \t]*")
+_TITLE_STRIP = " \t-:–—*\"'“”"
+
+
+def empty_chapter_plan(chapter_num, title=None):
+    """The plan dict every parser fills in; fields a plan does not mention stay "N/A"."""
+    return {
+        "number": chapter_num,
+        "title": title or f"Chapter {chapter_num}",
+        "goal": "N/A",
+        "scenes": [],
+        "character_development": "N/A",
+        "plot_advancement": "N/A",
+        "timeline_pacing": "N/A",
+        "emotional_tone_end": "N/A",
+        "connection_to_next": "N/A",
+    }
+
+
+def _section_key(label):
+    label = label.upper()
+    for prefix, key in PLAN_SECTION_KEYS:
+        if label.startswith(prefix):
+            return key
+    return None
+
+
+def _store_section(plan, key, value):
+    value = value.strip()
+    if not value:
+        return
+    if key == "scenes":
+        plan["scenes"] = [scene.strip() for scene in _SCENE_SPLIT_RE.split(value) if scene.strip()]
+    else:
+        plan[key] = value
+
+
+def parse_chapter_plans(text):
+    """
+    Parses a multi-chapter plan in a single scan of the text and returns {chapter_num: plan} in text order.
+    The first heading for a chapter number wins; a repeated heading (and everything under it) is ignored,
+    as is a repeated section within one chapter.
+    """
+    plans = {}
+    plan, key, content_start = None, None, 0
+    for match in _PLAN_TOKEN_RE.finditer(text):
+        if plan is not None and key is not None:
+            _store_section(plan, key, text[content_start:match.start()])
+        key = None
+        if match.group("number") is not None:
+            chapter_num = int(match.group("number"))
+            if chapter_num in plans:
+                plan = None
+                continue
+            plan = plans[chapter_num] = empty_chapter_plan(chapter_num, match.group("title").strip(_TITLE_STRIP))
+            filled = set()
+        elif plan is not None:
+            section = _section_key(match.group("label"))
+            if section not in filled:
+                filled.add(section)
+                key, content_start = section, match.end()
+    if plan is not None and key is not None:
+        _store_section(plan, key, text[content_start:])
+    return plans
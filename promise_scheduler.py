@@ -0,0 +1,169 @@
+import heapq
+import itertools
+from collections import defaultdict
+
+# --- PromiseManager score formula (half.py) ---
+PROMISE_IMPORTANCE_WEIGHT = 10 # importance (1-10) x 10
+PROMISE_UNSTARTED_BONUS = 30 # Never progressed yet
+PROMISE_STALENESS_PER_SCENE = 5 # Per scene since last progressed...
+PROMISE_STALENESS_CAP = 50 # ...capped here
+PROMISE_REMAINING_WEIGHT = 0.5 # x (100 - progression)
+
+_STALE_AFTER_SCENES = PROMISE_STALENESS_CAP // PROMISE_STALENESS_PER_SCENE # Staleness saturates from here on
+
+
+def promise_score(promise, scene_count):
+    """The progression-priority score PromiseManager ranks progressable promises by."""
+    score = promise.importance * PROMISE_IMPORTANCE_WEIGHT
+    if promise.last_progressed > 0:
+        score += min(PROMISE_STALENESS_CAP, (scene_count - promise.last_progressed) * PROMISE_STALENESS_PER_SCENE)
+    else:
+        score += PROMISE_UNSTARTED_BONUS
+    return score + (100 - promise.progression) * PROMISE_REMAINING_WEIGHT
+
+
+class PromiseScheduler:
+    """
+    Id index, dependency graph and score heaps for a set of plot promises.
+
+    A promise is progressable when it is neither completed nor paused and none of its known
+    dependencies is incomplete (unknown dependency ids are ignored, as before). `blocked` counts the
+    incomplete known dependencies of each promise and `dependents` is the reverse edge list, so a
+    completion touches only the promises that wait on it.
+
+    The score's staleness term grows with the scene count until it hits its cap, so progressable
+    promises live in one of three max-heaps whose keys do not change as scenes pass:
+      unstarted - importance/progress part + the unstarted bonus
+      recent    - importance/progress part - 5 x last_progressed (5 x scene_count is added on read)
+      stale     - importance/progress part + the cap
+    A recent promise moves to stale once its staleness saturates (tracked by a heap on last_progressed).
+    Entries are invalidated lazily: every (re)push bumps the promise's version and old entries are
+    dropped when they surface.
+    """
+
+    def __init__(self):
+        self.by_id = {}
+        self.dependents = defaultdict(list) # dep id -> ids of promises listing it (known or not yet)
+        self.blocked = {} # id -> number of known, incomplete dependencies
+        self._completed = set() # ids whose completion has been propagated to dependents
+        self._order = {} # id -> registration order, the tie-break sorted() used to give
+        self._version = {} # id -> version of its live heap entry (absent: not queued)
+        self._versions = itertools.count(1)
+        self._unstarted, self._recent, self._stale = [], [], []
+        self._expiry = [] # (last_progressed, order, version, id) of queued recent promises
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def __contains__(self, promise_id):
+        return promise_id in self.by_id
+
+    def get(self, promise_id):
+        return self.by_id.get(promise_id)
+
+    def add(self, promise):
+        """Registers a promise (O(deps + dependents)); re-adding a known id refreshes it instead."""
+        if promise.id in self.by_id:
+            self.by_id[promise.id] = promise
+            self.refresh(promise)
+            return
+        self._order[promise.id] = len(self._order)
+        self.blocked[promise.id] = 0
+        for dep_id in promise.dependencies:
+            self.dependents[dep_id].append(promise.id)
+            if dep_id in self.by_id and dep_id not in self._completed:
+                self.blocked[promise.id] += 1
+        self.by_id[promise.id] = promise
+        if promise.status == "completed":
+            self._completed.add(promise.id)
+        else:
+            # Promises that named this id before it existed now wait on it
+            for dependent_id in self.dependents.get(promise.id, ()):
+                self.blocked[dependent_id] += 1
+                self._requeue(self.by_id[dependent_id])
+        self._requeue(promise)
+
+    def is_progressable(self, promise):
+        return (promise.status not in ("completed", "paused")
+                and self.blocked.get(promise.id, 0) == 0)
+
+    def refresh(self, promise):
+        """
+        Re-indexes a promise after its status, progression, importance or last_progressed changed.
+        Completing it unlocks its dependents in O(deps); un-completing it (a backslide) blocks them again.
+        """
+        completed = promise.status == "completed"
+        if completed != (promise.id in self._completed):
+            delta = -1 if completed else 1
+            if completed:
+                self._completed.add(promise.id)
+            else:
+                self._completed.discard(promise.id)
+            for dependent_id in self.dependents.get(promise.id, ()):
+                self.blocked[dependent_id] += delta
+                self._requeue(self.by_id[dependent_id])
+        self._requeue(promise)
+
+    def top(self, scene_count, n=1):
+        """The n highest-scoring progressable promises as [(promise, score)], best first. O(n log P)."""
+        self._expire(scene_count)
+        heaps = (self._unstarted, self._recent, self._stale)
+        taken, ranked = [], []
+        while len(ranked) < n:
+            best = None
+            for i, heap in enumerate(heaps):
+                if self._clean(heap):
+                    neg_key, order = heap[0][0], heap[0][1]
+                    score = -neg_key + (scene_count * PROMISE_STALENESS_PER_SCENE if i == 1 else 0)
+                    if best is None or (score, -order) > (best[0], -best[1]):
+                        best = (score, order, i)
+            if best is None:
+                break
+            entry = heapq.heappop(heaps[best[2]])
+            taken.append((best[2], entry))
+            ranked.append((self.by_id[entry[3]], best[0]))
+        for i, entry in taken:
+            heapq.heappush(heaps[i], entry)
+        return ranked
+
+    def progressable(self):
+        """Every progressable promise in registration order. O(P)."""
+        return [p for p in self.by_id.values() if self.is_progressable(p)]
+
+    def _requeue(self, promise):
+        if sum(map(len, (self._unstarted, self._recent, self._stale, self._expiry))) > 4 * len(self.by_id) + 64:
+            self._compact()
+        if not self.is_progressable(promise):
+            self._version.pop(promise.id, None)
+            return
+        version = self._version[promise.id] = next(self._versions)
+        base = promise.importance * PROMISE_IMPORTANCE_WEIGHT + (100 - promise.progression) * PROMISE_REMAINING_WEIGHT
+        order = self._order[promise.id]
+        if promise.last_progressed <= 0:
+            heapq.heappush(self._unstarted, (-(base + PROMISE_UNSTARTED_BONUS), order, version, promise.id))
+        else:
+            # Pushed as recent even if already saturated; _expire moves it before any read
+            heapq.heappush(self._recent, (-(base - promise.last_progressed * PROMISE_STALENESS_PER_SCENE), order, version, promise.id))
+            heapq.heappush(self._expiry, (promise.last_progressed, order, version, promise.id))
+
+    def _expire(self, scene_count):
+        while self._expiry and scene_count - self._expiry[0][0] >= _STALE_AFTER_SCENES:
+            _, order, version, promise_id = heapq.heappop(self._expiry)
+            if self._version.get(promise_id) != version:
+                continue
+            promise = self.by_id[promise_id]
+            base = promise.importance * PROMISE_IMPORTANCE_WEIGHT + (100 - promise.progression) * PROMISE_REMAINING_WEIGHT
+            version = self._version[promise_id] = next(self._versions)
+            heapq.heappush(self._stale, (-(base + PROMISE_STALENESS_CAP), order, version, promise_id))
+
+    def _compact(self):
+        """Rebuilds the heaps without superseded entries so they stay O(P) however long the story runs."""
+        for heap in (self._unstarted, self._recent, self._stale, self._expiry):
+            heap[:] = [entry for entry in heap if self._version.get(entry[3]) == entry[2]]
+            heapq.heapify(heap)
+
+    def _clean(self, heap):
+        """Drops superseded entries from the top of a heap; True if a live entry remains."""
+        while heap and self._version.get(heap[0][3]) != heap[0][2]:
+            heapq.heappop(heap)
+        return bool(heap)
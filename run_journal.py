@@ -0,0 +1,60 @@
+import json
+import os
+import time
+
+JOURNAL_FILENAME = "journal.json"
+
+
+def new_run_dir(base_dir):
+    """Creates and returns a fresh timestamped run directory under base_dir."""
+    run_dir = os.path.join(base_dir, "runs", time.strftime("%Y%m%d_%H%M%S"))
+    suffix = 1
+    candidate = run_dir
+    while os.path.exists(candidate):
+        suffix += 1
+        candidate = f"{run_dir}_{suffix}"
+    os.makedirs(candidate)
+    return candidate
+
+
+def int_keys(mapping):
+    """JSON turns chapter-number keys into strings; turn them back into ints."""
+    return {int(k): v for k, v in (mapping or {}).items()}
+
+
+class RunJournal:
+    """
+    Crash-safe JSON checkpoint of a generation run.
+
+    Every save writes the complete state to a temporary file, fsyncs it and
+    atomically renames it over the previous journal, so a crash at any point
+    leaves either the old or the new checkpoint on disk, never a torn one.
+    """
+
+    def __init__(self, run_dir):
+        self.run_dir = run_dir
+        os.makedirs(run_dir, exist_ok=True)
+        self.path = os.path.join(run_dir, JOURNAL_FILENAME)
+        self.saves = 0
+
+    def exists(self):
+        return os.path.isfile(self.path)
+
+    def save(self, state):
+        """Atomically replaces the journal with state."""
+        state = dict(state)
+        state["journal_saved_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2, ensure_ascii=False, default=str)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.saves += 1
+
+    def load(self):
+        """Returns the last saved state, or None if no journal exists."""
+        if not self.exists():
+            return None
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f)
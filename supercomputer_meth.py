@@ -5,6 +5,9 @@ import docx
 import traceback
 import random
 import time
+import heapq
+import itertools
+from collections import defaultdict, deque
 from dotenv import load_dotenv
 
 # --- Langchain Imports ---
@@ -22,6 +25,7 @@ load_dotenv()
 DEFAULT_MODEL = "gemma2:9b" # Use Gemma 2 9B as a starting point
 OUTPUT_FOLDER = './generated_novels'
 RESUME_FOLDER = './docs' # Separate folder for input resumes
+STORY_EVENT_RING_SIZE = 16 # Recent story events kept preformatted for scene prompts
 
 # --- LLM Initialization ---
 def create_llm(temperature=0.7, top_p=0.9):
@@ -518,12 +522,73 @@ class PromiseManager:
         self.promises = {p['id']: p for p in initial_promises} # Store by ID
         self.completed_promises = {}
         self.story_events = [] # Tracks events related to promises
+        self.recent_event_lines = deque(maxlen=STORY_EVENT_RING_SIZE) # Preformatted tail of story_events
         self.current_scene_index = 0
+        # Suggestion index over active promises: (target_act, target_chapter) buckets, plus one heap per
+        # target_act keyed by the part of the score that does not depend on the chapter asked about.
+        # Heap entries are invalidated lazily through _version.
+        self._buckets = defaultdict(set) # (act, chapter) -> promise ids
+        self._acts_by_chapter = defaultdict(set) # chapter -> acts with a non-empty bucket for it
+        self._placement = {} # promise id -> (act, chapter) it is bucketed under
+        self._act_heaps = defaultdict(list) # act -> [(-base score, order, version, id)]
+        self._order = {} # promise id -> insertion order, the tie-break the old stable sort gave
+        self._version = {}
+        self._versions = itertools.count(1)
+        for promise in self.promises.values():
+            self._index_promise(promise)
+
+    def _base_score(self, promise):
+        """Importance, recency (minus the shared current_scene_index) and the progress penalty."""
+        score = promise['importance'] * 5 - promise['last_progressed_scene']
+        if promise['progress'] >= 2:
+            score -= 20 * promise['progress']
+        return score
+
+    def _index_promise(self, promise):
+        promise_id = promise['id']
+        placement = (promise['target_act'], promise['target_chapter'])
+        if self._placement.get(promise_id) != placement:
+            self._unbucket(promise_id)
+            self._buckets[placement].add(promise_id)
+            self._acts_by_chapter[placement[1]].add(placement[0])
+            self._placement[promise_id] = placement
+        order = self._order.setdefault(promise_id, len(self._order))
+        version = self._version[promise_id] = next(self._versions)
+        heap = self._act_heaps[placement[0]]
+        heapq.heappush(heap, (-self._base_score(promise), order, version, promise_id))
+        if len(heap) > 4 * len(self.promises) + 64:
+            heap[:] = [entry for entry in heap if self._version.get(entry[3]) == entry[2]]
+            heapq.heapify(heap)
+
+    def _unbucket(self, promise_id):
+        placement = self._placement.pop(promise_id, None)
+        if placement is None:
+            return
+        bucket = self._buckets[placement]
+        bucket.discard(promise_id)
+        if not bucket:
+            del self._buckets[placement]
+            self._acts_by_chapter[placement[1]].discard(placement[0])
+
+    def _top_of_act(self, heap, count, skip_chapter):
+        """Up to `count` live (base score, order, id) entries of one act heap, skipping skip_chapter's promises."""
+        popped, found = [], []
+        while heap and len(found) < count:
+            entry = heapq.heappop(heap)
+            if self._version.get(entry[3]) != entry[2]:
+                continue # Superseded or completed
+            popped.append(entry)
+            if self.promises[entry[3]]['target_chapter'] != skip_chapter:
+                found.append((-entry[0], entry[1], entry[3]))
+        for entry in popped:
+            heapq.heappush(heap, entry)
+        return found
 
     def assign_promise_to_outline(self, promise_id, act, chapter):
         if promise_id in self.promises:
             self.promises[promise_id]['target_act'] = act
             self.promises[promise_id]['target_chapter'] = chapter
+            self._index_promise(self.promises[promise_id])
             print(f"Assigned Promise {promise_id} to Act {act}, Chapter {chapter}")
             return True
         return False
@@ -542,6 +607,7 @@ class PromiseManager:
                 'progress_level': promise['progress']
             }
             self.story_events.append(event)
+            self.recent_event_lines.append(self._format_story_event(event))
             print(f"Scene {scene_index}: Progress on Promise {promise_id} - {event_description} (New Level: {promise['progress']})")
 
             # Simple completion check (can be made more sophisticated, e.g., based on expected payoff)
@@ -549,49 +615,41 @@ class PromiseManager:
             if promise['progress'] >= 4:
                 promise['complete'] = True
                 self.completed_promises[promise_id] = self.promises.pop(promise_id)
+                self._unbucket(promise_id)
+                self._version.pop(promise_id, None)
                 print(f"Promise {promise_id} completed and moved: '{promise['description']}'")
+            else:
+                self._index_promise(promise)
             return True
         print(f"Warning: Tried to progress non-existent promise ID {promise_id}")
         return False
 
     def suggest_promises_for_chapter(self, target_act, target_chapter, count=3):
         """Suggest promises relevant to the current chapter/act, prioritizing those assigned or needing progress."""
-        active_promises = list(self.promises.values())
-        if not active_promises:
-            return []
-
-        scored_promises = []
-        for promise in active_promises:
-            score = 0
-            # High priority if assigned to this specific chapter/act
-            if promise['target_act'] == target_act:
-                score += 50
-                if promise['target_chapter'] == target_chapter:
-                    score += 100
-
-            # Boost based on importance
-            score += promise['importance'] * 5
-
-            # Boost if not progressed recently
-            recency_factor = self.current_scene_index - promise['last_progressed_scene']
-            score += recency_factor # More scenes passed = higher score boost
-
-            # Penalize if already progressed significantly (unless it's the target chapter for payoff)
-            if promise['progress'] >= 2 and promise['target_chapter'] != target_chapter:
-                 score -= 20 * promise['progress']
-            
-            # Ensure target promises for this chapter get top priority if not progressed yet
-            if promise['target_chapter'] == target_chapter and promise['progress'] == 0:
-                score += 200
-
-
-            scored_promises.append((promise['id'], promise['description'], score))
-
-        # Sort by score (highest first)
-        scored_promises.sort(key=lambda x: x[2], reverse=True)
+        # Promises targeting this chapter get their own bonuses (and no progress penalty), so they are scored
+        # directly from their buckets; every other promise's order within its act heap is fixed, so only the
+        # top `count` of each act can make the cut. Cost: O(chapter's promises + acts x count x log P).
+        current_scene = self.current_scene_index
+        scored = []
+        for act in self._acts_by_chapter.get(target_chapter, ()):
+            for promise_id in self._buckets[(act, target_chapter)]:
+                promise = self.promises[promise_id]
+                score = promise['importance'] * 5 + current_scene - promise['last_progressed_scene']
+                if act == target_act:
+                    score += 150
+                if promise['progress'] == 0:
+                    score += 200
+                scored.append((score, self._order[promise_id], promise_id))
+        for act, heap in self._act_heaps.items():
+            bonus = 50 if act == target_act else 0
+            for base_score, order, promise_id in self._top_of_act(heap, count, target_chapter):
+                scored.append((base_score + current_scene + bonus, order, promise_id))
+
+        # Sort by score (highest first), ties in insertion order
+        scored.sort(key=lambda x: (-x[0], x[1]))
 
         # Return ID and description
-        return [(pid, desc) for pid, desc, _ in scored_promises[:count]]
+        return [(pid, self.promises[pid]['description']) for _, _, pid in scored[:count]]
 
     def get_active_promises_summary(self):
         return [f"ID {pid}: {p['description']} (Importance: {p['importance']}, Progress: {p['progress']})" for pid, p in self.promises.items()]
@@ -602,9 +660,15 @@ class PromiseManager:
     def increment_scene_counter(self):
          self.current_scene_index += 1
 
+    @staticmethod
+    def _format_story_event(event):
+         return f"Scene {event['scene']}: {event['event']} (Promise: {event['promise'][:50]}...)"
+
     def get_story_summary(self, recent_count=None):
+         if recent_count and recent_count <= STORY_EVENT_RING_SIZE:
+              return list(self.recent_event_lines)[-recent_count:]
          events_to_show = self.story_events[-recent_count:] if recent_count else self.story_events
-         return [f"Scene {e['scene']}: {e['event']} (Promise: {e['promise'][:50]}...)" for e in events_to_show]
+         return [self._format_story_event(e) for e in events_to_show]
 
 
 # --- Outline and Structure ---
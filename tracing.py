@@ -0,0 +1,108 @@
+import functools
+import json
+import os
+import threading
+import time
+
+_tracer = None # Set by enable_tracing(); None means tracing is off
+
+
+class Span:
+    """
+    One timed region. Always measures its own duration (callers can log
+    span.duration), but is only recorded when tracing is enabled.
+    """
+
+    __slots__ = ("name", "category", "args", "start", "duration")
+
+    def __init__(self, name, category, args):
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = 0.0
+        self.duration = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self.start
+        tracer = _tracer
+        if tracer is not None:
+            if exc_type is not None:
+                self.args["error"] = exc_type.__name__
+            tracer.add(self)
+        return False
+
+
+class Tracer:
+    """Collects finished spans from every thread and exports them as Chrome trace events."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self.events = []
+        self.thread_names = {}
+
+    def add(self, span):
+        thread = threading.current_thread()
+        event = {
+            "name": span.name, "cat": span.category, "ph": "X",
+            "ts": round((span.start - self._origin) * 1e6, 1), "dur": round(span.duration * 1e6, 1),
+            "pid": os.getpid(), "tid": thread.ident,
+        }
+        if span.args:
+            event["args"] = {key: str(value) for key, value in span.args.items()}
+        with self._lock:
+            self.events.append(event)
+            self.thread_names.setdefault(thread.ident, thread.name)
+
+    def export_chrome_trace(self, path):
+        """Writes the Trace Event Format JSON that chrome://tracing, Perfetto and speedscope open."""
+        with self._lock:
+            metadata = [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": name}}
+                        for tid, name in self.thread_names.items()]
+            trace = {"traceEvents": metadata + sorted(self.events, key=lambda e: e["ts"]), "displayTimeUnit": "ms"}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(trace, f)
+        return len(trace["traceEvents"]) - len(metadata)
+
+
+def enable_tracing():
+    """Turns span recording on for the whole process and returns the Tracer."""
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer()
+    return _tracer
+
+
+def tracing_enabled():
+    return _tracer is not None
+
+
+def span(name, category="pipeline", **args):
+    """Context manager timing a region: `with span("chapter", title=t) as s: ...`; s.duration afterwards."""
+    return Span(name, category, args)
+
+
+def traced(name=None, category="pipeline"):
+    """Decorator form of span(). When tracing is off the wrapped function is called directly."""
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return func(*args, **kwargs)
+            with Span(span_name, category, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def export_chrome_trace(path):
+    """Exports everything recorded so far; returns the number of spans written (0 if tracing is off)."""
+    if _tracer is None:
+        return 0
+    return _tracer.export_chrome_trace(path)
@@ -4,6 +4,8 @@ import time
 import os
 import re
 
+from ollama_client import get_client
+
 
 class BookGenerator:
     def __init__(self):
@@ -54,7 +56,7 @@ STORY INPUT: One paragraph up to 830 characters with your plot idea
         }
 
         try:
-            response = requests.post(self.base_url, json=data)
+            response = get_client().post(self.base_url, json=data)
             response.raise_for_status()
             return response.json()["response"]
         except requests.exceptions.RequestException as e: